@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Local HTTP API for Tamil Assistant
+Serves page analysis, word lookups and vocabulary search to other devices
+on the network (a tablet reading the same book, a household of students).
+All requests share one vocabulary store, render cache, Gemini connection
+pool and token budget, and are handled concurrently on the shared event
+loop. Each client has its own daily request and token quota and a cap on
+requests in flight.
+
+    tamil-assistant serve --port 8766
+    python -m tamil_assistant.api_server --documents ~/Books
+
+Pages are named either by a PDF in the server's documents directory
+(JSON body) or uploaded as a PDF or page image (multipart form).
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import hmac
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from aiohttp import web
+from PIL import Image
+
+from tamil_assistant.config_manager import get_config
+from tamil_assistant.gemini_client import GeminiClient
+from tamil_assistant.okular_interface import OkularInterface
+from tamil_assistant.vocabulary_store import VocabularyStore
+from tamil_assistant.page_payload import PagePayload
+from tamil_assistant.render_dpi import DpiSelector
+from tamil_assistant.model_routing import PAGE_OPERATIONS
+from tamil_assistant.cache_bundle import prompt_hash
+from tamil_assistant.fingerprint import DocumentFingerprints, page_hash
+from tamil_assistant.offline_queue import is_connection_error
+from tamil_assistant.token_ledger import BudgetExceededError
+from tamil_assistant.metrics import get_metrics
+
+# Rendered pages kept for later analyses and lookups
+RENDER_CACHE_PAGES = 32
+# Largest accepted request body (uploaded PDFs)
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+SEARCH_LIMIT = 50
+
+
+class ApiError(Exception):
+    """A request the server refuses, with its HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class QuotaExceeded(ApiError):
+    def __init__(self, client, kind, used, limit):
+        super().__init__(429, f"Daily {kind} quota of {client} reached ({used:,}/{limit:,})")
+
+
+class ClientQuotas:
+    def __init__(self, db_path, daily_requests=0, daily_tokens=0, max_concurrent=2):
+        """
+        Per-client daily usage, kept across restarts
+        daily_requests, daily_tokens: limits per client and day (0 = no limit)
+        max_concurrent: requests of one client handled at the same time;
+        further requests wait for a free slot
+        """
+        self.daily_requests = daily_requests
+        self.daily_tokens = daily_tokens
+        self.max_concurrent = max_concurrent
+        os.makedirs(os.path.dirname(str(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS client_usage (
+                    day TEXT NOT NULL,
+                    client TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    tokens INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, client)
+                )
+                """
+            )
+        # client -> asyncio.Semaphore (event loop thread only)
+        self._slots = {}
+
+    def usage(self, client):
+        """(requests, tokens) of a client today"""
+        with self._lock:
+            return self._usage(client)
+
+    def admit(self, client):
+        """Count a request of a client, or raise QuotaExceeded"""
+        # Checked and counted under one lock: requests are admitted from
+        # executor threads concurrently
+        with self._lock:
+            requests, tokens = self._usage(client)
+            if self.daily_requests and requests >= self.daily_requests:
+                raise QuotaExceeded(client, 'request', requests, self.daily_requests)
+            if self.daily_tokens and tokens >= self.daily_tokens:
+                raise QuotaExceeded(client, 'token', tokens, self.daily_tokens)
+            self._add(client, 1, 0)
+
+    def record_tokens(self, client, tokens):
+        if tokens:
+            with self._lock:
+                self._add(client, 0, tokens)
+
+    def _usage(self, client):
+        row = self._conn.execute(
+            "SELECT requests, tokens FROM client_usage WHERE day = ? AND client = ?",
+            (date.today().isoformat(), client)
+        ).fetchone()
+        return row or (0, 0)
+
+    def _add(self, client, requests, tokens):
+        """Add to a client's usage (with the lock held)"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO client_usage (day, client, requests, tokens) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, client) DO UPDATE SET "
+                "requests = requests + excluded.requests, tokens = tokens + excluded.tokens",
+                (date.today().isoformat(), client, requests, tokens)
+            )
+
+    def slot(self, client):
+        """Semaphore limiting a client's concurrent requests"""
+        semaphore = self._slots.get(client)
+        if semaphore is None:
+            semaphore = self._slots[client] = asyncio.Semaphore(self.max_concurrent)
+        return semaphore
+
+    def close(self):
+        self._conn.close()
+
+
+class PageRef:
+    """A page named by a request: in a PDF on the server or uploaded, or an uploaded image"""
+
+    def __init__(self, document, page, content_hash, is_image=False):
+        self.document = document
+        self.page = page
+        self.content_hash = content_hash
+        self.is_image = is_image
+
+    @property
+    def document_name(self):
+        return os.path.basename(self.document)
+
+
+class ApiServer:
+    def __init__(self, gemini, store, okular, quotas, documents_dir=None, upload_dir=None, clients=None):
+        """
+        HTTP front end for one GeminiClient and VocabularyStore
+        documents_dir: PDFs requests may name (None = uploads only)
+        upload_dir: where uploaded PDFs and images are kept, by content hash
+        clients: bearer token -> client name; without clients, requests are
+        accounted to their address
+        """
+        self.gemini = gemini
+        self.store = store
+        self.okular = okular
+        self.quotas = quotas
+        self.documents_dir = os.path.realpath(documents_dir) if documents_dir else None
+        self.upload_dir = upload_dir
+        self.clients = dict(clients or {})
+        self.config = get_config()
+        self.logger = logging.getLogger('ApiServer')
+        self.metrics = get_metrics()
+        self.fingerprints = DocumentFingerprints(store)
+        # (content_hash, page, dpi) -> (PagePayload, page hash), least recently used first
+        self._renders = OrderedDict()
+
+    def app(self):
+        app = web.Application(client_max_size=MAX_UPLOAD_BYTES, middlewares=[self._handle_client])
+        app.router.add_get('/v1/health', self.health)
+        app.router.add_post('/v1/analyze', self.analyze)
+        app.router.add_post('/v1/lookup', self.lookup)
+        app.router.add_get('/v1/search', self.search)
+        app.router.add_get('/v1/usage', self.usage)
+        return app
+
+    async def start(self, host, port):
+        """Start listening (on the Gemini client's event loop); returns the runner to clean up"""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self.logger.info(f"API listening on http://{host}:{port}")
+        return runner
+
+    # Clients
+
+    def _client(self, request):
+        """Client name of a request, or raise 401 when tokens are configured"""
+        if not self.clients:
+            return request.remote or 'local'
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer':
+            for known, name in self.clients.items():
+                if hmac.compare_digest(token.strip(), known):
+                    return name
+        raise ApiError(401, "Missing or unknown bearer token")
+
+    @web.middleware
+    async def _handle_client(self, request, handler):
+        try:
+            if request.path == '/v1/health':
+                return await handler(request)
+            request['client'] = client = self._client(request)
+            if request.method != 'POST':
+                return await handler(request)
+            # Work requests count against the client's quota and slots
+            await asyncio.get_running_loop().run_in_executor(None, self.quotas.admit, client)
+            async with self.quotas.slot(client):
+                self.metrics.increment(f"api.{request.path.rsplit('/', 1)[-1]}")
+                return await handler(request)
+        except web.HTTPException:
+            raise
+        except ApiError as e:
+            return _error(e.status, str(e))
+        except BudgetExceededError as e:
+            return _error(429, str(e))
+        except Exception as e:
+            if is_connection_error(e):
+                return _error(502, f"Gemini unreachable: {e}")
+            self.logger.exception(f"{request.method} {request.path} failed")
+            return _error(500, str(e) or type(e).__name__)
+
+    # Endpoints
+
+    async def health(self, request):
+        budget = await asyncio.get_running_loop().run_in_executor(None, self.gemini.ledger.status)
+        return web.json_response({
+            'status': 'ok',
+            'models': self.gemini.router.describe(),
+            'budget': budget,
+        })
+
+    async def usage(self, request):
+        client = request['client']
+        loop = asyncio.get_running_loop()
+        requests, tokens = await loop.run_in_executor(None, self.quotas.usage, client)
+        return web.json_response({
+            'client': client,
+            'requests': requests, 'daily_requests': self.quotas.daily_requests or None,
+            'tokens': tokens, 'daily_tokens': self.quotas.daily_tokens or None,
+        })
+
+    async def search(self, request):
+        query = request.query.get('q', '').strip()
+        if not query:
+            raise ApiError(400, "Missing search text (q)")
+        limit = min(_int_field(request.query.get('limit', SEARCH_LIMIT), 'limit'), SEARCH_LIMIT)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, self.store.search, query, limit)
+        return _json([
+            {'word': r.word.to_dict(), 'document': r.document_name, 'page': r.page, 'model': r.model}
+            for r in results
+        ])
+
+    async def analyze(self, request):
+        """Words of one page, from the store when it was analyzed before"""
+        _, ref = await self._read_page_request(request)
+        loop = asyncio.get_running_loop()
+        page_prompt_hash = prompt_hash(self.config.get_page_analysis_prompt())
+
+        dpi = None
+        if not ref.is_image:
+            dpi = await loop.run_in_executor(None, self._choose_dpi, ref)
+        if self.config.get_page_cache_enabled():
+            cached = await loop.run_in_executor(
+                None, self.store.get_cached_page,
+                ref.content_hash, ref.page, page_prompt_hash, self.gemini.router.models(*PAGE_OPERATIONS), dpi
+            )
+            if cached:
+                self.metrics.increment("api.analyze.cache_hit")
+                return self._page_result(ref, cached, cached=True)
+
+        page_text, payload, dpi, this_page_hash = await self._prepare_page(ref, use_text_layer=True)
+        if self.config.get_page_cache_enabled():
+            found = await loop.run_in_executor(
+                None, self.store.find_page_by_hash,
+                this_page_hash, ref.document, ref.page, page_prompt_hash,
+                self.gemini.router.models(*PAGE_OPERATIONS), dpi
+            )
+            if found:
+                cached, cached_model = found
+                self.metrics.increment("api.analyze.page_hash_hit")
+                await loop.run_in_executor(None, functools.partial(
+                    self.store.record_analysis, ref.document, ref.page, cached, cached_model,
+                    content_hash=ref.content_hash, prompt_hash=page_prompt_hash, dpi=dpi, page_hash=this_page_hash
+                ))
+                return self._page_result(ref, cached, cached=True)
+
+        known_words = None
+        if self.config.get_known_vocabulary_enabled():
+            known_words = await loop.run_in_executor(
+                None, self.store.get_known_words, ref.document, self.config.get_known_vocabulary_limit()
+            )
+
+        words, tokens_sent, tokens_received, model = await self.gemini.analyze_page_async(
+            payload, known_words=known_words, document=ref.document, page=ref.page, page_text=page_text
+        )
+        await loop.run_in_executor(None, self.quotas.record_tokens, request['client'], tokens_sent + tokens_received)
+        if known_words:
+            await loop.run_in_executor(None, self.store.fill_known_words, ref.document, words)
+        await loop.run_in_executor(None, functools.partial(
+            self.store.record_analysis, ref.document, ref.page, words, model,
+            content_hash=ref.content_hash, prompt_hash=page_prompt_hash, dpi=dpi, page_hash=this_page_hash
+        ))
+        return self._page_result(ref, words, tokens=tokens_sent + tokens_received)
+
+    async def lookup(self, request):
+        """Explain a word in the context of its page"""
+        fields, ref = await self._read_page_request(request)
+        text = (fields.get('text') or '').strip()
+        if not text:
+            raise ApiError(400, "Missing word to look up (text)")
+
+        loop = asyncio.get_running_loop()
+        if self.config.get_lookup_cache_enabled():
+            cached = await loop.run_in_executor(
+                None, self.store.find_cached_word, text, ref.document, ref.content_hash
+            )
+            if cached:
+                self.metrics.increment("api.lookup.cache_hit")
+                return _json({
+                    'document': ref.document_name, 'page': ref.page, 'word': cached.word.to_dict(),
+                    'cached': True, 'source': {'document': cached.document_name, 'page': cached.page},
+                })
+
+        # Lookups need the page image for context, even with a text layer
+        _, payload, _, _ = await self._prepare_page(ref, use_text_layer=False)
+        word, tokens_sent, tokens_received, model = await self.gemini.lookup_word_async(
+            text, payload, document=ref.document, page=ref.page
+        )
+        await loop.run_in_executor(None, self.quotas.record_tokens, request['client'], tokens_sent + tokens_received)
+        if word:
+            await loop.run_in_executor(None, functools.partial(
+                self.store.record_analysis, ref.document, ref.page, [word], model, kind='lookup',
+                content_hash=ref.content_hash, prompt_hash=prompt_hash(self.config.get_word_lookup_prompt())
+            ))
+        return _json({
+            'document': ref.document_name, 'page': ref.page,
+            'word': word.to_dict() if word else None,
+            'cached': False, 'tokens': tokens_sent + tokens_received,
+        })
+
+    def _page_result(self, ref, words, cached=False, tokens=0):
+        return _json({
+            'document': ref.document_name, 'page': ref.page,
+            'words': [w.to_dict() for w in words],
+            'cached': cached, 'tokens': tokens,
+        })
+
+    # Pages
+
+    async def _read_page_request(self, request):
+        """
+        Request fields and the page they name
+        JSON: {"document": "book.pdf", "page": 12, ...} with document relative
+        to the documents directory. Multipart: a 'file' part (PDF or page
+        image) plus form fields.
+        """
+        if request.content_type.startswith('multipart/'):
+            fields, data = {}, None
+            async for part in await request.multipart():
+                if part.name == 'file':
+                    data = await part.read()
+                else:
+                    fields[part.name] = await part.text()
+            if not data:
+                raise ApiError(400, "Missing uploaded page (file)")
+            ref = await asyncio.get_running_loop().run_in_executor(
+                None, self._store_upload, bytes(data), _int_field(fields.get('page', 1), 'page')
+            )
+            return fields, ref
+
+        try:
+            fields = await request.json()
+        except ValueError:
+            raise ApiError(400, "Body must be JSON or a multipart upload")
+        if not isinstance(fields, dict) or not fields.get('document'):
+            raise ApiError(400, "Missing document")
+        path = self._document_path(str(fields['document']))
+        content_hash = await asyncio.get_running_loop().run_in_executor(None, self.fingerprints.identify, path)
+        return fields, PageRef(path, _int_field(fields.get('page', 1), 'page'), content_hash)
+
+    def _document_path(self, name):
+        """Absolute path of a document in the documents directory"""
+        if not self.documents_dir:
+            raise ApiError(400, "No documents directory is served; upload the page instead")
+        path = os.path.realpath(os.path.join(self.documents_dir, name))
+        if os.path.commonpath([self.documents_dir, path]) != self.documents_dir or not os.path.isfile(path):
+            raise ApiError(404, f"Unknown document: {name}")
+        return path
+
+    def _store_upload(self, data, page):
+        """Keep an uploaded PDF or image under its content hash (executor)"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        if data.startswith(b'%PDF'):
+            extension, is_image = 'pdf', False
+        else:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    extension = (image.format or 'img').lower()
+                    image.verify()
+            except Exception:
+                raise ApiError(415, "Upload must be a PDF or a page image")
+            # An image is the page itself
+            page, is_image = 1, True
+        path = os.path.join(self.upload_dir, f"{content_hash}.{extension}")
+        if not os.path.exists(path):
+            os.makedirs(self.upload_dir, exist_ok=True)
+            with open(path + '.part', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.part', path)
+            self.logger.info(f"Stored upload {os.path.basename(path)} ({len(data):,} bytes)")
+        return PageRef(path, page, content_hash, is_image=is_image)
+
+    def _choose_dpi(self, ref):
+        """Render DPI of a PDF for cache keys, or None if it cannot be determined"""
+        try:
+            return self.okular.choose_dpi(ref.document, ref.page)
+        except Exception as e:
+            self.logger.warning(f"Could not choose render DPI: {e}")
+            return None
+
+    async def _prepare_page(self, ref, use_text_layer):
+        """
+        (page_text, payload, dpi, page hash) of a page; payload is None when
+        the text layer is used. Renders are shared through the render cache.
+        """
+        loop = asyncio.get_running_loop()
+        if ref.is_image:
+            key = (ref.content_hash, ref.page, None)
+            render = self._renders.get(key)
+            if render is None:
+                render = await loop.run_in_executor(None, _encode_image_file, ref.document)
+            self._remember_render(key, render)
+            return None, render[0], None, render[1]
+
+        if use_text_layer:
+            page_text = await loop.run_in_executor(None, self.okular.get_page_text, ref.document, ref.page)
+            if page_text:
+                return page_text, None, None, page_hash(page_text)
+
+        dpi = await loop.run_in_executor(None, self.okular.choose_dpi, ref.document, ref.page)
+        key = (ref.content_hash, ref.page, dpi)
+        render = self._renders.get(key)
+        if render is None:
+            image = await loop.run_in_executor(None, self.okular.render_page_to_image, ref.document, ref.page, dpi)
+            render = await loop.run_in_executor(None, _encode_render, image)
+            del image
+            self.metrics.increment("api.renders")
+        else:
+            self.metrics.increment("api.render_cache_hit")
+        self._remember_render(key, render)
+        return None, render[0], dpi, render[1]
+
+    def _remember_render(self, key, render):
+        self._renders.pop(key, None)
+        self._renders[key] = render
+        while len(self._renders) > RENDER_CACHE_PAGES:
+            self._renders.popitem(last=False)
+
+
+def _encode_render(image):
+    """(PagePayload, page hash) of a rendered or uploaded page"""
+    return PagePayload.from_image(image), page_hash(image=image)
+
+
+def _encode_image_file(path):
+    with Image.open(path) as image:
+        return _encode_render(image.convert('RGB'))
+
+
+def _int_field(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be a number")
+    if number < 1:
+        raise ApiError(400, f"{name} must be at least 1")
+    return number
+
+
+def _json(data):
+    return web.json_response(data, dumps=functools.partial(json.dumps, ensure_ascii=False))
+
+
+def _error(status, message):
+    return web.json_response({'error': message}, status=status)
+
+
+def main(argv=None):
+    config = get_config()
+    parser = argparse.ArgumentParser(prog='tamil-assistant serve',
+                                     description='Serve page analysis, lookups and search over HTTP')
+    parser.add_argument('--host', default=config.get_server_host(),
+                        help='Address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=config.get_server_port(),
+                        help='Port to listen on (default: %(default)s)')
+    parser.add_argument('--documents', default=config.get_server_documents_dir(), metavar='DIR',
+                        help='Directory of PDFs that requests may name')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s: %(message)s')
+    gemini = GeminiClient()
+    store = VocabularyStore(config.get_database_path())
+    okular = OkularInterface(
+        use_text_layer=config.get_use_text_layer(),
+        min_tamil_chars=config.get_text_layer_min_tamil_chars(),
+        dpi_selector=DpiSelector.from_config(config),
+        session_bus=False
+    )
+    quotas = ClientQuotas(
+        config.get_server_usage_path(),
+        daily_requests=config.get_client_daily_requests(),
+        daily_tokens=config.get_client_daily_tokens(),
+        max_concurrent=config.get_client_max_concurrency()
+    )
+    server = ApiServer(
+        gemini, store, okular, quotas,
+        documents_dir=os.path.expanduser(args.documents) if args.documents else None,
+        upload_dir=str(config.get_server_upload_dir()),
+        clients=config.get_server_clients()
+    )
+
+    try:
+        runner = gemini.loop_thread.run(server.start(args.host, args.port))
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}")
+        return 1
+    print(f"Serving on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gemini.loop_thread.run(runner.cleanup())
+        gemini.close()
+        server.fingerprints.close()
+        store.close()
+        quotas.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
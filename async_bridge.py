@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Asyncio integration for Tamil Assistant
+Runs one shared asyncio event loop in a background thread (where the async
+Gemini client and its connection pool live) and bridges results back to the
+GTK/GLib main loop
+"""
+
+import asyncio
+import threading
+import logging
+
+
+class EventLoopThread:
+    def __init__(self, name='TamilAssistantAsync'):
+        """Start an asyncio event loop in a daemon thread"""
+        self.loop = asyncio.new_event_loop()
+        self.logger = logging.getLogger('EventLoopThread')
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def in_loop_thread(self):
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine to completion from a non-loop thread and return its result"""
+        if self.in_loop_thread:
+            coro.close()
+            raise RuntimeError("Blocking call made from the event loop thread - use the async API")
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        """Stop the loop after pending callbacks run"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class GLibBridge:
+    def __init__(self, loop_thread=None):
+        """Bridge between the shared asyncio loop and the GLib main loop"""
+        self.loop_thread = loop_thread or get_event_loop_thread()
+        self.logger = logging.getLogger('GLibBridge')
+
+    def submit(self, coro, on_done=None, on_error=None):
+        """
+        Run a coroutine on the asyncio loop and deliver its outcome on the GLib
+        main loop: on_done(result), or on_error(exception) on failure or
+        cancellation (asyncio.CancelledError). Returns a future whose cancel()
+        cancels the coroutine mid-flight.
+        """
+        from gi.repository import GLib
+
+        future = self.loop_thread.submit(coro)
+
+        def deliver(done_future):
+            if done_future.cancelled():
+                outcome, callback = asyncio.CancelledError(), on_error
+            elif done_future.exception() is not None:
+                outcome, callback = done_future.exception(), on_error
+            else:
+                outcome, callback = done_future.result(), on_done
+            if callback:
+                GLib.idle_add(self._call_once, callback, outcome)
+
+        future.add_done_callback(deliver)
+        return future
+
+    def call_in_main(self, func, *args):
+        """Schedule func(*args) on the GLib main loop from any thread"""
+        from gi.repository import GLib
+        GLib.idle_add(self._call_once, func, *args)
+
+    def _call_once(self, func, *args):
+        func(*args)
+        return False
+
+
+# Singleton instance
+_loop_thread_instance = None
+_loop_thread_lock = threading.Lock()
+
+def get_event_loop_thread():
+    """Get or start the shared event loop thread"""
+    global _loop_thread_instance
+    with _loop_thread_lock:
+        if _loop_thread_instance is None:
+            _loop_thread_instance = EventLoopThread()
+    return _loop_thread_instance
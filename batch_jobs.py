@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Whole-book preparation through the Gemini Batch API
+Writes every page request of a PDF to a JSONL input file, uploads it,
+submits one batch job, polls until it finishes and stores the results in
+the vocabulary store. Jobs are recorded in a local table so an interrupted
+run can be resumed by job id.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import aiohttp
+
+from tamil_assistant.cache_bundle import file_content_hash, prompt_hash
+from tamil_assistant.config_manager import get_config
+from tamil_assistant.fingerprint import page_hash
+from tamil_assistant.model_routing import PAGE_OPERATIONS
+from tamil_assistant.page_payload import PagePayload
+from tamil_assistant.token_ledger import get_token_ledger
+
+# Remote job states (Gemini Batch API)
+STATE_SUCCEEDED = 'BATCH_STATE_SUCCEEDED'
+TERMINAL_STATES = {
+    STATE_SUCCEEDED, 'BATCH_STATE_FAILED', 'BATCH_STATE_CANCELLED', 'BATCH_STATE_EXPIRED'
+}
+
+# Local job states
+JOB_PREPARED = 'prepared'
+JOB_SUBMITTED = 'submitted'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_INGESTED = 'ingested'
+
+
+class BatchError(Exception):
+    """Raised when the Batch API rejects a request or a job cannot continue"""
+
+
+def parse_page_ranges(text, page_count):
+    """Pages from a range list like '1-20,25' (all pages if text is empty)"""
+    if not text:
+        return list(range(1, page_count + 1))
+    pages = set()
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            pages.update(range(int(first), int(last) + 1))
+        elif part:
+            pages.add(int(part))
+    return sorted(p for p in pages if 1 <= p <= page_count)
+
+
+class BatchJob:
+    """One row of the batch job table"""
+
+    FIELDS = ('id', 'document', 'content_hash', 'prompt_hash', 'model', 'pages',
+              'input_path', 'state', 'remote_name', 'remote_state', 'output_file',
+              'error', 'created_at', 'updated_at', 'page_info')
+
+    def __init__(self, row):
+        for name, value in zip(self.FIELDS, row):
+            setattr(self, name, value)
+        self.pages = json.loads(self.pages)
+        # Page number (as a string) -> {'dpi': ..., 'page_hash': ...} of the requests
+        self.page_info = json.loads(self.page_info) if self.page_info else {}
+
+    @property
+    def document_name(self):
+        return os.path.basename(self.document)
+
+    def __repr__(self):
+        return f"BatchJob({self.id}: {self.document_name}, {len(self.pages)} pages, {self.state})"
+
+
+class BatchJobTable:
+    def __init__(self, db_path):
+        """Open the batch job table"""
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(str(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batch_jobs (
+                    id INTEGER PRIMARY KEY,
+                    document TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    pages TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    remote_name TEXT,
+                    remote_state TEXT,
+                    output_file TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    page_info TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(batch_jobs)")}
+            if 'page_info' not in columns:
+                # Tables created before the render DPI was kept per page
+                self._conn.execute("ALTER TABLE batch_jobs ADD COLUMN page_info TEXT")
+
+    def create(self, document, content_hash, prompt_hash, model, pages, input_path, page_info=None):
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO batch_jobs (document, content_hash, prompt_hash, model, pages, "
+                "input_path, state, created_at, updated_at, page_info) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (document, content_hash, prompt_hash, model, json.dumps(pages),
+                 input_path, JOB_PREPARED, now, now, json.dumps(page_info or {}))
+            )
+        return self.get(cursor.lastrowid)
+
+    def update(self, job, **fields):
+        """Change columns of a job and mirror them on the object"""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE batch_jobs SET {assignments} WHERE id = ?",
+                list(fields.values()) + [job.id]
+            )
+        for name, value in fields.items():
+            setattr(job, name, value)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(BatchJob.FIELDS)} FROM batch_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return BatchJob(row) if row else None
+
+    def list(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(BatchJob.FIELDS)} FROM batch_jobs ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [BatchJob(row) for row in rows]
+
+
+class BatchAPI:
+    def __init__(self, api_key, base_url, timeout=600):
+        """Client for the Gemini Files and Batch endpoints"""
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.logger = logging.getLogger('BatchAPI')
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _check(self, response, action):
+        if response.status >= 300:
+            text = await response.text()
+            raise BatchError(f"{action} failed: {response.status} - {text[:200]}")
+
+    async def upload_file(self, path, display_name):
+        """Upload a JSONL input file (resumable protocol); returns its file name"""
+        session = await self._get_session()
+        size = os.path.getsize(path)
+        headers = {
+            'X-Goog-Upload-Protocol': 'resumable',
+            'X-Goog-Upload-Command': 'start',
+            'X-Goog-Upload-Header-Content-Length': str(size),
+            'X-Goog-Upload-Header-Content-Type': 'application/jsonl',
+        }
+        async with session.post(
+            f"{self.base_url}/upload/v1beta/files?key={self.api_key}",
+            headers=headers, json={'file': {'display_name': display_name}}
+        ) as response:
+            await self._check(response, "Upload start")
+            upload_url = response.headers.get('X-Goog-Upload-URL')
+        if not upload_url:
+            raise BatchError("Upload start returned no upload URL")
+
+        headers = {'X-Goog-Upload-Offset': '0', 'X-Goog-Upload-Command': 'upload, finalize'}
+        with open(path, 'rb') as f:
+            async with session.post(upload_url, headers=headers, data=f) as response:
+                await self._check(response, "Upload")
+                data = await response.json(content_type=None)
+        file_name = data['file']['name']
+        self.logger.info(f"Uploaded {os.path.basename(path)} ({size:,} bytes) as {file_name}")
+        return file_name
+
+    async def create_batch(self, model, file_name, display_name):
+        """Submit a batch job reading its requests from an uploaded file; returns the job name"""
+        session = await self._get_session()
+        body = {'batch': {'display_name': display_name, 'input_config': {'file_name': file_name}}}
+        async with session.post(
+            f"{self.base_url}/v1beta/models/{model}:batchGenerateContent?key={self.api_key}", json=body
+        ) as response:
+            await self._check(response, "Batch submission")
+            data = await response.json(content_type=None)
+        return data['name']
+
+    async def get_batch(self, name):
+        """Current state of a job: (state, responses file name or None)"""
+        session = await self._get_session()
+        async with session.get(f"{self.base_url}/v1beta/{name}?key={self.api_key}") as response:
+            await self._check(response, "Batch status")
+            data = await response.json(content_type=None)
+        metadata = data.get('metadata', {})
+        state = metadata.get('state') or data.get('state')
+        output = data.get('response') or metadata.get('output') or {}
+        return state, output.get('responsesFile')
+
+    async def download_file(self, file_name):
+        """Contents of a result file"""
+        session = await self._get_session()
+        async with session.get(
+            f"{self.base_url}/download/v1beta/{file_name}:download?alt=media&key={self.api_key}"
+        ) as response:
+            await self._check(response, "Result download")
+            return await response.read()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class BatchRunner:
+    def __init__(self, store, gemini, okular, jobs=None, api=None, ledger=None):
+        """
+        Prepare, submit and ingest batch jobs
+        store: VocabularyStore results go to; gemini: GeminiClient (model,
+        prompt and response parsing); okular: OkularInterface for rendering
+        """
+        config = get_config()
+        self.store = store
+        self.gemini = gemini
+        self.okular = okular
+        self.batch_dir = config.get_batch_dir()
+        self.jobs = jobs or BatchJobTable(self.batch_dir / "batch_jobs.db")
+        self.api = api or BatchAPI(gemini.api_key, config.get_batch_api_base())
+        self.ledger = ledger or get_token_ledger()
+        self.logger = logging.getLogger('BatchRunner')
+
+    def prepare(self, pdf_path, pages=None, on_progress=None):
+        """
+        Write the page requests of a PDF to a JSONL input file
+        Pages already stored for this content, prompt and model are skipped.
+        The render DPI and page hash of each request are kept with the job
+        and stored with its results.
+        Returns the new job, or None if there is nothing left to analyze.
+        """
+        pdf_path = os.path.abspath(pdf_path)
+        content_hash = file_content_hash(pdf_path)
+        page_prompt_hash = prompt_hash(get_config().get_page_analysis_prompt())
+        model = self.gemini.router.primary('batch')
+        stored_models = self.gemini.router.models(*PAGE_OPERATIONS)
+
+        if pages is None:
+            pages = list(range(1, self.okular.get_page_count(pdf_path) + 1))
+        todo = [p for p in pages
+                if self.store.get_cached_page(content_hash, p, page_prompt_hash, stored_models) is None]
+        if not todo:
+            self.logger.info("Every requested page is already analyzed")
+            return None
+
+        os.makedirs(self.batch_dir, exist_ok=True)
+        input_path = str(self.batch_dir / f"{content_hash[:12]}-{int(time.time())}.jsonl")
+        page_info = {}
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for number, page in enumerate(todo, start=1):
+                page_text = self.okular.get_page_text(pdf_path, page)
+                image = None
+                dpi = None
+                if page_text:
+                    this_page_hash = page_hash(page_text)
+                else:
+                    dpi = self.okular.choose_dpi(pdf_path, page)
+                    rendered = self.okular.render_page_to_image(pdf_path, page, dpi)
+                    this_page_hash = page_hash(image=rendered)
+                    image = PagePayload.from_image(rendered)
+                page_info[str(page)] = {'dpi': dpi, 'page_hash': this_page_hash}
+                request = self.gemini.build_page_request(image, page_text=page_text)
+                f.write(json.dumps({'key': f"page-{page}", 'request': request}, ensure_ascii=False))
+                f.write("\n")
+                if on_progress:
+                    on_progress(number, len(todo))
+
+        job = self.jobs.create(pdf_path, content_hash, page_prompt_hash, model, todo, input_path, page_info)
+        self.logger.info(f"Prepared {job} in {input_path}")
+        return job
+
+    async def submit(self, job):
+        """Upload the input file and create the remote job"""
+        self.ledger.check('batch')
+        display_name = f"tamil-assistant-{job.id}-{job.document_name}"
+        file_name = await self.api.upload_file(job.input_path, display_name)
+        remote_name = await self.api.create_batch(job.model, file_name, display_name)
+        self.jobs.update(job, state=JOB_SUBMITTED, remote_name=remote_name, error=None)
+        self.logger.info(f"Submitted {job} as {remote_name}")
+
+    async def wait(self, job, poll_interval=None, on_status=None):
+        """Poll until the remote job finishes; returns its final state"""
+        poll_interval = poll_interval or get_config().get_batch_poll_interval()
+        while True:
+            state, responses_file = await self.api.get_batch(job.remote_name)
+            if state != job.remote_state:
+                self.jobs.update(job, remote_state=state)
+                if on_status:
+                    on_status(job, state)
+            if state in TERMINAL_STATES:
+                break
+            await asyncio.sleep(poll_interval)
+
+        if state == STATE_SUCCEEDED and responses_file:
+            self.jobs.update(job, state=JOB_SUCCEEDED, output_file=responses_file)
+        else:
+            self.jobs.update(job, state=JOB_FAILED, error=f"Remote job ended in {state}")
+        return state
+
+    async def ingest(self, job):
+        """
+        Download results and store every page's words
+        Returns (pages stored, pages failed)
+        """
+        content = await self.api.download_file(job.output_file)
+        stored = 0
+        failed = 0
+        for line in content.decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            try:
+                result = json.loads(line)
+                page = int(result['key'].split('-', 1)[1])
+                if 'error' in result:
+                    raise BatchError(result['error'].get('message', 'request failed'))
+                words, sent, received, finish_reason = self.gemini.words_from_response(result['response'])
+                self.ledger.record('batch', sent, received, job.document, job.model)
+                if finish_reason == 'MAX_TOKENS':
+                    self.logger.warning(f"Page {page}: word list truncated at the output limit")
+                # Jobs prepared before page_info was kept have neither
+                info = job.page_info.get(str(page), {})
+                self.store.record_analysis(
+                    job.document, page, words, job.model,
+                    content_hash=job.content_hash, prompt_hash=job.prompt_hash,
+                    dpi=info.get('dpi'), page_hash=info.get('page_hash')
+                )
+                stored += 1
+            except Exception as e:
+                self.logger.warning(f"Batch result skipped ({line[:60]}...): {e}")
+                failed += 1
+
+        self.store.flush()
+        self.jobs.update(job, state=JOB_INGESTED, error=f"{failed} pages failed" if failed else None)
+        self.logger.info(f"Ingested {job}: {stored} pages stored, {failed} failed")
+        return stored, failed
+
+    async def resume(self, job, wait=True, on_status=None):
+        """
+        Continue a job from whatever step it reached
+        Returns the job; its state tells how far it got
+        """
+        if job.state == JOB_PREPARED:
+            await self.submit(job)
+        if job.state == JOB_SUBMITTED and wait:
+            await self.wait(job, on_status=on_status)
+        if job.state == JOB_SUCCEEDED:
+            await self.ingest(job)
+        return job
+
+    async def close(self):
+        await self.api.close()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini Batch API
+Implements the file upload, batch creation, status and download endpoints
+used by batch_jobs, with jobs moving PENDING -> RUNNING -> SUCCEEDED after
+a delay and a canned word list for every request. Set [batch] api_base to
+http://localhost:PORT to test batch mode without a key or quota.
+
+    python -m tamil_assistant.batch_stub_server --port 8765 --delay 2
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import time
+
+from aiohttp import web
+
+CANNED_WORDS = [
+    {"tamil_word": "புத்தகம்", "literal_translation": "book", "contextual_meaning": "book",
+     "sentence_context": "புத்தகம் படி"},
+    {"tamil_word": "படி", "literal_translation": "read, study", "contextual_meaning": "read (imperative)",
+     "sentence_context": "புத்தகம் படி"},
+]
+
+
+class BatchStubServer:
+    def __init__(self, delay=2.0):
+        """In-memory files and jobs; jobs finish delay seconds after creation"""
+        self.delay = delay
+        self.files = {}
+        self.uploads = {}
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self.logger = logging.getLogger('BatchStubServer')
+
+    def app(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post('/upload/v1beta/files', self.start_upload)
+        app.router.add_post('/upload/session/{upload_id}', self.finish_upload)
+        app.router.add_post('/v1beta/models/{model}:batchGenerateContent', self.create_batch)
+        app.router.add_get('/v1beta/batches/{batch_id}', self.get_batch)
+        app.router.add_get('/download/v1beta/files/{file_id}:download', self.download)
+        return app
+
+    async def start_upload(self, request):
+        upload_id = str(next(self._ids))
+        self.uploads[upload_id] = (await request.json()).get('file', {}).get('display_name', '')
+        url = f"{request.scheme}://{request.host}/upload/session/{upload_id}"
+        return web.json_response({}, headers={'X-Goog-Upload-URL': url})
+
+    async def finish_upload(self, request):
+        upload_id = request.match_info['upload_id']
+        if upload_id not in self.uploads:
+            return web.json_response({'error': {'message': 'unknown upload'}}, status=404)
+        name = f"files/upload-{upload_id}"
+        self.files[name] = await request.read()
+        self.logger.info(f"Stored {name} ({len(self.files[name]):,} bytes)")
+        return web.json_response({'file': {'name': name, 'displayName': self.uploads.pop(upload_id)}})
+
+    async def create_batch(self, request):
+        body = await request.json()
+        file_name = body['batch']['input_config']['file_name']
+        if file_name not in self.files:
+            return web.json_response({'error': {'message': f'{file_name} not found'}}, status=400)
+        name = f"batches/stub-{next(self._ids)}"
+        self.jobs[name] = {'file': file_name, 'created': time.monotonic()}
+        self.logger.info(f"Created {name} from {file_name}")
+        return web.json_response({'name': name, 'metadata': {'state': 'BATCH_STATE_PENDING'}})
+
+    async def get_batch(self, request):
+        name = f"batches/{request.match_info['batch_id']}"
+        job = self.jobs.get(name)
+        if job is None:
+            return web.json_response({'error': {'message': f'{name} not found'}}, status=404)
+
+        elapsed = time.monotonic() - job['created']
+        if elapsed < self.delay / 2:
+            return web.json_response({'name': name, 'metadata': {'state': 'BATCH_STATE_PENDING'}})
+        if elapsed < self.delay:
+            return web.json_response({'name': name, 'metadata': {'state': 'BATCH_STATE_RUNNING'}})
+
+        output = job.get('output')
+        if output is None:
+            output = job['output'] = self._write_results(name, job['file'])
+        return web.json_response({
+            'name': name, 'done': True,
+            'metadata': {'state': 'BATCH_STATE_SUCCEEDED'},
+            'response': {'responsesFile': output},
+        })
+
+    def _write_results(self, name, input_file):
+        """Canned response for every line of the input file"""
+        lines = []
+        for line in self.files[input_file].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            key = json.loads(line)['key']
+            text = json.dumps(CANNED_WORDS, ensure_ascii=False)
+            lines.append(json.dumps({'key': key, 'response': {
+                'candidates': [{'content': {'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': {'promptTokenCount': 1000, 'candidatesTokenCount': 100},
+            }}, ensure_ascii=False))
+        output = f"files/{name.split('/')[1]}-results"
+        self.files[output] = ("\n".join(lines) + "\n").encode('utf-8')
+        return output
+
+    async def download(self, request):
+        name = f"files/{request.match_info['file_id']}"
+        if name not in self.files:
+            return web.json_response({'error': {'message': f'{name} not found'}}, status=404)
+        return web.Response(body=self.files[name], content_type='application/jsonl')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Gemini Batch API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=2.0,
+                        help='Seconds until a job succeeds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(message)s')
+    web.run_app(BatchStubServer(args.delay).app(), host='127.0.0.1', port=args.port)
+
+
+if __name__ == '__main__':
+    main()
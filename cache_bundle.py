@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Portable analysis cache bundles for Tamil Assistant
+One person analyzes a book once; export packs every analysis and lookup of
+that PDF into a compressed bundle, and learners import it on their own
+machines. Analyses are keyed by the PDF's content hash (not its path),
+the prompt hash and the model, so imported pages are local hits.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger('CacheBundle')
+
+BUNDLE_FORMAT = 'tamil-assistant-cache'
+BUNDLE_VERSION = 1
+BUNDLE_SUFFIX = '.tacache'
+
+# Content hashes by (path, size, mtime), so a document is hashed once
+_content_hash_cache = {}
+
+
+class BundleError(Exception):
+    """Raised for unreadable, corrupt or mismatched bundles"""
+
+
+def file_content_hash(path):
+    """SHA-256 of a file's contents, memoized while the file is unchanged"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    digest = _content_hash_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        digest = sha.hexdigest()
+        _content_hash_cache[key] = digest
+    return digest
+
+
+def prompt_hash(prompt):
+    """Short stable hash of a prompt template"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+def _checksum(analyses):
+    """Integrity hash over the bundle's analyses"""
+    canonical = json.dumps(analyses, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def export_bundle(store, pdf_path, output_path=None):
+    """
+    Write every stored analysis of a PDF to a bundle
+    Returns (output path, number of analyses)
+    """
+    content_hash = file_content_hash(pdf_path)
+    # Analyses still filed under the quick key (the panel closed before the
+    # content hash was ready) move to the content hash first
+    _resolve_quick_key(store, pdf_path, content_hash)
+    analyses = store.export_analyses(os.path.abspath(pdf_path), content_hash)
+    if not analyses:
+        raise BundleError(f"No stored analyses for {os.path.basename(pdf_path)}")
+
+    if output_path is None:
+        output_path = os.path.splitext(os.path.basename(pdf_path))[0] + BUNDLE_SUFFIX
+
+    bundle = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'created_at': time.time(),
+        'document': {
+            'name': os.path.basename(pdf_path),
+            'content_hash': content_hash,
+        },
+        'checksum': _checksum(analyses),
+        'analyses': analyses,
+    }
+    with gzip.open(output_path, 'wt', encoding='utf-8') as f:
+        json.dump(bundle, f, ensure_ascii=False)
+
+    logger.info(f"Exported {len(analyses)} analyses of {bundle['document']['name']} to {output_path}")
+    return output_path, len(analyses)
+
+
+def read_bundle(bundle_path):
+    """Load and verify a bundle; raises BundleError if it is not intact"""
+    try:
+        with gzip.open(bundle_path, 'rt', encoding='utf-8') as f:
+            bundle = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        raise BundleError(f"Cannot read bundle {bundle_path}: {e}")
+
+    if not isinstance(bundle, dict) or bundle.get('format') != BUNDLE_FORMAT:
+        raise BundleError(f"{bundle_path} is not a Tamil Assistant cache bundle")
+    if bundle.get('version', 0) > BUNDLE_VERSION:
+        raise BundleError(f"Bundle version {bundle['version']} is newer than this Tamil Assistant")
+
+    analyses = bundle.get('analyses')
+    if not isinstance(analyses, list) or _checksum(analyses) != bundle.get('checksum'):
+        raise BundleError(f"Bundle {bundle_path} is corrupt (checksum mismatch)")
+
+    for entry in analyses:
+        if not all(key in entry for key in ('page', 'kind', 'model', 'created_at', 'prompt_hash', 'words')):
+            raise BundleError(f"Bundle {bundle_path} has an incomplete analysis entry")
+        if not all(isinstance(w, dict) and w.get('tamil_word') for w in entry['words']):
+            raise BundleError(f"Bundle {bundle_path} has an invalid word entry")
+    return bundle
+
+
+def _resolve_quick_key(store, pdf_path, content_hash):
+    """Let the store know the content hash of a PDF's quick key"""
+    # Imported here: fingerprint builds on this module
+    from tamil_assistant.fingerprint import is_quick_key, quick_key
+    key = quick_key(pdf_path)
+    if is_quick_key(key):
+        store.set_document_key(key, content_hash)
+
+
+def import_bundle(store, bundle_path, pdf_path=None):
+    """
+    Merge a bundle into the store
+    With pdf_path the bundle must belong to that file (same content hash)
+    and analyses are filed under the local path. Returns (document name,
+    analyses added, analyses in bundle).
+    """
+    bundle = read_bundle(bundle_path)
+    document = bundle['document']
+    content_hash = document['content_hash']
+
+    if pdf_path is not None:
+        if file_content_hash(pdf_path) != content_hash:
+            raise BundleError(
+                f"Bundle is for '{document['name']}', which differs from {os.path.basename(pdf_path)}"
+            )
+        # Otherwise the panel's first click, keyed by the quick key until
+        # the file is hashed, would miss the imported analyses
+        _resolve_quick_key(store, pdf_path, content_hash)
+        document_path = os.path.abspath(pdf_path)
+    else:
+        document_path = document['name']
+
+    added = store.import_analyses(document_path, content_hash, bundle['analyses'])
+    return document['name'], added, len(bundle['analyses'])
@@ -67,6 +67,13 @@ dbus_path = /okular
 [prompts]
 page_analysis_prompt_file = prompts/page_analysis.txt
 word_lookup_prompt_file = prompts/word_lookup.txt
+
+[storage]
+database_file = ~/.local/share/tamil-assistant/vocabulary.db
+
+[budget]
+daily_soft_limit = 0
+daily_hard_limit = 0
 """
         try:
             with open(self.config_path, 'w') as f:
@@ -136,6 +143,59 @@ word_lookup_prompt_file = prompts/word_lookup.txt
         """Get Gemini model name"""
         return self.config.get('gemini', 'model', fallback='gemini-2.0-flash-exp')
 
+    def get_max_concurrent_requests(self):
+        """Maximum Gemini requests in flight at once"""
+        return self.config.getint('gemini', 'max_concurrent_requests', fallback=4)
+
+    def get_hedging_enabled(self):
+        """Whether slow interactive requests get a second, identical request"""
+        return self.config.getboolean('gemini', 'hedge_requests', fallback=False)
+
+    def get_hedge_percentile(self):
+        """Latency percentile of a route after which a request is hedged"""
+        return self.config.getfloat('gemini', 'hedge_percentile', fallback=95)
+
+    def get_hedge_min_delay(self):
+        """Seconds a request always gets before it is hedged"""
+        return self.config.getfloat('gemini', 'hedge_min_delay', fallback=2.0)
+
+    def get_max_continuations(self):
+        """Maximum continuation requests when a page response is truncated"""
+        return self.config.getint('gemini', 'max_continuations', fallback=3)
+
+    def get_two_tier_enabled(self):
+        """Whether pages are listed by a quick first pass and explained lazily"""
+        return self.config.getboolean('gemini', 'two_tier', fallback=False)
+
+    def get_details_batch_size(self):
+        """Words explained per details request in two-tier analysis"""
+        return self.config.getint('gemini', 'details_batch_size', fallback=20)
+
+    def get_known_vocabulary_enabled(self):
+        """Whether page prompts list words already explained in this book"""
+        return self.config.getboolean('gemini', 'known_vocabulary', fallback=False)
+
+    def get_known_vocabulary_limit(self):
+        """Maximum number of known words sent with a page prompt"""
+        return self.config.getint('gemini', 'known_vocabulary_limit', fallback=150)
+
+    # Model Routing Configuration
+    def get_operation_model(self, operation):
+        """Model of one operation ([models] entry), or None to use the default model"""
+        return self.config.get('models', operation, fallback='').strip() or None
+
+    def get_fallback_model(self):
+        """Faster model used while a routed model is overloaded or slow (None = no fallback)"""
+        return self.config.get('models', 'fallback', fallback='').strip() or None
+
+    def get_latency_slo(self, operation):
+        """Latency SLO of an operation in seconds (0 = none)"""
+        return self.config.getfloat('models', f'{operation}_slo', fallback=0)
+
+    def get_fallback_cooldown(self):
+        """Seconds a degraded model's operations stay on the fallback model"""
+        return self.config.getfloat('models', 'fallback_cooldown', fallback=120)
+
     # UI Configuration
     def get_window_width(self):
         """Get window width"""
@@ -162,6 +222,218 @@ word_lookup_prompt_file = prompts/word_lookup.txt
         """Get Okular D-Bus path"""
         return self.config.get('okular', 'dbus_path', fallback='/okular')
 
+    def get_use_text_layer(self):
+        """Whether to analyze a PDF's embedded text layer instead of rendering"""
+        return self.config.getboolean('okular', 'use_text_layer', fallback=True)
+
+    def get_spread_mode(self):
+        """Whether Analyze Page starts with two facing pages (N and N+1) selected"""
+        return self.config.getboolean('okular', 'spread_mode', fallback=False)
+
+    def get_text_layer_min_tamil_chars(self):
+        """Minimum Tamil characters for a page's text layer to be used"""
+        return self.config.getint('okular', 'text_layer_min_tamil_chars', fallback=20)
+
+    # Render Configuration
+    def get_render_dpi(self):
+        """Fixed render DPI, or None to choose it per document ('auto')"""
+        value = self.config.get('render', 'dpi', fallback='auto').strip().lower()
+        return None if value == 'auto' else int(value)
+
+    def get_render_min_dpi(self):
+        """Lowest DPI automatic selection may choose"""
+        return self.config.getint('render', 'min_dpi', fallback=100)
+
+    def get_render_max_dpi(self):
+        """Highest DPI automatic selection may choose"""
+        return self.config.getint('render', 'max_dpi', fallback=300)
+
+    def get_render_target_line_px(self):
+        """Height in pixels the smaller text lines should have when rendered"""
+        return self.config.getint('render', 'target_line_px', fallback=40)
+
+    # Storage Configuration
+    def get_database_path(self):
+        """Get vocabulary database path"""
+        default = Path.home() / ".local" / "share" / "tamil-assistant" / "vocabulary.db"
+        path = self.config.get('storage', 'database_file', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    def get_lookup_cache_enabled(self):
+        """Whether lookups reuse stored explanations of the same word or its inflections"""
+        return self.config.getboolean('storage', 'lookup_cache', fallback=True)
+
+    def get_page_cache_enabled(self):
+        """Whether page analysis reuses a stored analysis of the same page, prompt and model"""
+        return self.config.getboolean('storage', 'page_cache', fallback=True)
+
+    def get_token_ledger_path(self):
+        """Get token ledger database path"""
+        default = self.get_database_path().parent / "token_usage.db"
+        path = self.config.get('storage', 'token_ledger_file', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    # Offline Queue Configuration
+    def get_offline_queue_enabled(self):
+        """Whether requests that fail for lack of a connection are queued for replay"""
+        return self.config.getboolean('offline', 'enabled', fallback=True)
+
+    def get_offline_queue_path(self):
+        """Offline request queue database path"""
+        default = self.get_database_path().parent / "offline_queue.db"
+        path = self.config.get('offline', 'queue_file', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    def get_offline_retry_max(self):
+        """Longest wait in seconds between replay attempts while offline"""
+        return self.config.getfloat('offline', 'retry_max_seconds', fallback=300)
+
+    def get_offline_max_age(self):
+        """Seconds after which a queued request is dropped"""
+        return self.config.getfloat('offline', 'max_age_hours', fallback=24) * 3600
+
+    # Batch Configuration
+    def get_batch_api_base(self):
+        """Base URL of the Gemini API used for batch jobs (a local stand-in for testing)"""
+        base = self.config.get('batch', 'api_base', fallback='https://generativelanguage.googleapis.com')
+        return base.rstrip('/')
+
+    def get_batch_poll_interval(self):
+        """Seconds between batch job status checks"""
+        return self.config.getint('batch', 'poll_interval', fallback=30)
+
+    def get_batch_dir(self):
+        """Directory for batch input files and the batch job table"""
+        default = self.get_database_path().parent / "batches"
+        path = self.config.get('batch', 'batch_dir', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    # Debug Configuration
+    def get_watchdog_enabled(self):
+        """Whether main-loop stalls are detected and logged"""
+        return self.config.getboolean('debug', 'watchdog', fallback=True)
+
+    def get_stall_threshold(self):
+        """Main-loop stall threshold in seconds (configured in milliseconds)"""
+        return self.config.getint('debug', 'stall_threshold_ms', fallback=250) / 1000
+
+    def get_profiling_enabled(self):
+        """Whether page analysis, lookups and list updates are profiled"""
+        return self.config.getboolean('debug', 'profile', fallback=False)
+
+    # Service Configuration
+    def get_service_enabled(self):
+        """Whether the panel is exposed on the session bus for tamil-assistant-ctl"""
+        return self.config.getboolean('service', 'enabled', fallback=True)
+
+    # API Server Configuration
+    def get_server_host(self):
+        """Address the API server listens on"""
+        return self.config.get('server', 'host', fallback='127.0.0.1')
+
+    def get_server_port(self):
+        """Port the API server listens on"""
+        return self.config.getint('server', 'port', fallback=8766)
+
+    def get_server_documents_dir(self):
+        """Directory of PDFs that API requests may name (None = uploads only)"""
+        path = self.config.get('server', 'documents_dir', fallback='').strip()
+        return os.path.expanduser(path) if path else None
+
+    def get_server_upload_dir(self):
+        """Directory for PDFs and page images uploaded to the API server"""
+        default = self.get_database_path().parent / "uploads"
+        path = self.config.get('server', 'upload_dir', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    def get_server_usage_path(self):
+        """Per-client API usage database path"""
+        default = self.get_database_path().parent / "server_usage.db"
+        path = self.config.get('server', 'usage_file', fallback=str(default))
+        return Path(os.path.expanduser(path))
+
+    def get_server_clients(self):
+        """API clients as {token: name}, from 'name:token, ...' (empty = no authentication)"""
+        clients = {}
+        for entry in self.config.get('server', 'clients', fallback='').split(','):
+            name, _, token = entry.strip().partition(':')
+            if name and token:
+                clients[token.strip()] = name.strip()
+        return clients
+
+    def get_client_daily_requests(self):
+        """Daily analyses and lookups per API client (0 = no limit)"""
+        return self.config.getint('server', 'daily_requests', fallback=0)
+
+    def get_client_daily_tokens(self):
+        """Daily Gemini tokens per API client (0 = no limit)"""
+        return self.config.getint('server', 'daily_tokens', fallback=0)
+
+    def get_client_max_concurrency(self):
+        """Requests of one API client handled at the same time"""
+        return max(1, self.config.getint('server', 'max_client_concurrency', fallback=2))
+
+    # Budget Configuration
+    def get_daily_soft_limit(self):
+        """Daily token count at which background work pauses (0 = no limit)"""
+        return self.config.getint('budget', 'daily_soft_limit', fallback=0)
+
+    def get_daily_hard_limit(self):
+        """Daily token count at which all requests stop (0 = no limit)"""
+        return self.config.getint('budget', 'daily_hard_limit', fallback=0)
+
+    # OCR Configuration
+    def get_ocr_enabled(self):
+        """Whether to run the local OCR pre-pass before page analysis"""
+        return self.config.getboolean('ocr', 'enabled', fallback=False)
+
+    def get_ocr_language(self):
+        """Tesseract language(s) for the OCR pre-pass"""
+        return self.config.get('ocr', 'language', fallback='tam')
+
+    def get_ocr_min_confidence(self):
+        """Mean word confidence (0-100) needed to send text instead of the image"""
+        return self.config.getfloat('ocr', 'min_confidence', fallback=75.0)
+
+    def get_ocr_min_tamil_chars(self):
+        """Minimum recognised Tamil characters needed to send text instead of the image"""
+        return self.config.getint('ocr', 'min_tamil_chars', fallback=20)
+
+    def get_ocr_workers(self):
+        """Number of OCR worker processes"""
+        return self.config.getint('ocr', 'workers', fallback=2)
+
+    # Tiling Configuration
+    def get_tiling_enabled(self):
+        """Whether dense pages are analyzed as concurrent overlapping regions"""
+        return self.config.getboolean('tiling', 'enabled', fallback=False)
+
+    def get_tiling_max_tiles(self):
+        """Maximum number of regions per page"""
+        return self.config.getint('tiling', 'max_tiles', fallback=4)
+
+    def get_tiling_overlap(self):
+        """Overlap between neighbouring regions, in pixels"""
+        return self.config.getint('tiling', 'overlap', fallback=40)
+
+    def get_tiling_summary_max_side(self):
+        """Longest side of the downscaled page sent for the poem summary"""
+        return self.config.getint('tiling', 'summary_max_side', fallback=1024)
+
+    # Lookup Configuration
+    def get_lookup_crop_enabled(self):
+        """Whether lookups send only the region around the selected word"""
+        return self.config.getboolean('lookup', 'crop_to_word', fallback=True)
+
+    def get_lookup_crop_context(self):
+        """Region sent with a lookup: 'paragraph' or 'line' (with a line either side)"""
+        context = self.config.get('lookup', 'crop_context', fallback='paragraph')
+        return context if context in ('paragraph', 'line') else 'paragraph'
+
+    def get_lookup_crop_padding(self):
+        """Padding around the lookup region, as a fraction of the page width"""
+        return self.config.getfloat('lookup', 'crop_padding', fallback=0.02)
+
     # Prompt Configuration
     def get_page_analysis_prompt(self):
         """Get page analysis prompt"""
@@ -173,8 +445,50 @@ word_lookup_prompt_file = prompts/word_lookup.txt
         prompt_file = self.config.get('prompts', 'word_lookup_prompt_file', fallback='prompts/word_lookup.txt')
         return self._load_prompt_file(prompt_file)
 
-    def _load_prompt_file(self, prompt_file):
+    def get_known_vocabulary_prompt(self):
+        """Get known vocabulary prompt template (appended to page prompt)"""
+        prompt_file = self.config.get('prompts', 'known_vocabulary_prompt_file', fallback='prompts/known_vocabulary.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_known_vocabulary_prompt)
+
+    def get_page_text_prompt(self):
+        """Get page text prompt template (replaces the image in text-only requests)"""
+        prompt_file = self.config.get('prompts', 'page_text_prompt_file', fallback='prompts/page_text.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_page_text_prompt)
+
+    def get_page_tile_prompt(self):
+        """Get page tile prompt template (appended to page prompt for each region)"""
+        prompt_file = self.config.get('prompts', 'page_tile_prompt_file', fallback='prompts/page_tile.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_page_tile_prompt)
+
+    def get_page_summary_prompt(self):
+        """Get page summary prompt (poem summary for tiled analysis)"""
+        prompt_file = self.config.get('prompts', 'page_summary_prompt_file', fallback='prompts/page_summary.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_page_summary_prompt)
+
+    def get_page_spread_prompt(self):
+        """Get page spread prompt template (appended to page prompt for two facing pages)"""
+        prompt_file = self.config.get('prompts', 'page_spread_prompt_file', fallback='prompts/page_spread.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_page_spread_prompt)
+
+    def get_page_quick_prompt(self):
+        """Get quick first-pass prompt (appended to page prompt in two-tier analysis)"""
+        prompt_file = self.config.get('prompts', 'page_quick_prompt_file', fallback='prompts/page_quick.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_page_quick_prompt)
+
+    def get_word_details_prompt(self):
+        """Get word details prompt template (appended to page prompt in two-tier analysis)"""
+        prompt_file = self.config.get('prompts', 'word_details_prompt_file', fallback='prompts/word_details.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_word_details_prompt)
+
+    def get_continuation_prompt(self):
+        """Get continuation prompt template (resume a truncated word list)"""
+        prompt_file = self.config.get('prompts', 'continuation_prompt_file', fallback='prompts/continuation.txt')
+        return self._load_prompt_file(prompt_file, self._get_default_continuation_prompt)
+
+    def _load_prompt_file(self, prompt_file, default=None):
         """Load prompt from file"""
+        if default is None:
+            default = self._get_default_page_prompt if 'page_analysis' in prompt_file else self._get_default_word_prompt
         try:
             # Try user prompts directory first
             user_prompts_dir = Path.home() / ".config" / "tamil-assistant" / "prompts"
@@ -197,18 +511,12 @@ word_lookup_prompt_file = prompts/word_lookup.txt
                     return f.read().strip()
             
             # Fall back to defaults
-            if 'page_analysis' in prompt_file:
-                return self._get_default_page_prompt()
-            else:
-                return self._get_default_word_prompt()
+            return default()
                 
         except Exception as e:
             print(f"Warning: Could not load prompt file {prompt_file}: {e}")
             # Fall back to defaults
-            if 'page_analysis' in prompt_file:
-                return self._get_default_page_prompt()
-            else:
-                return self._get_default_word_prompt()
+            return default()
 
     def _get_default_page_prompt(self):
         """Default page analysis prompt if not in config"""
@@ -290,6 +598,116 @@ CRITICAL RULES:
 - Do NOT add any text before or after
 - Start directly with { and end with }"""
 
+    def _get_default_known_vocabulary_prompt(self):
+        """Default known vocabulary prompt if not in config"""
+        return """ALREADY EXPLAINED WORDS:
+The student has already learned these words from earlier pages of this book:
+{known_words}
+
+For every word from this list that appears on the page, do NOT explain it again.
+Add only a short reference entry in its place in the JSON array:
+  {{
+    "tamil_word": "the word exactly as written in the list above",
+    "known": true,
+    "sentence_context": "the full sentence where it appears on this page"
+  }}
+
+Give a full entry (literal_translation, contextual_meaning) only for words that
+are NOT in the list, or when a listed word clearly has a different meaning on
+this page."""
+
+    def _get_default_page_text_prompt(self):
+        """Default page text prompt if not in config"""
+        return """NOTE: No image is attached for this page. Its text was extracted locally and is
+given below between the markers. Treat it exactly as if you were reading the page
+image: analyze every Tamil word in it and follow all of the rules above.
+
+--- PAGE TEXT START ---
+{page_text}
+--- PAGE TEXT END ---"""
+
+    def _get_default_page_tile_prompt(self):
+        """Default page tile prompt if not in config"""
+        return """REGION {index} OF {total}:
+This image is one region of a larger page, cut along blank space (left column
+first, then top to bottom). Neighbouring regions overlap slightly.
+- Analyze only the Tamil words visible in this region
+- Words cut off at the edge of the region may be skipped; they appear whole in
+  the neighbouring region
+- Do NOT add a POEM_SUMMARY entry; the page summary is requested separately"""
+
+    def _get_default_page_quick_prompt(self):
+        """Default quick first-pass prompt if not in config"""
+        return """FAST FIRST PASS:
+This pass only lists the words so the student sees them quickly; the
+explanations are requested separately. Override the rules above as follows:
+- Give "tamil_word", "literal_translation" (a few words) and "sentence_context"
+  for every Tamil word
+- Set "contextual_meaning" to an empty string ""
+- No grammar notes and no Wikipedia links
+- If the page contains a poem or song, still add the POEM_SUMMARY entry at the
+  END with the full poem text in "sentence_context", but leave its
+  "contextual_meaning" empty \"\""""
+
+    def _get_default_word_details_prompt(self):
+        """Default word details prompt if not in config"""
+        return """DETAILS PASS:
+A first pass already listed the words of this page. Explain ONLY the entries
+below, following all of the rules above:
+{words}
+- Return one entry per listed item, in the same order, with the same
+  "tamil_word" and "sentence_context" as given
+- Fill in "contextual_meaning" with the full explanation (grammar notes and
+  Wikipedia links where the rules above ask for them)
+- For a POEM_SUMMARY item, "contextual_meaning" is the complete summary of the
+  poem as described above
+- Do NOT add entries for other words"""
+
+    def _get_default_page_spread_prompt(self):
+        """Default page spread prompt if not in config"""
+        return """TWO FACING PAGES:
+Pages {first_page} and {second_page} of the book are attached, each introduced by
+a "PAGE n" marker. Analyze the Tamil words of both pages and follow all of the
+rules above for each page.
+- Add a "page" field to EVERY entry with the number of the page it comes from
+  ({first_page} or {second_page})
+- A word that appears on both pages gets one entry per page
+- List the entries of page {first_page} first, then those of page {second_page}
+- A POEM_SUMMARY entry belongs to the page the poem is on and gets its "page" field too"""
+
+    def _get_default_page_summary_prompt(self):
+        """Default page summary prompt if not in config"""
+        return """Look at this Tamil textbook page as a whole.
+
+Context:
+1. The reader is a 10-year-old learning Tamil, with advanced English reading skills
+2. The textbook is based on the Tamil Nadu (India) 1st grade textbook
+
+If the page contains a poem or song, return a JSON array with exactly one entry:
+[
+  {
+    "tamil_word": "POEM_SUMMARY",
+    "literal_translation": "Poem Summary",
+    "contextual_meaning": "Complete summary of the poem including theme, message, cultural significance, and overall meaning explained for a 10-year-old with advanced English reading skills",
+    "sentence_context": "Full text of the poem in Tamil"
+  }
+]
+
+If the page has no poem or song, return an empty array: []
+
+Return ONLY the JSON array, with no markdown and no text before or after it."""
+
+    def _get_default_continuation_prompt(self):
+        """Default continuation prompt if not in config"""
+        return """Your previous answer was cut off because it reached the output length limit.
+The entries above are complete up to and including "{last_word}"
+(from the sentence: "{last_sentence}").
+
+Continue with the remaining Tamil words on the page, starting right after "{last_word}".
+- Do NOT repeat any entry that was already given
+- Follow the same rules and entry structure as before
+- Return ONLY a JSON array of the remaining entries, or [] if nothing is left"""
+
     def __str__(self):
         """String representation of config"""
         api_key = self.get_gemini_api_key()
@@ -301,6 +719,17 @@ CRITICAL RULES:
   Gemini:
     API Key: {masked_key}
     Model: {self.get_gemini_model()}
+    Max Continuations: {self.get_max_continuations()}
+    Max Concurrent Requests: {self.get_max_concurrent_requests()}
+    Hedging: {f'after p{self.get_hedge_percentile():g}' if self.get_hedging_enabled() else 'off'}
+    Two-Tier Analysis: {f'on ({self.get_details_batch_size()} words per details request)' if self.get_two_tier_enabled() else 'off'}
+    Known Vocabulary: {'on' if self.get_known_vocabulary_enabled() else 'off'} (limit {self.get_known_vocabulary_limit()})
+
+  Models:
+    Analyze Page: {self.get_operation_model('analyze_page') or 'default'}
+    Lookup: {self.get_operation_model('lookup_word') or 'default'}
+    Prefetch: {self.get_operation_model('prefetch') or 'default'}
+    Fallback: {self.get_fallback_model() or 'none'}
 
   UI:
     Window: {self.get_window_width()}x{self.get_window_height()}
@@ -310,6 +739,54 @@ CRITICAL RULES:
   Okular:
     Service: {self.get_okular_service_pattern()}
     Path: {self.get_okular_path()}
+    Use Text Layer: {self.get_use_text_layer()}
+    Spread Mode: {self.get_spread_mode()}
+
+  Render:
+    DPI: {self.get_render_dpi() or f'auto ({self.get_render_min_dpi()}-{self.get_render_max_dpi()})'}
+
+  Storage:
+    Database: {self.get_database_path()}
+    Lookup Cache: {self.get_lookup_cache_enabled()}
+    Page Cache: {self.get_page_cache_enabled()}
+    Token Ledger: {self.get_token_ledger_path()}
+
+  OCR:
+    Enabled: {self.get_ocr_enabled()}
+    Language: {self.get_ocr_language()}
+    Min Confidence: {self.get_ocr_min_confidence()}
+
+  Tiling:
+    Enabled: {self.get_tiling_enabled()}
+    Max Tiles: {self.get_tiling_max_tiles()}
+
+  Lookup:
+    Crop To Word: {self.get_lookup_crop_enabled()} ({self.get_lookup_crop_context()})
+
+  Budget:
+    Daily Soft Limit: {self.get_daily_soft_limit() or 'none'}
+    Daily Hard Limit: {self.get_daily_hard_limit() or 'none'}
+
+  Offline Queue:
+    Enabled: {self.get_offline_queue_enabled()}
+    Queue: {self.get_offline_queue_path()}
+
+  Batch:
+    API Base: {self.get_batch_api_base()}
+    Poll Interval: {self.get_batch_poll_interval()}s
+
+  Service:
+    D-Bus: {self.get_service_enabled()}
+
+  API Server:
+    Listen: {self.get_server_host()}:{self.get_server_port()}
+    Documents: {self.get_server_documents_dir() or 'uploads only'}
+    Clients: {len(self.get_server_clients()) or 'any (no tokens)'}
+    Per Client: {self.get_client_daily_requests() or 'unlimited'} requests, {self.get_client_daily_tokens() or 'unlimited'} tokens, {self.get_client_max_concurrency()} at a time
+
+  Debug:
+    Watchdog: {self.get_watchdog_enabled()} ({self.get_stall_threshold() * 1000:.0f} ms)
+    Profiling: {self.get_profiling_enabled()}
 """
 
 # Singleton instance
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Diagnostics for Tamil Assistant
+`tamil-assistant doctor` checks the environment (configuration, Okular,
+helper programs); with --bench it also times every stage of the live
+pipeline on this machine - D-Bus, rendering at several DPIs, JPEG encoding,
+DNS/TCP/TLS/first byte to the API endpoint and model latency for a fixed
+small page - and prints the stages ranked by how much they cost.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import shutil
+import socket
+import ssl
+import statistics
+import sys
+import time
+
+import aiohttp
+
+from tamil_assistant.config_manager import get_config
+from tamil_assistant.page_payload import encode_jpeg
+
+# Rendering resolutions compared by the benchmark (the panel renders at 200)
+BENCH_DPIS = (100, 150, 200, 300)
+# D-Bus round trips averaged for the call latency
+DBUS_CALLS = 5
+API_HOST = 'generativelanguage.googleapis.com'
+
+# Fixed page sent for the model latency measurement (text only, so the
+# result does not depend on the open document)
+SAMPLE_PAGE_TEXT = """அம்மா கடைக்குச் சென்றாள். அவள் காய்கறிகளும் பழங்களும் வாங்கினாள்.
+வீட்டுக்குத் திரும்பி வந்து சமையல் செய்தாள். குழந்தைகள் பள்ளியிலிருந்து வந்தனர்."""
+
+HELPER_PROGRAMS = {
+    'pdftotext': "PDF text layer (poppler)",
+    'pdfinfo': "page counts for batch mode (poppler)",
+    'pdftoppm': "page rendering (poppler)",
+    'xclip': "reading the selected text",
+    'tesseract': "local OCR pre-pass",
+}
+# Helpers whose absence only disables a feature; they do not fail the check
+OPTIONAL_PROGRAMS = {'xclip', 'tesseract'}
+
+# Advice shown for the stage that dominates the report
+HINTS = {
+    'dbus': "Okular answers D-Bus slowly; check for a second Okular instance or a busy session bus.",
+    'render': "Rendering dominates; enable use_text_layer for born-digital PDFs or render at a lower DPI.",
+    'encode': "JPEG encoding dominates; a lower render DPI shrinks both encode time and upload size.",
+    'network': "Connection setup is slow; check DNS, proxies or the route to the API endpoint.",
+    'model': "The model itself dominates; a faster model ([models] analyze_page) or smaller pages help most.",
+}
+
+
+class Measurement:
+    """One timed stage of the pipeline"""
+
+    def __init__(self, stage, name, seconds=None, detail='', error=None):
+        self.stage = stage
+        self.name = name
+        self.seconds = seconds
+        self.detail = detail
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.seconds is not None
+
+    def to_dict(self):
+        return {
+            'stage': self.stage, 'name': self.name, 'seconds': self.seconds,
+            'detail': self.detail, 'error': self.error,
+        }
+
+
+def _timed(function, *args, **kwargs):
+    """(result, seconds) of a call"""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def check_environment():
+    """
+    Quick checks that need no network; returns a list of (ok, message)
+    ok is None for a missing optional helper
+    """
+    results = []
+    try:
+        config = get_config()
+        results.append((True, f"Configuration loaded ({config.config_path})"))
+    except Exception as e:
+        return [(False, f"Configuration: {e}")]
+
+    for program, purpose in HELPER_PROGRAMS.items():
+        found = shutil.which(program)
+        if found:
+            results.append((True, f"{program}: {found} - {purpose}"))
+        elif program in OPTIONAL_PROGRAMS:
+            results.append((None, f"{program}: not found - {purpose} (optional)"))
+        else:
+            results.append((False, f"{program}: not found - {purpose}"))
+
+    try:
+        from tamil_assistant.okular_interface import OkularInterface
+        okular = OkularInterface()
+        if okular.find_okular():
+            results.append((True, f"Okular found on D-Bus ({okular.okular_service})"))
+        else:
+            results.append((False, "Okular is not running (start it to benchmark D-Bus and rendering)"))
+    except Exception as e:
+        results.append((False, f"D-Bus session bus unavailable: {e}"))
+    return results
+
+
+class Bench:
+    def __init__(self, pdf_path=None, page=None, dpis=BENCH_DPIS, model=True):
+        """
+        Pipeline benchmark
+        pdf_path/page: page to render (default: the one open in Okular)
+        model: also send the fixed sample page to Gemini (uses a few hundred tokens)
+        """
+        self.pdf_path = pdf_path
+        self.page = page
+        self.dpis = dpis
+        self.model = model
+        self.measurements = []
+        self.okular = None
+
+    def _add(self, stage, name, seconds=None, detail='', error=None):
+        measurement = Measurement(stage, name, seconds, detail, error)
+        self.measurements.append(measurement)
+        status = f"{seconds * 1000:8.1f} ms" if measurement.ok else "   failed" if error else "  skipped"
+        print(f"  {stage:<8} {name:<24} {status}  {error or detail}")
+        return measurement
+
+    def run(self):
+        """Run every stage; returns the measurements"""
+        self.bench_dbus()
+        self.bench_render()
+        asyncio.run(self.bench_network())
+        if self.model:
+            self.bench_model()
+        return self.measurements
+
+    def bench_dbus(self):
+        try:
+            from tamil_assistant.okular_interface import OkularInterface
+            self.okular = OkularInterface()
+            found, seconds = _timed(self.okular.find_okular)
+        except Exception as e:
+            self._add('dbus', 'discovery', error=str(e))
+            return
+        if not found:
+            self._add('dbus', 'discovery', seconds, error="Okular not running")
+            return
+        self._add('dbus', 'discovery', seconds, self.okular.okular_service)
+
+        samples = []
+        try:
+            for _ in range(DBUS_CALLS):
+                page, seconds = _timed(self.okular.get_current_page)
+                samples.append(seconds)
+            if self.page is None:
+                self.page = page
+            if self.pdf_path is None:
+                self.pdf_path = self.okular.get_current_document()
+            self._add('dbus', 'call (currentPage)', statistics.median(samples),
+                      f"median of {DBUS_CALLS}, max {max(samples) * 1000:.1f} ms")
+        except Exception as e:
+            self._add('dbus', 'call (currentPage)', error=str(e))
+
+    def bench_render(self):
+        if not self.pdf_path:
+            self._add('render', 'page', detail="no PDF (open one in Okular or pass --pdf)")
+            return
+        page = self.page or 1
+        if self.okular is None:
+            from tamil_assistant.okular_interface import OkularInterface
+            self.okular = OkularInterface()
+
+        text, seconds = _timed(self.okular.get_page_text, self.pdf_path, page)
+        self._add('render', 'text layer', seconds,
+                  f"{len(text)} chars (usable)" if text else "none or unusable")
+
+        for dpi in self.dpis:
+            try:
+                image, seconds = _timed(self.okular.render_page_to_image, self.pdf_path, page, dpi=dpi)
+            except Exception as e:
+                self._add('render', f"render @ {dpi} dpi", error=str(e))
+                continue
+            self._add('render', f"render @ {dpi} dpi", seconds, f"{image.width}x{image.height}")
+            jpeg, seconds = _timed(encode_jpeg, image)
+            self._add('encode', f"jpeg @ {dpi} dpi", seconds, f"{len(jpeg) // 1024} KB")
+
+    async def bench_network(self):
+        host = API_HOST
+        try:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            addresses = await loop.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+            self._add('network', 'dns', time.perf_counter() - started, addresses[0][4][0])
+
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection(addresses[0][4][0], 443)
+            self._add('network', 'tcp connect', time.perf_counter() - started)
+            writer.close()
+
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection(
+                host, 443, ssl=ssl.create_default_context(), server_hostname=host
+            )
+            self._add('network', 'tcp + tls handshake', time.perf_counter() - started,
+                      writer.get_extra_info('ssl_object').version())
+            writer.close()
+        except Exception as e:
+            self._add('network', 'connect', error=str(e))
+            return
+
+        # Time to first byte of a tokenless request (model metadata)
+        config = get_config()
+        url = f"https://{host}/v1beta/models/{config.get_gemini_model()}?key={config.get_gemini_api_key()}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                started = time.perf_counter()
+                async with session.get(url) as response:
+                    ttfb = time.perf_counter() - started
+                    await response.read()
+            self._add('network', 'first byte (new conn)', ttfb, f"HTTP {response.status}")
+        except Exception as e:
+            self._add('network', 'first byte (new conn)', error=str(e))
+
+    def bench_model(self):
+        try:
+            from tamil_assistant.gemini_client import GeminiClient
+            gemini = GeminiClient()
+            # Warm the pooled connection so the sample measures the model, not setup
+            gemini.test_connection()
+            (words, _, _, model), seconds = _timed(gemini.analyze_page, None, page_text=SAMPLE_PAGE_TEXT)
+            self._add('model', f"sample page ({model})", seconds, f"{len(words)} words")
+            gemini.close()
+        except Exception as e:
+            self._add('model', 'sample page', error=str(e))
+
+    def ranking(self):
+        """
+        Stages of one page analysis ranked by cost
+        Uses the 200 dpi render (what the panel sends) and a single
+        representative measurement per stage. Returns [(stage, seconds, share)].
+        """
+        by_name = {(m.stage, m.name): m for m in self.measurements if m.ok}
+        picks = {
+            'dbus': by_name.get(('dbus', 'call (currentPage)')),
+            'render': by_name.get(('render', 'render @ 200 dpi')),
+            'encode': by_name.get(('encode', 'jpeg @ 200 dpi')),
+            'network': by_name.get(('network', 'tcp + tls handshake')),
+        }
+        picks['model'] = next((m for m in self.measurements if m.stage == 'model' and m.ok), None)
+        costs = [(stage, m.seconds) for stage, m in picks.items() if m is not None]
+        total = sum(seconds for _, seconds in costs) or 1
+        return sorted(((stage, seconds, seconds / total) for stage, seconds in costs),
+                      key=lambda item: item[1], reverse=True)
+
+    def report(self):
+        """Everything measured, as a JSON-serializable dict"""
+        return {
+            'created_at': time.time(),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'pdf': self.pdf_path,
+            'page': self.page,
+            'measurements': [m.to_dict() for m in self.measurements],
+            'ranking': [
+                {'stage': stage, 'seconds': seconds, 'share': share}
+                for stage, seconds, share in self.ranking()
+            ],
+        }
+
+    def format_ranking(self):
+        ranking = self.ranking()
+        if not ranking:
+            return "Nothing could be measured."
+        lines = ["Bottlenecks (one page analysis):"]
+        for stage, seconds, share in ranking:
+            bar = '█' * max(1, int(share * 30))
+            lines.append(f"  {stage:<8} {seconds * 1000:9.1f} ms  {share:5.0%}  {bar}")
+        lines.append("")
+        lines.append(f"  → {HINTS[ranking[0][0]]}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tamil-assistant doctor',
+                                     description='Check and benchmark the Tamil Assistant environment')
+    parser.add_argument('--bench', action='store_true',
+                        help='Time every stage of the pipeline on this machine')
+    parser.add_argument('--json', metavar='FILE',
+                        help='With --bench: also save the report as JSON')
+    parser.add_argument('--pdf', metavar='PDF',
+                        help='PDF to render (default: the document open in Okular)')
+    parser.add_argument('--page', type=int,
+                        help='Page to render (default: the current page)')
+    parser.add_argument('--no-model', action='store_true',
+                        help='Skip the model latency measurement (spends no tokens)')
+    args = parser.parse_args(argv)
+
+    print("Tamil Assistant - Doctor")
+    print("=" * 60)
+    healthy = True
+    for ok, message in check_environment():
+        healthy = healthy and ok is not False
+        print(f"  {'✓' if ok else '-' if ok is None else '✗'} {message}")
+
+    if not args.bench:
+        return 0 if healthy else 1
+
+    print()
+    print("Benchmark:")
+    bench = Bench(args.pdf, args.page, model=not args.no_model)
+    bench.run()
+    print()
+    print(bench.format_ranking())
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(bench.report(), f, ensure_ascii=False, indent=2)
+        print(f"\n✓ Report saved to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Document and page fingerprints for the vocabulary store's cache keys
+Hashing a 300 MB scanned book on every click is too slow, so a document is
+first identified by a quick key - its size and a few sampled blocks - and
+its full SHA-256 content hash (the key shared through cache bundles) is
+computed once in the background. The store remembers which content hash a
+quick key resolved to, so a known book is identified instantly after a
+restart, and analyses recorded under the quick key meanwhile are moved to
+the content hash.
+
+Every analysis also records a hash of the page itself (its text layer or
+exact rendered pixels). When a PDF changes - annotations saved on other
+pages, a re-saved file - its content hash changes, but a page whose text
+or render is identical is still found by its page hash, at the same page
+number of a document with the same file name.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tamil_assistant.cache_bundle import file_content_hash
+from tamil_assistant.metrics import get_metrics
+from tamil_assistant.tamil_text import normalize
+
+QUICK_KEY_PREFIX = 'quick:'
+# Blocks read for a quick key, spread evenly over the file (first and last included)
+SAMPLE_BLOCKS = 16
+SAMPLE_SIZE = 64 * 1024
+
+
+def quick_key(path):
+    """
+    Cheap document key from the file size and sampled blocks
+    Files small enough to sample completely get their full content hash.
+    The modification time is not part of the key, so copies of a book
+    on other machines share it.
+    """
+    size = os.path.getsize(path)
+    if size <= SAMPLE_BLOCKS * SAMPLE_SIZE:
+        return file_content_hash(path)
+
+    sha = hashlib.sha256(str(size).encode('ascii'))
+    step = (size - SAMPLE_SIZE) // (SAMPLE_BLOCKS - 1)
+    with open(path, 'rb') as f:
+        for block in range(SAMPLE_BLOCKS):
+            f.seek(block * step)
+            sha.update(f.read(SAMPLE_SIZE))
+    return QUICK_KEY_PREFIX + sha.hexdigest()
+
+
+def is_quick_key(key):
+    return key.startswith(QUICK_KEY_PREFIX)
+
+
+def page_hash(page_text=None, image=None):
+    """
+    Hash of one page's content: its text, else its exact rendered pixels
+    (so only a render at the same resolution matches)
+    """
+    if page_text:
+        return 'text:' + hashlib.sha256(normalize(page_text).encode('utf-8')).hexdigest()
+    sha = hashlib.sha256(f"{image.mode} {image.width}x{image.height} ".encode('ascii'))
+    sha.update(image.tobytes())
+    return 'image:' + sha.hexdigest()
+
+
+class DocumentFingerprints:
+    def __init__(self, store):
+        """
+        Document identities for cache keys, memoized per path, size and
+        modification time; content hashes are resolved in the background
+        """
+        self.store = store
+        self.logger = logging.getLogger('DocumentFingerprints')
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        # (path, size, mtime_ns) -> content hash, or quick key until it is resolved
+        self._keys = {}
+        self._hashing = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fingerprint')
+
+    def identify(self, path):
+        """
+        Key of a document for the store, without reading it in full
+        The content hash when known, otherwise the quick key while the
+        content hash is computed in the background (blocking; call from
+        an executor).
+        """
+        memo = self._memo_key(path)
+        with self._lock:
+            key = self._keys.get(memo)
+        if key is not None:
+            return key
+
+        quick = quick_key(path)
+        key = quick
+        if is_quick_key(quick):
+            content_hash = self.store.get_document_key(quick)
+            if content_hash:
+                self.metrics.increment("fingerprint.known")
+                key = content_hash
+            else:
+                self._resolve_later(memo, path, quick)
+        with self._lock:
+            self._keys.setdefault(memo, key)
+            return self._keys[memo]
+
+    def content_hash(self, path):
+        """Full content hash of a document (blocking), resolving its quick key"""
+        memo = self._memo_key(path)
+        with self._lock:
+            key = self._keys.get(memo)
+        if key is not None and not is_quick_key(key):
+            return key
+        return self._resolve(memo, path, quick_key(path))
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _memo_key(self, path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def _resolve_later(self, memo, path, quick):
+        with self._lock:
+            if memo in self._hashing:
+                return
+            self._hashing.add(memo)
+        self._executor.submit(self._resolve, memo, path, quick)
+
+    def _resolve(self, memo, path, quick):
+        """Hash a document in full and move its quick-key analyses to the content hash"""
+        try:
+            content_hash = file_content_hash(path)
+            if is_quick_key(quick):
+                # Analyses still in flight under the quick key are rekeyed
+                # by the store when they are written
+                moved = self.store.set_document_key(quick, content_hash)
+                self.metrics.increment("fingerprint.resolved")
+                self.logger.info(f"Content hash of {os.path.basename(path)} ready ({moved} analyses rekeyed)")
+            with self._lock:
+                self._keys[memo] = content_hash
+            return content_hash
+        except Exception as e:
+            self.logger.warning(f"Could not hash {os.path.basename(path)}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._hashing.discard(memo)
@@ -2,35 +2,72 @@
 """
 Google Gemini REST API client for Tamil text analysis
 Uses direct HTTP requests - based on working portfolio implementation
+Async API on aiohttp; the blocking methods are thin wrappers around it
 """
 
-import requests
+import aiohttp
+import asyncio
 import base64
+import hashlib
 import json
-import io
 import html
 import logging
-from PIL import Image
+import time
+from collections import Counter
 from tamil_assistant.config_manager import get_config
+from tamil_assistant.async_bridge import get_event_loop_thread
+from tamil_assistant.page_tiling import find_tiles, downscale
+from tamil_assistant.page_payload import PagePayload, encode_jpeg, as_image
+from tamil_assistant.token_ledger import get_token_ledger, BudgetExceededError
+from tamil_assistant.metrics import get_metrics
+from tamil_assistant.model_routing import ModelRouter, OVERLOAD_STATUSES
+
+# Operations the user waits on; only these are hedged
+HEDGED_OPERATIONS = ('analyze_page', 'analyze_spread', 'lookup_word', 'word_details')
+# Latency samples of a route needed before its percentile is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+
 
 class TamilWord:
-    def __init__(self, tamil_word, literal, contextual, sentence):
+    def __init__(self, tamil_word, literal, contextual, sentence, known=False, page=None):
         self.tamil_word = tamil_word
         self.literal_translation = literal
         self.contextual_meaning = contextual
         self.sentence_context = sentence
+        # True when the model only referenced a word explained on an earlier page
+        self.known = known
+        # Page the model attributed the word to (two-page spread requests only)
+        self.page = page
+
+    def to_dict(self):
+        """JSON-serializable form, matching the prompt's response structure"""
+        data = {
+            "tamil_word": self.tamil_word,
+            "literal_translation": self.literal_translation,
+            "contextual_meaning": self.contextual_meaning,
+            "sentence_context": self.sentence_context,
+        }
+        if self.known:
+            data["known"] = True
+        if self.page is not None:
+            data["page"] = self.page
+        return data
 
     def __repr__(self):
         return f"TamilWord({self.tamil_word}: {self.literal_translation})"
 
 class GeminiClient:
-    def __init__(self, api_key=None, model=None):
+    def __init__(self, api_key=None, model=None, ledger=None, loop_thread=None, router=None):
         """
         Initialize Gemini client
         If api_key/model not provided, reads from config
+        ledger: TokenLedger for usage accounting (defaults to the shared one)
+        loop_thread: EventLoopThread the async API runs on (defaults to the shared one)
+        router: ModelRouter choosing each operation's model (defaults to the
+        [models] configuration; an explicit model disables routing)
         """
+        config = get_config()
         if api_key is None or model is None:
-            config = get_config()
             self.api_key = api_key or config.get_gemini_api_key()
             self.model = model or config.get_gemini_model()
         else:
@@ -44,22 +81,34 @@ class GeminiClient:
         # Setup logging
         self.logger = logging.getLogger('GeminiClient')
 
+        self.ledger = ledger if ledger is not None else get_token_ledger()
+
+        # Async HTTP state lives on the shared event loop thread; the session
+        # (and its connection pool) is created there on first use
+        self.loop_thread = loop_thread or get_event_loop_thread()
+        self.max_concurrent_requests = config.get_max_concurrent_requests()
+        self.hedging = config.get_hedging_enabled()
+        self.hedge_percentile = config.get_hedge_percentile()
+        self.hedge_min_delay = config.get_hedge_min_delay()
+        self._session = None
+        self._semaphore = None
+
+        # Requests currently on the wire, by identity: key -> [task, waiters]
+        self._in_flight = {}
+        self.metrics = get_metrics()
+
+        if router is None:
+            router = ModelRouter(self.model) if model else ModelRouter.from_config(config, self.model)
+        self.router = router
+
         print(f"✓ Gemini client initialized with model: {self.model}")
+        self.logger.info(f"Model routes: {self.router.describe()} (fallback: {self.router.fallback or 'none'})")
 
     def _image_to_base64(self, image):
-        """Convert PIL Image to base64 string"""
-        buffer = io.BytesIO()
-        # Convert to RGB if needed (remove alpha channel)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            rgb_image.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-            image = rgb_image
-
-        image.save(buffer, format='JPEG', quality=85)
-        image_bytes = buffer.getvalue()
-        return base64.b64encode(image_bytes).decode('utf-8')
+        """Base64 JPEG of a PIL Image, or the already encoded form of a PagePayload"""
+        if isinstance(image, PagePayload):
+            return image.base64
+        return base64.b64encode(encode_jpeg(image)).decode('utf-8')
 
     def _decode_html_entities(self, text: str) -> str:
         """Decode HTML entities in text - copied from working implementation"""
@@ -69,185 +118,731 @@ class GeminiClient:
             print(f"Warning: Error decoding HTML entities: {e}")
             return text.replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&').replace('&quot;', '"')
 
-    def analyze_page(self, image):
-        """Analyze entire page for Tamil words"""
-        config = get_config()
-        prompt = config.get_page_analysis_prompt()
+    # Blocking API: thin wrappers that run the async API on the event loop thread
+
+    def analyze_page(self, image, known_words=None, document=None, page_text=None, on_partial=None, page=None,
+                     operation='analyze_page'):
+        """Blocking version of analyze_page_async"""
+        return self.loop_thread.run(self.analyze_page_async(
+            image, known_words=known_words, document=document,
+            page_text=page_text, on_partial=on_partial, page=page, operation=operation
+        ))
+
+    def analyze_page_tiled(self, image, known_words=None, document=None, max_tiles=4, overlap=40, page=None,
+                           operation='analyze_page'):
+        """Blocking version of analyze_page_tiled_async"""
+        return self.loop_thread.run(self.analyze_page_tiled_async(
+            image, known_words=known_words, document=document,
+            max_tiles=max_tiles, overlap=overlap, page=page, operation=operation
+        ))
+
+    def analyze_spread(self, pages, known_words=None, document=None, on_partial=None):
+        """Blocking version of analyze_spread_async"""
+        return self.loop_thread.run(self.analyze_spread_async(
+            pages, known_words=known_words, document=document, on_partial=on_partial
+        ))
+
+    def lookup_word(self, text, context_image, document=None, page=None):
+        """Blocking version of lookup_word_async"""
+        return self.loop_thread.run(self.lookup_word_async(text, context_image, document=document, page=page))
 
-        try:
-            # Build payload matching working implementation structure
-            base64_image = self._image_to_base64(image)
+    def test_connection(self):
+        """Blocking version of test_connection_async"""
+        return self.loop_thread.run(self.test_connection_async())
 
-            payload = {
-                "contents": [{
-                    "role": "user",
-                    "parts": [{
-                        "text": prompt
-                    }, {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": base64_image
-                        }
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": 0.2,
-                    "maxOutputTokens": 8192,
-                }
-            }
+    def close(self):
+        """Close the HTTP session and its pooled connections"""
+        if self._session is not None:
+            self.loop_thread.run(self._session.close())
+            self._session = None
 
-            # Make request
-            headers = {"Content-Type": "application/json"}
-            url = f"{self.api_url}?key={self.api_key}"
+    # Async API
 
-            response = requests.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=self.timeout
-            )
+    async def analyze_page_async(self, image, known_words=None, document=None, page_text=None, on_partial=None, page=None,
+                                 operation='analyze_page'):
+        """
+        Analyze entire page for Tamil words
+        image: PIL image or PagePayload of the page
+        known_words: optional list of words already explained in this book;
+        the model returns only short references for those
+        page_text: locally extracted page text; when given the request is
+        text-only and image may be None
+        on_partial: called with the words so far when a response is truncated
+        and continuation requests are needed (only for the caller that started
+        the request when identical requests are coalesced)
+        page: page number; with document it identifies the request so that
+        concurrent identical requests share one Gemini call
+        operation: name the request is budgeted and counted under
+        ('prefetch' for background work)
+        Returns (words, tokens_sent, tokens_received, model); model is the
+        one that answered, which may be the fallback
+        """
+        prompt = self._page_prompt(known_words)
+        key = self._request_key('analyze_page', document, page, prompt, page_text)
+        return await self._single_flight(
+            key, lambda: self._analyze_page(prompt, image, document, page_text, on_partial, operation)
+        )
+
+    async def analyze_page_quick_async(self, image, known_words=None, document=None, page_text=None,
+                                       on_partial=None, page=None):
+        """
+        Quick first pass of a two-tier analysis: every word with its literal
+        translation and sentence, but no contextual meanings or poem summary
+        (fetched afterwards with explain_words_async)
+        Returns (words, tokens_sent, tokens_received, model)
+        """
+        prompt = self._page_prompt(known_words) + "\n\n" + get_config().get_page_quick_prompt()
+        key = self._request_key('analyze_page_quick', document, page, prompt, page_text)
+        return await self._single_flight(
+            key, lambda: self._analyze_page(prompt, image, document, page_text, on_partial)
+        )
 
-            # Check status code first
-            if response.status_code != 200:
-                error_text = response.text[:200] if response.text else "No error details"
-                raise Exception(f"Gemini API error: {response.status_code} - {error_text}")
+    async def explain_words_async(self, image, words, document=None, page_text=None, page=None):
+        """
+        Second pass of a two-tier analysis: contextual meanings of words
+        listed by the quick pass (POEM_SUMMARY entries get the summary)
+        Returns (explained words, tokens_sent, tokens_received, model); entries come
+        back in the order given but words the model skipped are missing
+        """
+        listed = json.dumps(
+            [{"tamil_word": w.tamil_word, "sentence_context": w.sentence_context} for w in words],
+            ensure_ascii=False, indent=1
+        )
+        prompt = (get_config().get_page_analysis_prompt() + "\n\n"
+                  + get_config().get_word_details_prompt().format(words=listed))
+        key = self._request_key('word_details', document, page, prompt, page_text)
+        return await self._single_flight(
+            key, lambda: self._explain_words(prompt, image, document, page_text)
+        )
+
+    async def _explain_words(self, prompt, image, document, page_text):
+        """Send one word details request"""
+        try:
+            payload = await self._build_payload_async(prompt, image, page_text, max_output_tokens=8192)
+            return await self._generate_words(payload, 'word_details', document)
+        except BudgetExceededError:
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Request timed out after {self.timeout}s")
+        except aiohttp.ClientConnectionError as e:
+            raise Exception(f"Connection error: {e}")
+        except aiohttp.ClientError as e:
+            raise Exception(f"Request failed: {e}")
+        except Exception as e:
+            raise Exception(f"Gemini API error: {e}")
 
-            response.raise_for_status()
+    async def _analyze_page(self, prompt, image, document, page_text, on_partial, operation='analyze_page'):
+        """Send one page analysis request (with continuations)"""
+        try:
+            payload = await self._build_payload_async(prompt, image, page_text, max_output_tokens=8192)
+            return await self._generate_words(payload, operation, document, on_partial)
 
-            # Parse response using working implementation's approach
-            response_data = response.json()
+        except BudgetExceededError:
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Request timed out after {self.timeout}s. Check your internet connection.")
+        except aiohttp.ClientConnectionError as e:
+            raise Exception(f"Connection error: {e}. Check your internet connection.")
+        except aiohttp.ClientError as e:
+            raise Exception(f"Gemini API request failed: {e}")
+        except Exception as e:
+            raise Exception(f"Gemini API error: {e}")
 
-            if 'candidates' not in response_data or not response_data['candidates']:
-                raise Exception("No candidates in Gemini response")
+    async def analyze_spread_async(self, pages, known_words=None, document=None, on_partial=None):
+        """
+        Analyze two facing pages in one request
+        pages: [(page number, image or PagePayload, page_text), ...] in
+        reading order; pages with text are sent as text, the others as images
+        Returns ({page number: words}, tokens_sent, tokens_received, model)
+        """
+        prompt = self._page_prompt(known_words)
+        prompt += "\n\n" + get_config().get_page_spread_prompt().format(
+            first_page=pages[0][0], second_page=pages[-1][0]
+        )
+        numbers = tuple(number for number, _, _ in pages)
+        key = self._request_key('analyze_spread', document, numbers, prompt,
+                                *(text for _, _, text in pages))
+        return await self._single_flight(
+            key, lambda: self._analyze_spread(prompt, pages, document, on_partial)
+        )
+
+    async def _analyze_spread(self, prompt, pages, document, on_partial):
+        """Send one spread request and split the words by page"""
+        try:
+            loop = asyncio.get_running_loop()
+            payload = await loop.run_in_executor(None, self._build_spread_payload, prompt, pages)
+            words, tokens_sent, tokens_received, model = await self._generate_words(
+                payload, 'analyze_spread', document, on_partial
+            )
+        except BudgetExceededError:
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Request timed out after {self.timeout}s. Check your internet connection.")
+        except aiohttp.ClientConnectionError as e:
+            raise Exception(f"Connection error: {e}. Check your internet connection.")
+        except aiohttp.ClientError as e:
+            raise Exception(f"Gemini API request failed: {e}")
+        except Exception as e:
+            raise Exception(f"Gemini API error: {e}")
 
-            candidate = response_data['candidates'][0]
-            if 'content' not in candidate:
-                raise Exception("No content in Gemini response")
+        by_page = {number: [] for number, _, _ in pages}
+        first_page = pages[0][0]
+        unattributed = 0
+        for word in words:
+            page = word.page if word.page in by_page else None
+            if page is None:
+                # Entries without a usable page field stay with the first page
+                unattributed += 1
+                page = first_page
+            word.page = None
+            by_page[page].append(word)
+        if unattributed:
+            self.logger.warning(f"{unattributed} spread entries had no page, kept on page {first_page}")
+        return by_page, tokens_sent, tokens_received, model
+
+    def _build_spread_payload(self, prompt, pages):
+        """generateContent payload with a marker, then the text or image, for each page"""
+        parts = [{"text": prompt}]
+        for number, image, page_text in pages:
+            if page_text:
+                parts.append({"text": f"PAGE {number} (text extracted locally):\n{page_text}"})
+            else:
+                parts.append({"text": f"PAGE {number}:"})
+                parts.append({
+                    "inline_data": {
+                        "mime_type": "image/jpeg",
+                        "data": self._image_to_base64(image)
+                    }
+                })
+        return {
+            "contents": [{
+                "role": "user",
+                "parts": parts
+            }],
+            "generationConfig": {
+                "temperature": 0.2,
+                "maxOutputTokens": 8192,
+            }
+        }
 
-            if 'parts' not in candidate['content']:
-                raise Exception("No parts in Gemini response content")
+    async def analyze_page_tiled_async(self, image, known_words=None, document=None, max_tiles=4, overlap=40, page=None,
+                                       operation='analyze_page'):
+        """
+        Analyze a dense page as overlapping regions sent concurrently
+        Each region gets its own output budget, so long word lists are not cut
+        off. The poem summary comes from one short page-level request that runs
+        alongside the regions. Words are merged in reading order and duplicates
+        from the overlaps are dropped. The model returned is the one that
+        answered most regions.
+        """
+        base_prompt = self._page_prompt(known_words)
+        key = self._request_key('analyze_page_tiled', document, page, base_prompt, f"{max_tiles}:{overlap}")
+        return await self._single_flight(
+            key, lambda: self._analyze_page_tiled(base_prompt, image, document, max_tiles, overlap, operation)
+        )
+
+    async def _analyze_page_tiled(self, base_prompt, page_image, document, max_tiles, overlap,
+                                  operation='analyze_page'):
+        """Split the page into regions and analyze them concurrently"""
+        loop = asyncio.get_running_loop()
+        # Cropping needs pixels; an encoded page is decoded just for this request
+        image = await loop.run_in_executor(None, as_image, page_image)
+        tiles = await loop.run_in_executor(None, find_tiles, image, max_tiles, overlap)
+        if len(tiles) <= 1:
+            return await self._analyze_page(base_prompt, page_image, document, None, None, operation)
 
-            # Extract text from all parts
-            full_response = ""
-            for part in candidate['content']['parts']:
-                if 'text' in part:
-                    full_response += part['text']
+        config = get_config()
+        tile_template = config.get_page_tile_prompt()
 
-            if not full_response.strip():
-                raise Exception("Empty response from Gemini")
+        async def analyze_tile(index, box):
+            prompt = base_prompt + "\n\n" + tile_template.format(index=index + 1, total=len(tiles))
+            payload = await self._build_payload_async(prompt, image.crop(box), max_output_tokens=8192)
+            try:
+                words, sent, received, model = await self._generate_words(payload, operation, document)
+            except BudgetExceededError:
+                raise
+            except Exception as e:
+                # One retry per region so a transient error doesn't lose its words
+                self.logger.warning(f"Tile {index + 1}/{len(tiles)} failed, retrying: {e}")
+                words, sent, received, model = await self._generate_words(payload, operation, document)
+            words = [w for w in words if w.tamil_word != "POEM_SUMMARY"]
+            return words, sent, received, model
+
+        async def summarize_page():
+            prompt = config.get_page_summary_prompt()
+            preview = downscale(image, config.get_tiling_summary_max_side())
+            payload = await self._build_payload_async(prompt, preview, max_output_tokens=2048)
+            text, sent, received, _, _ = await self._generate(payload, operation, document)
+            words = [w for w in self._parse_response(text) if w.tamil_word == "POEM_SUMMARY"]
+            return words, sent, received
 
-            # Decode HTML entities
-            decoded_response = self._decode_html_entities(full_response.strip())
+        try:
+            summary_task = asyncio.ensure_future(summarize_page())
+            try:
+                tile_results = await asyncio.gather(
+                    *(analyze_tile(i, box) for i, box in enumerate(tiles))
+                )
+            except BaseException:
+                summary_task.cancel()
+                raise
 
-            # Extract token usage if available
+            words = []
+            seen = set()
             tokens_sent = 0
             tokens_received = 0
-            if 'usageMetadata' in response_data:
-                usage = response_data['usageMetadata']
-                tokens_sent = usage.get('promptTokenCount', 0)
-                tokens_received = usage.get('candidatesTokenCount', 0)
-                self.logger.info(f"Token usage - Sent: {tokens_sent}, Received: {tokens_received}")
-
-            words = self._parse_response(decoded_response)
-            return words, tokens_sent, tokens_received
+            models = Counter()
+            for tile_words, sent, received, model in tile_results:
+                models[model] += 1
+                tokens_sent += sent
+                tokens_received += received
+                for word in tile_words:
+                    # Overlapping regions repeat words at their edges
+                    key = (word.tamil_word, " ".join(word.sentence_context.split()))
+                    if key not in seen:
+                        seen.add(key)
+                        words.append(word)
 
-        except requests.exceptions.Timeout:
+            try:
+                summary_words, sent, received = await summary_task
+                tokens_sent += sent
+                tokens_received += received
+                words.extend(summary_words[:1])
+            except Exception as e:
+                self.logger.warning(f"Page summary request failed: {e}")
+
+            self.logger.info(f"Tiled analysis: {len(tiles)} tiles, {len(words)} unique words")
+            return words, tokens_sent, tokens_received, models.most_common(1)[0][0]
+
+        except BudgetExceededError:
+            raise
+        except asyncio.TimeoutError:
             raise Exception(f"Request timed out after {self.timeout}s. Check your internet connection.")
-        except requests.exceptions.ConnectionError as e:
+        except aiohttp.ClientConnectionError as e:
             raise Exception(f"Connection error: {e}. Check your internet connection.")
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             raise Exception(f"Gemini API request failed: {e}")
         except Exception as e:
             raise Exception(f"Gemini API error: {e}")
 
-    def lookup_word(self, text, context_image):
-        """Lookup specific word with context"""
+    def _page_prompt(self, known_words=None):
+        """Page analysis prompt, extended with known vocabulary if given"""
+        config = get_config()
+        prompt = config.get_page_analysis_prompt()
+        if known_words:
+            known_prompt = config.get_known_vocabulary_prompt()
+            prompt += "\n\n" + known_prompt.format(known_words=", ".join(known_words))
+            self.logger.info(f"Page prompt includes {len(known_words)} known words")
+        return prompt
+
+    async def _build_payload_async(self, prompt, image=None, page_text=None, max_output_tokens=8192):
+        """Build a payload off the event loop (JPEG encoding is CPU-bound)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self._build_payload, prompt, image, page_text, max_output_tokens
+        )
+
+    def _build_payload(self, prompt, image=None, page_text=None, max_output_tokens=8192):
+        """Build a generateContent payload from a prompt and either an image or page text"""
+        if page_text:
+            # Text-only request: the page text stands in for the image
+            prompt += "\n\n" + get_config().get_page_text_prompt().format(page_text=page_text)
+            parts = [{"text": prompt}]
+            self.logger.info(f"Sending page as text ({len(page_text)} chars), no image")
+        else:
+            # Build payload matching working implementation structure
+            base64_image = self._image_to_base64(image)
+            parts = [{
+                "text": prompt
+            }, {
+                "inline_data": {
+                    "mime_type": "image/jpeg",
+                    "data": base64_image
+                }
+            }]
+
+        return {
+            "contents": [{
+                "role": "user",
+                "parts": parts
+            }],
+            "generationConfig": {
+                "temperature": 0.2,
+                "maxOutputTokens": max_output_tokens,
+            }
+        }
+
+    async def lookup_word_async(self, text, context_image, document=None, page=None):
+        """
+        Lookup specific word with context
+        Concurrent lookups of the same word on the same page share one request
+        Returns (word, tokens_sent, tokens_received, model)
+        """
         config = get_config()
         prompt_template = config.get_word_lookup_prompt()
         prompt = prompt_template.format(word=text)
 
+        key = self._request_key('lookup_word', document, page, prompt)
+        return await self._single_flight(
+            key, lambda: self._lookup_word(prompt, context_image, document)
+        )
+
+    async def _lookup_word(self, prompt, context_image, document):
+        """Send one word lookup request"""
         try:
-            # Build payload
-            base64_image = self._image_to_base64(context_image)
+            payload = await self._build_payload_async(prompt, context_image, max_output_tokens=4096)
 
-            payload = {
-                "contents": [{
-                    "role": "user",
-                    "parts": [{
-                        "text": prompt
-                    }, {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": base64_image
-                        }
-                    }]
-                }],
-                "generationConfig": {
-                    "temperature": 0.2,
-                    "maxOutputTokens": 4096,
-                }
-            }
+            decoded_response, tokens_sent, tokens_received, _, model = await self._generate(
+                payload, 'lookup_word', document
+            )
 
-            # Make request
-            headers = {"Content-Type": "application/json"}
-            url = f"{self.api_url}?key={self.api_key}"
+            words = self._parse_response(decoded_response)
+            word = words[0] if words else None
+            return word, tokens_sent, tokens_received, model
+
+        except BudgetExceededError:
+            raise
+        except asyncio.TimeoutError:
+            raise Exception(f"Request timed out after {self.timeout}s")
+        except aiohttp.ClientConnectionError as e:
+            raise Exception(f"Connection error: {e}")
+        except aiohttp.ClientError as e:
+            raise Exception(f"Request failed: {e}")
+        except Exception as e:
+            raise Exception(f"Error: {e}")
+
+    def _request_key(self, operation, document, page, *parts):
+        """
+        Identity of a request for coalescing: operation, document, page,
+        prompt (and any other inputs in parts) and model
+        Returns None when the page is unknown; such requests are not coalesced
+        """
+        if document is None or page is None:
+            return None
+        digest = hashlib.sha1("\0".join(part or '' for part in parts).encode('utf-8')).hexdigest()
+        return (operation, document, page, digest, self.model)
+
+    async def _single_flight(self, key, factory):
+        """
+        Run factory() once per key
+        Concurrent callers with the same key await the one in-flight task and
+        share its result. Each caller can be cancelled on its own; the request
+        itself is only cancelled when its last waiter goes away.
+        """
+        if key is None:
+            return await factory()
+
+        entry = self._in_flight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._in_flight[key] = entry
+
+            def forget(_, entry=entry):
+                if self._in_flight.get(key) is entry:
+                    del self._in_flight[key]
+            task.add_done_callback(forget)
+        else:
+            self.metrics.increment(f"coalesced.{key[0]}")
+            self.logger.info(f"Joined in-flight {key[0]} request for {key[1]} page {key[2]}")
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def _generate_words(self, payload, operation, document=None, on_partial=None):
+        """
+        Run a word-list request, continuing while the model stops on MAX_TOKENS
+        Each continuation replays the conversation with the complete entries so
+        far and asks the model to resume after the last one, until the list is
+        finished or the continuation (or token) budget runs out.
+        Returns (words, tokens_sent, tokens_received, model); model is the one
+        that answered the first request
+        """
+        text, tokens_sent, tokens_received, finish_reason, model = await self._generate(
+            payload, operation, document
+        )
+        words = self._parse_response(text)
+
+        max_continuations = get_config().get_max_continuations()
+        continuations = 0
+        seen = {(w.tamil_word, w.sentence_context) for w in words}
 
-            response = requests.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=self.timeout
+        while finish_reason == 'MAX_TOKENS' and words and continuations < max_continuations:
+            if on_partial:
+                on_partial(list(words))
+
+            continuations += 1
+            last = words[-1]
+            self.logger.info(f"Response truncated after {len(words)} words, continuation {continuations} from '{last.tamil_word}'")
+
+            prompt = get_config().get_continuation_prompt().format(
+                last_word=last.tamil_word, last_sentence=last.sentence_context
             )
+            continuation_payload = dict(payload)
+            continuation_payload["contents"] = payload["contents"] + [{
+                "role": "model",
+                "parts": [{"text": json.dumps([w.to_dict() for w in words], ensure_ascii=False)}]
+            }, {
+                "role": "user",
+                "parts": [{"text": prompt}]
+            }]
 
-            if response.status_code != 200:
-                error_text = response.text[:200] if response.text else "No error details"
-                raise Exception(f"Gemini API error: {response.status_code} - {error_text}")
+            try:
+                text, sent, received, finish_reason, _ = await self._generate(
+                    continuation_payload, operation, document
+                )
+                new_words = self._parse_response(text)
+            except BudgetExceededError as e:
+                self.logger.warning(f"Stopping continuations: {e}")
+                break
+            except Exception as e:
+                self.logger.warning(f"Continuation {continuations} failed, keeping {len(words)} words: {e}")
+                break
 
-            response.raise_for_status()
+            tokens_sent += sent
+            tokens_received += received
+
+            added = 0
+            for word in new_words:
+                key = (word.tamil_word, word.sentence_context)
+                if key not in seen:
+                    seen.add(key)
+                    words.append(word)
+                    added += 1
+            if not added:
+                break
 
-            # Parse response
-            response_data = response.json()
+        if continuations:
+            self.logger.info(f"Page needed {continuations} continuation request(s), {len(words)} words total")
+        if finish_reason == 'MAX_TOKENS':
+            self.logger.warning(f"Word list still truncated after {continuations} continuation(s)")
 
-            if 'candidates' not in response_data or not response_data['candidates']:
-                raise Exception("No candidates in Gemini response")
+        return words, tokens_sent, tokens_received, model
 
-            candidate = response_data['candidates'][0]
-            if 'content' not in candidate or 'parts' not in candidate['content']:
-                raise Exception("Invalid response structure")
+    async def _get_session(self):
+        """HTTP session with its own keep-alive connection pool, created on the loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrent_requests * 2,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._session
 
-            # Extract text
-            full_response = ""
-            for part in candidate['content']['parts']:
-                if 'text' in part:
-                    full_response += part['text']
+    async def _post(self, url, payload):
+        """POST JSON within the concurrency limit; returns (status, body text)"""
+        session = await self._get_session()
+        async with self._semaphore:
+            async with session.post(url, json=payload) as response:
+                return response.status, await response.text()
 
-            if not full_response.strip():
-                raise Exception("Empty response from Gemini")
+    async def _generate(self, payload, operation, document=None):
+        """
+        Send a generateContent request
+        Returns (text, tokens_sent, tokens_received, finish_reason, model);
+        model is the one that answered, the fallback after a retry
+        Every call is checked against and recorded in the token ledger
+        """
+        self.ledger.check(operation)
 
-            # Decode HTML entities
-            decoded_response = self._decode_html_entities(full_response.strip())
+        # The routed model; an overloaded or timed-out request is retried once
+        # on the fallback model, which then serves the route for a while
+        model = self.router.model_for(operation)
+        try:
+            status, body = await self._routed_post(operation, model, payload, document)
+            retry = status in OVERLOAD_STATUSES and self.router.can_retry(model)
+            if retry:
+                self.router.overloaded(operation, model, status)
+        except asyncio.TimeoutError:
+            if not self.router.can_retry(model):
+                raise
+            self.router.degrade(model, f"{operation} timed out after {self.timeout}s")
+            retry = True
+        if retry:
+            model = self.router.fallback
+            self.logger.warning(f"Retrying {operation} on {model}")
+            status, body = await self._routed_post(operation, model, payload, document)
+
+        # Check status code first
+        if status != 200:
+            error_text = body[:200] if body else "No error details"
+            raise Exception(f"Gemini API error: {status} - {error_text}")
+
+        # Parse response using working implementation's approach
+        response_data = json.loads(body)
+
+        # Usage is billed even if the response turns out to be unusable
+        tokens_sent, tokens_received = self._extract_usage(response_data)
+        self.ledger.record(operation, tokens_sent, tokens_received, document, model)
+
+        decoded_response, finish_reason = self._response_text(response_data)
+        return decoded_response, tokens_sent, tokens_received, finish_reason, model
+
+    async def _routed_post(self, operation, model, payload, document=None):
+        """POST a request to one model, timing it for the metrics and the router"""
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.api_key}"
+        started = time.monotonic()
+        delay = self._hedge_delay(operation, model)
+        if delay is None:
+            status, body = await self._post(url, payload)
+        else:
+            status, body = await self._hedged_post(operation, url, payload, delay, document, model)
+        seconds = time.monotonic() - started
+        self.metrics.observe(f"latency.{operation}", seconds)
+        self.metrics.increment(f"requests.{operation}")
+        if status == 200:
+            self.router.record(operation, model, seconds)
+        return status, body
+
+    def _hedge_delay(self, operation, model):
+        """
+        Seconds to wait before hedging a request, or None to not hedge
+        The delay is the configured percentile of the route's recent
+        latencies, so roughly the slowest (100 - percentile)% get a twin.
+        """
+        if not self.hedging or operation not in HEDGED_OPERATIONS:
+            return None
+        name = f"latency.{operation}.{model}"
+        if self.metrics.samples(name) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.metrics.percentile(name, self.hedge_percentile), self.hedge_min_delay)
+
+    async def _hedged_post(self, operation, url, payload, delay, document=None, model=None):
+        """
+        POST, and send an identical second request if the first has not
+        answered after delay seconds; the first successful answer wins and
+        the other request is cancelled. Hedges count as background work, so
+        they stop at the token budget's soft limit, and the losing request's
+        usage is recorded as 'hedge'.
+        """
+        first = asyncio.ensure_future(self._post(url, payload))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.ledger.allows('hedge'):
+                return await first
+
+            self.metrics.increment(f"hedge.{operation}")
+            self.logger.info(f"No {operation} answer after {delay:.1f}s, sending a hedge request")
+            second = asyncio.ensure_future(self._post(url, payload))
+            tasks.append(second)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result()[0] == 200:
+                        if task is second:
+                            self.metrics.increment(f"hedge.{operation}.won")
+                        loser = first if task is second else second
+                        self._record_hedge(task.result()[1], loser, document, model)
+                        return task.result()
+            # Neither succeeded: report the original request's outcome
+            return first.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _record_hedge(self, winner_body, loser, document, model):
+        """
+        Record the tokens of a hedge's losing request, which is billed even
+        when cancelled: its own usage if it answered, otherwise the winner's
+        prompt tokens (the requests are identical) without output tokens
+        """
+        answered = (loser.done() and not loser.cancelled() and loser.exception() is None
+                    and loser.result()[0] == 200)
+        try:
+            response_data = json.loads(loser.result()[1] if answered else winner_body)
+        except ValueError:
+            return
+        tokens_sent, tokens_received = self._extract_usage(response_data)
+        self.ledger.record('hedge', tokens_sent, tokens_received if answered else 0, document, model)
 
-            # Extract token usage if available
-            tokens_sent = 0
-            tokens_received = 0
-            if 'usageMetadata' in response_data:
-                usage = response_data['usageMetadata']
-                tokens_sent = usage.get('promptTokenCount', 0)
-                tokens_received = usage.get('candidatesTokenCount', 0)
-                self.logger.info(f"Token usage - Sent: {tokens_sent}, Received: {tokens_received}")
+    def build_page_request(self, image, page_text=None, known_words=None):
+        """
+        generateContent request body for a page analysis, as sent by
+        analyze_page (used to prepare batch jobs)
+        """
+        return self._build_payload(self._page_prompt(known_words), image, page_text, max_output_tokens=8192)
 
-            words = self._parse_response(decoded_response)
-            word = words[0] if words else None
-            return word, tokens_sent, tokens_received
+    def build_lookup_request(self, text, context_image):
+        """generateContent request body for a word lookup, as sent by lookup_word"""
+        prompt = get_config().get_word_lookup_prompt().format(word=text)
+        return self._build_payload(prompt, context_image, max_output_tokens=4096)
 
-        except requests.exceptions.Timeout:
-            raise Exception(f"Request timed out after {self.timeout}s")
-        except requests.exceptions.ConnectionError as e:
-            raise Exception(f"Connection error: {e}")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Request failed: {e}")
-        except Exception as e:
-            raise Exception(f"Error: {e}")
+    async def run_page_request_async(self, payload, document=None, operation='analyze_page'):
+        """
+        Send a prepared page analysis request body (offline queue replay)
+        Returns (words, tokens_sent, tokens_received, model)
+        """
+        return await self._generate_words(payload, operation, document)
+
+    async def run_lookup_request_async(self, payload, document=None):
+        """
+        Send a prepared word lookup request body (offline queue replay)
+        Returns (word, tokens_sent, tokens_received, model)
+        """
+        text, tokens_sent, tokens_received, _, model = await self._generate(payload, 'lookup_word', document)
+        words = self._parse_response(text)
+        return (words[0] if words else None), tokens_sent, tokens_received, model
+
+    def words_from_response(self, response_data):
+        """
+        Parse a generateContent response body (e.g. from a batch result)
+        Returns (words, tokens_sent, tokens_received, finish_reason)
+        """
+        tokens_sent, tokens_received = self._extract_usage(response_data)
+        text, finish_reason = self._response_text(response_data)
+        return self._parse_response(text), tokens_sent, tokens_received, finish_reason
+
+    def _response_text(self, response_data):
+        """Decoded text and finish reason of the first candidate"""
+        if 'candidates' not in response_data or not response_data['candidates']:
+            raise Exception("No candidates in Gemini response")
+
+        candidate = response_data['candidates'][0]
+        finish_reason = candidate.get('finishReason', '')
+        if 'content' not in candidate:
+            raise Exception("No content in Gemini response")
+
+        if 'parts' not in candidate['content']:
+            raise Exception("No parts in Gemini response content")
+
+        # Extract text from all parts
+        full_response = ""
+        for part in candidate['content']['parts']:
+            if 'text' in part:
+                full_response += part['text']
+
+        if not full_response.strip():
+            raise Exception("Empty response from Gemini")
+
+        # Decode HTML entities
+        return self._decode_html_entities(full_response.strip()), finish_reason
+
+    def _extract_usage(self, response_data):
+        """Extract token usage if available"""
+        tokens_sent = 0
+        tokens_received = 0
+        if 'usageMetadata' in response_data:
+            usage = response_data['usageMetadata']
+            tokens_sent = usage.get('promptTokenCount', 0)
+            tokens_received = usage.get('candidatesTokenCount', 0)
+            self.logger.info(f"Token usage - Sent: {tokens_sent}, Received: {tokens_received}")
+        return tokens_sent, tokens_received
 
     def _parse_response(self, text):
         """Parse Gemini response to TamilWord objects"""
@@ -284,26 +879,7 @@ class GeminiClient:
         try:
             data = json.loads(text)
 
-            # Handle both array and single object
-            if isinstance(data, list):
-                words = data
-            elif isinstance(data, dict):
-                words = [data]
-            else:
-                raise ValueError("Unexpected response format")
-
-            # Convert to TamilWord objects
-            result = []
-            for word_data in words:
-                word = TamilWord(
-                    tamil_word=word_data.get('tamil_word', ''),
-                    literal=word_data.get('literal_translation', ''),
-                    contextual=word_data.get('contextual_meaning', ''),
-                    sentence=word_data.get('sentence_context', '')
-                )
-                result.append(word)
-
-            return result
+            return self._words_from_data(data)
 
         except json.JSONDecodeError as e:
             # Try to fix common JSON issues
@@ -311,32 +887,44 @@ class GeminiClient:
                 # Attempt to fix incomplete JSON
                 fixed_text = self._fix_incomplete_json(text)
                 data = json.loads(fixed_text)
-                
-                # Handle both array and single object
-                if isinstance(data, list):
-                    words = data
-                elif isinstance(data, dict):
-                    words = [data]
-                else:
-                    raise ValueError("Unexpected response format")
-
-                # Convert to TamilWord objects
-                result = []
-                for word_data in words:
-                    word = TamilWord(
-                        tamil_word=word_data.get('tamil_word', ''),
-                        literal=word_data.get('literal_translation', ''),
-                        contextual=word_data.get('contextual_meaning', ''),
-                        sentence=word_data.get('sentence_context', '')
-                    )
-                    result.append(word)
-
-                return result
+                return self._words_from_data(data)
                 
             except Exception:
                 self.logger.error(f"Failed to parse JSON. Response was:\n{text[:500]}")
                 raise Exception(f"Failed to parse JSON: {e}\nResponse preview: {text[:200]}")
 
+    def _words_from_data(self, data):
+        """Convert parsed JSON (array or single object) to TamilWord objects"""
+        # Handle both array and single object
+        if isinstance(data, list):
+            words = data
+        elif isinstance(data, dict):
+            words = [data]
+        else:
+            raise ValueError("Unexpected response format")
+
+        # Convert to TamilWord objects
+        result = []
+        for word_data in words:
+            word = TamilWord(
+                tamil_word=word_data.get('tamil_word', ''),
+                literal=word_data.get('literal_translation', ''),
+                contextual=word_data.get('contextual_meaning', ''),
+                sentence=word_data.get('sentence_context', ''),
+                known=bool(word_data.get('known', False)),
+                page=self._page_number(word_data.get('page'))
+            )
+            result.append(word)
+
+        return result
+
+    def _page_number(self, value):
+        """Page attribution of a response entry as an int, or None"""
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
     def _fix_incomplete_json(self, text):
         """Attempt to fix common JSON issues"""
         # Remove incomplete last entry by finding the last complete object
@@ -359,7 +947,7 @@ class GeminiClient:
         
         return text
 
-    def test_connection(self):
+    async def test_connection_async(self):
         """Test API connection with simple request - matching working implementation"""
         try:
             # Build payload exactly like working implementation
@@ -374,34 +962,29 @@ class GeminiClient:
                 }
             }
 
-            headers = {"Content-Type": "application/json"}
             url = f"{self.api_url}?key={self.api_key}"
 
             print(f"   Testing connection to: {url.split('?')[0]}")
             print(f"   Model: {self.model}")
             print(f"   Timeout: {self.timeout}s")
 
-            # Use same timeout as working implementation
-            response = requests.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=self.timeout  # 30 seconds like working code
-            )
+            status, body = await self._post(url, payload)
 
-            print(f"   Status code: {response.status_code}")
+            print(f"   Status code: {status}")
 
             # Check status code first (like working implementation)
-            if response.status_code != 200:
+            if status != 200:
                 try:
-                    error_data = response.json()
-                    error_msg = error_data.get('error', {}).get('message', response.text)
+                    error_data = json.loads(body)
+                    error_msg = error_data.get('error', {}).get('message', body)
                 except:
-                    error_msg = response.text[:200]
-                return False, f"HTTP {response.status_code}: {error_msg}"
+                    error_msg = body[:200]
+                return False, f"HTTP {status}: {error_msg}"
+
+            response_data = json.loads(body)
 
-            response.raise_for_status()
-            response_data = response.json()
+            tokens_sent, tokens_received = self._extract_usage(response_data)
+            self.ledger.record('test_connection', tokens_sent, tokens_received, model=self.model)
 
             # Parse response using working implementation's approach
             if 'candidates' not in response_data or not response_data['candidates']:
@@ -428,11 +1011,11 @@ class GeminiClient:
 
             return True, decoded_response
 
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
             return False, f"Timeout after {self.timeout}s - check your internet connection"
-        except requests.exceptions.ConnectionError as e:
+        except aiohttp.ClientConnectionError as e:
             return False, f"Connection error: {e}"
-        except requests.exceptions.HTTPError as e:
+        except aiohttp.ClientError as e:
             return False, f"HTTP error: {e}"
         except Exception as e:
             return False, f"Error: {str(e)}"
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Optional local OCR pre-pass for Tamil Assistant
+Runs Tesseract (with Tamil data) in a process pool before a page is sent to
+Gemini, so confidently recognised pages can be analyzed as text instead of
+as an image
+"""
+
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from tamil_assistant.word_boxes import WordBox
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# Tamil Unicode block
+TAMIL_CHAR_PATTERN = re.compile('[\u0B80-\u0BFF]')
+
+
+class OCRResult:
+    def __init__(self, text, confidence, word_count, usable, boxes=None):
+        self.text = text
+        self.confidence = confidence
+        self.word_count = word_count
+        self.usable = usable
+        # WordBox list in page fractions, for cropping lookups
+        self.boxes = boxes or []
+
+    @property
+    def tamil_chars(self):
+        return len(TAMIL_CHAR_PATTERN.findall(self.text))
+
+    def __repr__(self):
+        return f"OCRResult({self.word_count} words, {self.confidence:.0f}% confidence, usable={self.usable})"
+
+
+def _run_tesseract(mode, size, raw, language):
+    """
+    Worker process entry point: OCR a raw image buffer
+    Returns (text, mean word confidence, word count, word boxes) where each
+    box is (word, left, top, right, bottom, block, paragraph, line) in pixels
+    """
+    from PIL import Image
+
+    image = Image.frombytes(mode, size, raw)
+    data = pytesseract.image_to_data(image, lang=language, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    boxes = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        conf = float(data['conf'][i])
+        if not word or conf < 0:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        left, top = data['left'][i], data['top'][i]
+        boxes.append((word, left, top, left + data['width'][i], top + data['height'][i]) + key)
+        # Weight by length so single stray glyphs don't dominate the average
+        confidences.append((conf, len(word)))
+
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    total_weight = sum(weight for _, weight in confidences)
+    confidence = sum(conf * weight for conf, weight in confidences) / total_weight if total_weight else 0.0
+    return text, confidence, len(confidences), boxes
+
+
+class LocalOCR:
+    def __init__(self, language='tam', min_confidence=75, min_tamil_chars=20, workers=2):
+        """
+        Configure the OCR pre-pass
+        Pages below min_confidence or with fewer than min_tamil_chars Tamil
+        characters (pictures, handwriting) are left to Gemini's image analysis
+        """
+        self.language = language
+        self.min_confidence = min_confidence
+        self.min_tamil_chars = min_tamil_chars
+        self.workers = workers
+        self.logger = logging.getLogger('LocalOCR')
+        self._pool = None
+
+        if pytesseract is None:
+            self.logger.warning("pytesseract not installed - local OCR disabled")
+
+    @property
+    def available(self):
+        return pytesseract is not None
+
+    def _get_pool(self):
+        """Create the worker pool on first use"""
+        if self._pool is None:
+            # forkserver avoids forking a process that holds GTK and HTTP threads
+            context = multiprocessing.get_context('forkserver')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def extract(self, image, timeout=60):
+        """OCR a PIL image in the worker pool and decide whether the text is usable"""
+        if not self.available:
+            return OCRResult("", 0.0, 0, False)
+
+        # Tesseract works on grayscale; sending one channel keeps the IPC copy small
+        gray = image.convert('L')
+        future = self._get_pool().submit(
+            _run_tesseract, gray.mode, gray.size, gray.tobytes(), self.language
+        )
+        text, confidence, word_count, raw_boxes = future.result(timeout=timeout)
+
+        width, height = gray.size
+        boxes = [
+            WordBox(word, (left / width, top / height, right / width, bottom / height),
+                    (block, paragraph, line), (block, paragraph))
+            for word, left, top, right, bottom, block, paragraph, line in raw_boxes
+        ]
+        result = OCRResult(text, confidence, word_count, False, boxes)
+        result.usable = confidence >= self.min_confidence and result.tamil_chars >= self.min_tamil_chars
+        self.logger.info(f"Local OCR: {result}")
+        return result
+
+    def shutdown(self):
+        """Stop worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+In-process metrics for Tamil Assistant
+Counters and request latency samples, shared by the Gemini client and the
+side panel and written to the session log on exit
+"""
+
+import threading
+from collections import deque
+
+# Latency samples kept per name; enough for stable percentiles
+MAX_SAMPLES = 500
+
+
+class Metrics:
+    def __init__(self, max_samples=MAX_SAMPLES):
+        """Thread-safe counters and latency histograms"""
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latencies = {}
+
+    def increment(self, name, count=1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+
+    def observe(self, name, seconds):
+        """Record one latency sample"""
+        with self._lock:
+            samples = self._latencies.get(name)
+            if samples is None:
+                samples = self._latencies[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def count(self, name):
+        """Current value of a counter"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def samples(self, name):
+        """Number of recent latency samples"""
+        with self._lock:
+            return len(self._latencies.get(name, ()))
+
+    def percentile(self, name, q):
+        """q-th percentile (0-100) of recent latency samples, or None without samples"""
+        with self._lock:
+            samples = sorted(self._latencies.get(name, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100 * (len(samples) - 1)))))
+        return samples[index]
+
+    def snapshot(self):
+        """Counters and latency percentiles as a plain dict"""
+        with self._lock:
+            counters = dict(self._counters)
+            names = list(self._latencies)
+        latencies = {
+            name: {
+                'count': len(self._latencies[name]),
+                'p50': self.percentile(name, 50),
+                'p95': self.percentile(name, 95),
+            }
+            for name in names
+        }
+        return {'counters': counters, 'latencies': latencies}
+
+    def format_summary(self):
+        """Human readable metrics report"""
+        snapshot = self.snapshot()
+        lines = ["Metrics:"]
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f"  {name:<32} {value:>8}")
+        for name, stats in sorted(snapshot['latencies'].items()):
+            lines.append(
+                f"  {name:<32} {stats['count']:>8} samples  "
+                f"p50 {stats['p50']:.2f}s  p95 {stats['p95']:.2f}s"
+            )
+        return "\n".join(lines)
+
+
+# Singleton instance
+_metrics_instance = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """Get or create the shared metrics"""
+    global _metrics_instance
+    with _metrics_lock:
+        if _metrics_instance is None:
+            _metrics_instance = Metrics()
+    return _metrics_instance
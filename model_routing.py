@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Per-operation model routing for Tamil Assistant
+Each operation (page analysis, lookup, prefetch, batch) can use its own
+Gemini model. A model that answers slower than the operation's latency SLO
+several times in a row, or reports overload, is put on the fallback model
+for a cool-down period. Every routed request is counted and timed per
+operation and model in the shared metrics.
+"""
+
+import logging
+import threading
+import time
+
+from tamil_assistant.metrics import get_metrics
+
+# Operations with their own [models] entry
+OPERATIONS = ('analyze_page', 'analyze_spread', 'prefetch', 'lookup_word', 'word_details', 'batch')
+# Operations whose page analyses answer each other from the store
+PAGE_OPERATIONS = ('analyze_page', 'analyze_spread', 'prefetch', 'batch')
+# HTTP statuses Gemini answers with when a model is overloaded
+OVERLOAD_STATUSES = (429, 500, 503)
+
+
+class ModelRouter:
+    def __init__(self, default_model, routes=None, fallback=None, slos=None,
+                 cooldown=120, slow_requests=2):
+        """
+        Route operations to models
+        routes: operation -> model (missing operations use default_model)
+        fallback: faster model used while a routed model is degraded (None = no fallback)
+        slos: operation -> latency SLO in seconds (missing or 0 = none)
+        cooldown: seconds a degraded model stays on the fallback
+        slow_requests: consecutive SLO misses that degrade a model
+        """
+        self.default_model = default_model
+        self.routes = dict(routes or {})
+        self.fallback = fallback
+        self.slos = dict(slos or {})
+        self.cooldown = cooldown
+        self.slow_requests = slow_requests
+        self.logger = logging.getLogger('ModelRouter')
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        # model -> monotonic time its cool-down ends
+        self._degraded_until = {}
+        # model -> consecutive SLO misses
+        self._slow = {}
+
+    @classmethod
+    def from_config(cls, config, default_model=None):
+        return cls(
+            default_model or config.get_gemini_model(),
+            routes={op: config.get_operation_model(op) for op in OPERATIONS},
+            fallback=config.get_fallback_model(),
+            slos={op: config.get_latency_slo(op) for op in OPERATIONS},
+            cooldown=config.get_fallback_cooldown(),
+        )
+
+    def primary(self, operation):
+        """Configured model of an operation"""
+        return self.routes.get(operation) or self.default_model
+
+    def model_for(self, operation):
+        """Model to send an operation's next request to"""
+        model = self.primary(operation)
+        if self.fallback and model != self.fallback and self.is_degraded(model):
+            return self.fallback
+        return model
+
+    def models(self, *operations):
+        """Models whose stored answers serve the operations (cache lookups)"""
+        models = []
+        for model in [self.primary(op) for op in operations] + [self.fallback]:
+            if model and model not in models:
+                models.append(model)
+        return models
+
+    def is_degraded(self, model):
+        with self._lock:
+            until = self._degraded_until.get(model)
+            if until is None:
+                return False
+            if time.monotonic() < until:
+                return True
+            del self._degraded_until[model]
+        self.logger.info(f"{model} cool-down over, routing back to it")
+        return False
+
+    def record(self, operation, model, seconds):
+        """Account one answered request; repeated SLO misses degrade the model"""
+        self.metrics.observe(f"latency.{operation}.{model}", seconds)
+        self.metrics.increment(f"requests.{operation}.{model}")
+
+        slo = self.slos.get(operation)
+        if not slo or model == self.fallback:
+            return
+        with self._lock:
+            if seconds <= slo:
+                self._slow[model] = 0
+                return
+            self._slow[model] = misses = self._slow.get(model, 0) + 1
+        self.metrics.increment(f"slo_miss.{operation}")
+        if misses >= self.slow_requests:
+            self.degrade(model, f"{misses} {operation} requests over the {slo:g}s SLO")
+
+    def overloaded(self, operation, model, status):
+        """Account an overload answer; the model is degraded at once"""
+        self.metrics.increment(f"overload.{operation}.{model}")
+        self.degrade(model, f"HTTP {status} on {operation}")
+
+    def degrade(self, model, reason):
+        """Route a model's operations to the fallback for the cool-down period"""
+        if not self.fallback or model == self.fallback:
+            return
+        with self._lock:
+            already = self._degraded_until.get(model, 0) > time.monotonic()
+            self._degraded_until[model] = time.monotonic() + self.cooldown
+            self._slow[model] = 0
+        if not already:
+            self.metrics.increment(f"fallback.{model}")
+            self.logger.warning(f"{model} degraded ({reason}), using {self.fallback} for {self.cooldown:g}s")
+
+    def can_retry(self, model):
+        """Whether a failed request on model can be retried on the fallback"""
+        return bool(self.fallback) and model != self.fallback
+
+    def describe(self):
+        """Current route of every operation, for logs and the doctor report"""
+        return {op: self.model_for(op) for op in OPERATIONS}
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Durable offline request queue for Tamil Assistant
+Page analyses and lookups that fail because the network is down are kept
+in a local SQLite table together with their encoded request bodies. A
+replayer on the shared event loop sends them again with exponential
+backoff once the connection returns, and stores the results in the
+vocabulary store, so revisiting the page shows them instantly.
+"""
+
+import asyncio
+import errno
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+
+import aiohttp
+
+from tamil_assistant.metrics import get_metrics
+from tamil_assistant.model_routing import PAGE_OPERATIONS
+from tamil_assistant.token_ledger import BudgetExceededError
+
+KIND_PAGE = 'page'
+KIND_LOOKUP = 'lookup'
+# Replays that fail for reasons other than the network (timeouts included)
+# before the request is dropped
+MAX_ATTEMPTS = 5
+# OS errors of a machine without a route to the API
+OFFLINE_ERRNOS = {errno.ENETUNREACH, errno.EHOSTUNREACH, errno.ENETDOWN, errno.ECONNREFUSED}
+# First retry delay in seconds; doubled after every connection failure
+RETRY_BASE = 5
+
+
+class QueuedOffline(Exception):
+    """A request could not reach Gemini and was queued for replay"""
+
+    def __init__(self, entry_id, error):
+        super().__init__(f"Offline ({error}); queued for when the connection returns")
+        self.entry_id = entry_id
+
+
+def is_connection_error(error):
+    """
+    Whether an error (or one it was raised from) means Gemini could not be
+    reached at all: DNS or connect failures. A timeout or a dropped
+    response may have been billed and is not treated as offline.
+    """
+    while error is not None:
+        if isinstance(error, (aiohttp.ClientConnectorError, socket.gaierror, ConnectionRefusedError)):
+            return True
+        if isinstance(error, OSError) and error.errno in OFFLINE_ERRNOS:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class PendingRequest:
+    """One row of the offline queue"""
+
+    FIELDS = ('id', 'kind', 'document', 'content_hash', 'page', 'prompt_hash', 'dpi',
+              'text', 'payload', 'attempts', 'next_attempt', 'last_error', 'created_at')
+
+    def __init__(self, row):
+        for name, value in zip(self.FIELDS, row):
+            setattr(self, name, value)
+
+    @property
+    def document_name(self):
+        return os.path.basename(self.document)
+
+    def __repr__(self):
+        target = f"lookup '{self.text}'" if self.kind == KIND_LOOKUP else "page"
+        return f"PendingRequest({target} on page {self.page} of {self.document_name})"
+
+
+class OfflineQueue:
+    def __init__(self, db_path):
+        """Open the offline request table"""
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(str(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_requests (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    content_hash TEXT,
+                    page INTEGER NOT NULL,
+                    prompt_hash TEXT,
+                    dpi INTEGER,
+                    text TEXT,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+
+    def add(self, kind, document, page, payload, content_hash=None, prompt_hash=None,
+            dpi=None, text=None, error=None):
+        """
+        Queue a request body for replay; returns the entry id
+        The first replay is tried RETRY_BASE seconds later. A request already queued for the same page (or word on the page)
+        is replaced, so repeated clicks while offline queue it once.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM pending_requests WHERE kind = ? AND document = ? AND page = ? AND text IS ?",
+                (kind, document, page, text)
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO pending_requests (kind, document, content_hash, page, prompt_hash, dpi, "
+                "text, payload, next_attempt, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, document, content_hash, page, prompt_hash, dpi, text,
+                 json.dumps(payload), now + RETRY_BASE, error, now)
+            )
+        get_metrics().increment(f"offline.queued.{kind}")
+        return cursor.lastrowid
+
+    def due(self, now=None):
+        """Entries whose next attempt has come, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(PendingRequest.FIELDS)} FROM pending_requests "
+                "WHERE next_attempt <= ? ORDER BY created_at",
+                (now or time.time(),)
+            ).fetchall()
+        return [PendingRequest(row) for row in rows]
+
+    def next_attempt(self):
+        """Earliest scheduled attempt, or None when the queue is empty"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_attempt) FROM pending_requests").fetchone()
+        return row[0]
+
+    def defer(self, entry, delay, error, count_attempt=False):
+        """Schedule an entry's next attempt delay seconds from now"""
+        attempts = entry.attempts + (1 if count_attempt else 0)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pending_requests SET next_attempt = ?, last_error = ?, attempts = ? WHERE id = ?",
+                (time.time() + delay, str(error), attempts, entry.id)
+            )
+        entry.attempts = attempts
+
+    def remove(self, entry_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pending_requests WHERE id = ?", (entry_id,))
+
+    def expire(self, max_age):
+        """Drop entries older than max_age seconds; returns how many"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM pending_requests WHERE created_at < ?", (time.time() - max_age,)
+            )
+        return cursor.rowcount
+
+    def list(self):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(PendingRequest.FIELDS)} FROM pending_requests ORDER BY created_at"
+            ).fetchall()
+        return [PendingRequest(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_requests").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class OfflineReplayer:
+    def __init__(self, queue, gemini, store, max_delay=300, max_age=24 * 3600, on_replayed=None):
+        """
+        Replay queued requests on the Gemini client's event loop
+        max_delay: cap on the retry delay in seconds
+        max_age: seconds after which a queued request is dropped
+        on_replayed(entry, words): called on the loop thread after a result is stored
+        """
+        self.queue = queue
+        self.gemini = gemini
+        self.store = store
+        self.max_delay = max_delay
+        self.max_age = max_age
+        self.on_replayed = on_replayed
+        self.logger = logging.getLogger('OfflineReplayer')
+        self.metrics = get_metrics()
+        self._wake = None
+        self._task = None
+        # Consecutive connection failures, for the backoff
+        self._failures = 0
+
+    def start(self):
+        """Start replaying in the background (call from any thread)"""
+        self.gemini.loop_thread.submit(self._start())
+
+    async def _start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    def wake(self):
+        """Check the queue now, e.g. after a request was added (call from any thread)"""
+        loop = self.gemini.loop_thread.loop
+        if self._wake is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    @property
+    def offline(self):
+        """Whether the last replay attempt could not reach Gemini"""
+        return self._failures > 0
+
+    def stop(self):
+        if self._task is not None:
+            self.gemini.loop_thread.loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _run(self):
+        while True:
+            expired = self.queue.expire(self.max_age)
+            if expired:
+                self.logger.warning(f"Dropped {expired} queued request(s) older than {self.max_age / 3600:g}h")
+
+            await self._replay_due()
+
+            next_attempt = self.queue.next_attempt()
+            timeout = None if next_attempt is None else max(0.0, next_attempt - time.time())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _backoff(self):
+        """Retry delay after the current run of connection failures, with jitter"""
+        delay = min(RETRY_BASE * 2 ** max(self._failures - 1, 0), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    async def _replay_due(self):
+        for entry in self.queue.due():
+            if self._already_stored(entry):
+                # Answered online since it was queued (or by another client)
+                self.queue.remove(entry.id)
+                self.metrics.increment(f"offline.skipped.{entry.kind}")
+                self.logger.info(f"Dropped {entry}: result already stored")
+                continue
+            try:
+                words = await self._replay(entry)
+            except asyncio.CancelledError:
+                raise
+            except BudgetExceededError as e:
+                self.logger.warning(f"Replay paused: {e}")
+                for pending in self.queue.due():
+                    self.queue.defer(pending, self.max_delay, e)
+                return
+            except Exception as e:
+                if is_connection_error(e):
+                    # Still offline: push everything due back together
+                    self._failures += 1
+                    delay = self._backoff()
+                    self.metrics.increment("offline.replay_offline")
+                    self.logger.info(f"Still offline, retrying {self.queue.count()} queued request(s) in {delay:.0f}s")
+                    for pending in self.queue.due():
+                        self.queue.defer(pending, delay, e)
+                    return
+                self.metrics.increment("offline.replay_failed")
+                if entry.attempts + 1 >= MAX_ATTEMPTS:
+                    self.logger.error(f"Dropping {entry} after {MAX_ATTEMPTS} failed replays: {e}")
+                    self.queue.remove(entry.id)
+                else:
+                    self.logger.warning(f"Replay of {entry} failed: {e}")
+                    self.queue.defer(entry, self._backoff(), e, count_attempt=True)
+                continue
+
+            self._failures = 0
+            self.queue.remove(entry.id)
+            self.metrics.increment(f"offline.replayed.{entry.kind}")
+            self.logger.info(f"Replayed {entry}: {len(words)} word(s) stored")
+            if self.on_replayed:
+                self.on_replayed(entry, words)
+
+    def _already_stored(self, entry):
+        """Whether the store already answers a queued request"""
+        # Entries queued under a quick document key (fingerprint.py)
+        content_hash = self.store.get_document_key(entry.content_hash) or entry.content_hash
+        if entry.kind == KIND_LOOKUP:
+            return self.store.find_cached_word(entry.text, entry.document, content_hash) is not None
+        return self.store.get_cached_page(
+            content_hash, entry.page, entry.prompt_hash,
+            self.gemini.router.models(*PAGE_OPERATIONS), entry.dpi
+        ) is not None
+
+    async def _replay(self, entry):
+        """Send one queued request and store its result; returns the words"""
+        payload = json.loads(entry.payload)
+        if entry.kind == KIND_LOOKUP:
+            word, _, _, model = await self.gemini.run_lookup_request_async(payload, document=entry.document)
+            words = [word] if word else []
+        else:
+            words, _, _, model = await self.gemini.run_page_request_async(payload, document=entry.document)
+
+        if any(word.known for word in words):
+            self.store.fill_known_words(entry.document, words)
+        if words:
+            self.store.record_analysis(
+                entry.document, entry.page, words, model,
+                kind=entry.kind, content_hash=entry.content_hash,
+                prompt_hash=entry.prompt_hash, dpi=entry.dpi
+            )
+            self.store.flush()
+        return words
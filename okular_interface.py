@@ -6,19 +6,73 @@ D-Bus interface to communicate with Okular
 import dbus
 import subprocess
 import logging
+import re
+import unicodedata
 from pdf2image import convert_from_path
 from PIL import Image
 import os
 
+from tamil_assistant.tamil_text import normalize
+from tamil_assistant.word_boxes import parse_bbox_layout
+from tamil_assistant.render_dpi import DpiSelector, DEFAULT_DPI
+
+# Characters that show a text layer was extracted through a broken font mapping
+TAMIL_CHAR_PATTERN = re.compile('[\u0B80-\u0BFF]')
+PRIVATE_USE_PATTERN = re.compile('[\uE000-\uF8FF\uFFFD]')
+# Legacy 8-bit Tamil fonts (TAM, TAB, TSCII) map glyphs onto Latin-1 letters
+LEGACY_GLYPH_PATTERN = re.compile('[\u00C0-\u00FF\u0100-\u017F]')
+# A dependent vowel sign or pulli must follow a consonant. Prebase signs
+# (\u0BC6-\u0BC8) at the start of a word are the classic visual-order bug.
+ORPHAN_SIGN_PATTERN = re.compile('(?:^|[^\u0B95-\u0BB9])[\u0BBE-\u0BCD\u0BD7]', re.MULTILINE)
+
+# Pages without a text layer before a document is treated as scanned
+SCANNED_DOCUMENT_PAGES = 3
+
+
+def check_tamil_text_layer(text, min_tamil_chars=20):
+    """
+    Decide whether extracted PDF text is usable Tamil
+    Returns (usable, reason)
+    """
+    text = unicodedata.normalize('NFC', text)
+    tamil_chars = len(TAMIL_CHAR_PATTERN.findall(text))
+    letters = sum(1 for c in text if c.isalpha()) or 1
+
+    if PRIVATE_USE_PATTERN.search(text):
+        return False, "private-use or replacement glyphs"
+    if len(LEGACY_GLYPH_PATTERN.findall(text)) > 0.05 * letters:
+        return False, "legacy 8-bit Tamil font encoding"
+    if tamil_chars < min_tamil_chars:
+        return False, f"only {tamil_chars} Tamil characters"
+
+    orphan_signs = len(ORPHAN_SIGN_PATTERN.findall(text))
+    if orphan_signs > 0.05 * tamil_chars:
+        return False, f"{orphan_signs} vowel signs without a consonant (broken glyph order)"
+
+    return True, f"{tamil_chars} Tamil characters"
+
 class OkularInterface:
-    def __init__(self):
-        self.bus = dbus.SessionBus()
+    def __init__(self, use_text_layer=True, min_tamil_chars=20, dpi_selector=None, session_bus=True):
+        """
+        session_bus: connect to the session bus to find Okular; headless
+        users (the API server) only render and read PDFs and pass False
+        """
+        self.bus = dbus.SessionBus() if session_bus else None
         self.okular_service = None
         self.okular_object = None
         self.logger = logging.getLogger('OkularInterface')
 
+        self.use_text_layer = use_text_layer
+        self.min_tamil_chars = min_tamil_chars
+        # (pdf_path, mtime) -> {'pages': {page: text or None}, 'misses': int}
+        self._text_layer_cache = {}
+        self.dpi_selector = dpi_selector or DpiSelector(fixed_dpi=DEFAULT_DPI)
+
     def find_okular(self):
         """Find running Okular instance via D-Bus"""
+        if self.bus is None:
+            self.logger.warning("No session bus, Okular cannot be found")
+            return False
         try:
             # List all services
             proxy = self.bus.get_object('org.freedesktop.DBus',
@@ -108,21 +162,27 @@ class OkularInterface:
             # For now, return from clipboard
             import subprocess
             text = subprocess.check_output(['xclip', '-o', '-selection', 'primary']).decode('utf-8')
-            return text.strip()
+            return normalize(text)
         except:
             return ""
 
-    def render_page_to_image(self, pdf_path, page_number):
-        """Render a PDF page to image"""
+    def choose_dpi(self, pdf_path, page_number):
+        """Render DPI for a document (probes the page on first use when automatic)"""
+        return self.dpi_selector.choose(pdf_path, page_number, self.render_page_to_image)
+
+    def render_page_to_image(self, pdf_path, page_number, dpi=None):
+        """Render a PDF page to image (at the document's chosen DPI by default)"""
+        if dpi is None:
+            dpi = self.choose_dpi(pdf_path, page_number)
         try:
-            self.logger.info(f"Rendering page {page_number} from PDF: {os.path.basename(pdf_path)}")
+            self.logger.info(f"Rendering page {page_number} from PDF: {os.path.basename(pdf_path)} at {dpi} dpi")
             
             # Convert PDF page to image (1-indexed for pdf2image)
             images = convert_from_path(
                 pdf_path,
                 first_page=page_number,  # Okular uses 0-indexed, pdf2image uses 1-indexed
                 last_page=page_number,
-                dpi=200
+                dpi=dpi
             )
 
             if images:
@@ -134,3 +194,81 @@ class OkularInterface:
         except Exception as e:
             self.logger.error(f"Failed to render page: {e}")
             raise Exception(f"Failed to render page: {e}")
+
+    def get_page_text(self, pdf_path, page_number):
+        """
+        Get the page's embedded Tamil text if the PDF has a usable text layer
+        Returns None for scanned pages or broken font mappings; results are
+        cached per document
+        """
+        if not self.use_text_layer:
+            return None
+
+        try:
+            mtime = os.path.getmtime(pdf_path)
+        except OSError:
+            return None
+
+        doc_cache = self._text_layer_cache.setdefault((pdf_path, mtime), {'pages': {}, 'misses': 0})
+        if page_number in doc_cache['pages']:
+            return doc_cache['pages'][page_number]
+
+        # Documents whose first pages had no text are scanned; skip extraction
+        if doc_cache['misses'] >= SCANNED_DOCUMENT_PAGES and not any(doc_cache['pages'].values()):
+            return None
+
+        text = None
+        try:
+            raw = subprocess.check_output(
+                ['pdftotext', '-f', str(page_number), '-l', str(page_number),
+                 '-enc', 'UTF-8', '-layout', pdf_path, '-'],
+                stderr=subprocess.DEVNULL,
+                timeout=10
+            ).decode('utf-8', errors='replace').strip()
+
+            if raw:
+                usable, reason = check_tamil_text_layer(raw, self.min_tamil_chars)
+                self.logger.info(f"Text layer on page {page_number}: {'usable' if usable else 'unusable'} ({reason})")
+                if usable:
+                    text = raw
+            else:
+                self.logger.info(f"No text layer on page {page_number}")
+        except Exception as e:
+            self.logger.warning(f"Text layer extraction failed: {e}")
+
+        if text is None:
+            doc_cache['misses'] += 1
+        doc_cache['pages'][page_number] = text
+        return text
+
+    def get_page_count(self, pdf_path):
+        """Number of pages in a PDF (pdfinfo)"""
+        output = subprocess.check_output(
+            ['pdfinfo', pdf_path], stderr=subprocess.DEVNULL, timeout=10
+        ).decode('utf-8', errors='replace')
+        match = re.search(r'^Pages:\s+(\d+)', output, re.MULTILINE)
+        if not match:
+            raise Exception(f"Could not read page count of {os.path.basename(pdf_path)}")
+        return int(match.group(1))
+
+    def get_page_word_boxes(self, pdf_path, page_number):
+        """
+        Word boxes from the PDF text layer, or None when the page has no
+        usable text layer (same checks as get_page_text)
+        """
+        if self.get_page_text(pdf_path, page_number) is None:
+            return None
+
+        try:
+            xhtml = subprocess.check_output(
+                ['pdftotext', '-f', str(page_number), '-l', str(page_number),
+                 '-enc', 'UTF-8', '-bbox-layout', pdf_path, '-'],
+                stderr=subprocess.DEVNULL,
+                timeout=10
+            ).decode('utf-8', errors='replace')
+            words = parse_bbox_layout(xhtml)
+            self.logger.info(f"Text layer word boxes on page {page_number}: {len(words)}")
+            return words
+        except Exception as e:
+            self.logger.warning(f"Word box extraction failed: {e}")
+            return None
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Encode-once page images for Tamil Assistant
+A rendered page is JPEG-encoded a single time; page analysis and every
+lookup on that page reuse the compressed bytes and their base64 form, and
+the decoded image is only rebuilt when something actually needs pixels
+"""
+
+import base64
+import io
+
+from PIL import Image
+
+JPEG_QUALITY = 85
+
+
+def encode_jpeg(image, quality=JPEG_QUALITY):
+    """JPEG bytes of a PIL image, flattening transparency onto white"""
+    # Convert to RGB if needed (remove alpha channel)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        rgb_image.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        image = rgb_image
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class PagePayload:
+    """Compressed page image shared by all requests for one page"""
+
+    def __init__(self, jpeg_bytes, size):
+        self.jpeg_bytes = jpeg_bytes
+        self.size = size
+        self._base64 = None
+
+    @classmethod
+    def from_image(cls, image, quality=JPEG_QUALITY):
+        """Encode a rendered page; the caller can drop the image afterwards"""
+        return cls(encode_jpeg(image, quality), image.size)
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def mime_type(self):
+        return 'image/jpeg'
+
+    @property
+    def base64(self):
+        """Base64 text for inline_data, computed on first use and kept"""
+        if self._base64 is None:
+            self._base64 = base64.b64encode(self.jpeg_bytes).decode('ascii')
+        return self._base64
+
+    def decode(self):
+        """Decoded PIL image; not cached, so callers release it when done"""
+        image = Image.open(io.BytesIO(self.jpeg_bytes))
+        image.load()
+        return image
+
+    def __len__(self):
+        return len(self.jpeg_bytes)
+
+    def __repr__(self):
+        return f"PagePayload({self.width}x{self.height}, {len(self.jpeg_bytes) // 1024} KB)"
+
+
+def as_image(page):
+    """PIL image from either a PagePayload or an image"""
+    return page.decode() if isinstance(page, PagePayload) else page
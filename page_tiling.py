@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Split dense pages into overlapping regions along whitespace
+Used by tiled page analysis so that each request stays well under the
+model's output token limit
+"""
+
+import math
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger('PageTiling')
+
+# Mean gray level above which a row or column counts as blank paper
+WHITESPACE_LEVEL = 245
+# A vertical gutter must be at least this fraction of the page width
+MIN_GUTTER_FRACTION = 0.02
+
+
+def _profile(gray, horizontal):
+    """Mean gray level per row (horizontal=True) or per column"""
+    width, height = gray.size
+    # A box-filtered resize to a single column/row averages each line in C
+    size = (1, height) if horizontal else (width, 1)
+    return list(gray.resize(size, Image.BOX).getdata())
+
+
+def _blank_runs(profile, min_length):
+    """(start, end) runs of blank lines at least min_length long"""
+    runs = []
+    start = None
+    for i, level in enumerate(profile + [0]):
+        if level >= WHITESPACE_LEVEL:
+            if start is None:
+                start = i
+        elif start is not None:
+            if i - start >= min_length:
+                runs.append((start, i))
+            start = None
+    return runs
+
+
+def _find_column_split(gray):
+    """x position of a central gutter on two-column pages, or None"""
+    width, _ = gray.size
+    profile = _profile(gray, horizontal=False)
+    min_gutter = max(2, int(width * MIN_GUTTER_FRACTION))
+
+    for start, end in _blank_runs(profile, min_gutter):
+        middle = (start + end) // 2
+        if 0.3 * width <= middle <= 0.7 * width:
+            return middle
+    return None
+
+
+def _find_band_cuts(gray, bands):
+    """y positions splitting a column into bands, snapped to blank rows"""
+    _, height = gray.size
+    if bands <= 1:
+        return []
+
+    blank_rows = [(start + end) // 2 for start, end in _blank_runs(_profile(gray, horizontal=True), 3)]
+    window = height / (2 * bands)
+
+    cuts = []
+    for k in range(1, bands):
+        ideal = k * height / bands
+        nearby = [y for y in blank_rows if abs(y - ideal) <= window]
+        # Without a blank row nearby the overlap keeps the cut line readable
+        cuts.append(min(nearby, key=lambda y: abs(y - ideal)) if nearby else int(ideal))
+    return sorted(set(cuts))
+
+
+def find_tiles(image, max_tiles=4, overlap=40):
+    """
+    Regions covering the page in reading order (left column first, top to bottom)
+    Returns a list of (left, top, right, bottom) boxes; blank regions are skipped
+    """
+    gray = image.convert('L')
+    width, height = gray.size
+
+    split = _find_column_split(gray)
+    columns = [(0, split), (split, width)] if split else [(0, width)]
+    bands = max(1, math.ceil(max_tiles / len(columns)))
+
+    tiles = []
+    for left, right in columns:
+        column = gray.crop((left, 0, right, height))
+        edges = [0] + _find_band_cuts(column, bands) + [height]
+        for top, bottom in zip(edges, edges[1:]):
+            box = (
+                max(0, left - overlap if left else 0),
+                max(0, top - overlap),
+                min(width, right + overlap if right < width else width),
+                min(height, bottom + overlap)
+            )
+            region = gray.crop(box)
+            if min(_profile(region, horizontal=True)) >= WHITESPACE_LEVEL:
+                continue
+            tiles.append(box)
+
+    logger.info(f"Page {width}x{height} split into {len(tiles)} tiles ({len(columns)} columns)")
+    return tiles
+
+
+def downscale(image, max_side):
+    """Copy of image whose longest side is at most max_side pixels"""
+    scale = max_side / max(image.size)
+    if scale >= 1:
+        return image
+    size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+tamil-assistant-ctl: command-line client of the running panel
+Sends lookups, page analyses and prefetches to the panel's D-Bus service
+so that they reuse its warm connections and caches. Meant for scripts and
+window-manager keybindings; it imports nothing heavier than dbus.
+"""
+
+import argparse
+import json
+import sys
+
+import dbus
+
+from tamil_assistant.panel_service import BUS_NAME, OBJECT_PATH, INTERFACE
+
+# Analyses and lookups wait for the model; D-Bus's default is 25 seconds
+CALL_TIMEOUT = 300
+
+
+def _panel():
+    bus = dbus.SessionBus()
+    return dbus.Interface(bus.get_object(BUS_NAME, OBJECT_PATH), INTERFACE)
+
+
+def _print_words(words):
+    for word in words:
+        print(f"{word['tamil_word']}  ({word['literal_translation']})")
+        print(f"    {word['contextual_meaning']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='tamil-assistant-ctl',
+        description='Control the running Tamil Assistant panel'
+    )
+    parser.add_argument('--json', action='store_true', help='Print the raw JSON reply')
+    commands = parser.add_subparsers(dest='command', required=True)
+    lookup = commands.add_parser('lookup', help='Explain TEXT, or the Okular selection')
+    lookup.add_argument('text', nargs='?', default='')
+    commands.add_parser('analyze', help='Analyze the page open in Okular')
+    prefetch = commands.add_parser('prefetch', help='Analyze pages in the background')
+    prefetch.add_argument('pages', nargs='?', default='+5',
+                          help="Pages like '12-20,25', or '+N' after the current page (default: +5)")
+    commands.add_parser('status', help='Show what the panel is doing')
+    commands.add_parser('show', help='Bring the panel window up')
+    args = parser.parse_args(argv)
+
+    try:
+        panel = _panel()
+        if args.command == 'lookup':
+            reply = panel.Lookup(args.text, timeout=CALL_TIMEOUT)
+        elif args.command == 'analyze':
+            reply = panel.AnalyzeCurrentPage(timeout=CALL_TIMEOUT)
+        elif args.command == 'prefetch':
+            reply = panel.Prefetch(args.pages)
+        elif args.command == 'status':
+            reply = panel.Status()
+        else:
+            panel.Show()
+            return 0
+    except dbus.exceptions.DBusException as e:
+        if e.get_dbus_name() == 'org.freedesktop.DBus.Error.ServiceUnknown':
+            print("Tamil Assistant panel is not running", file=sys.stderr)
+        else:
+            print(f"Error: {e.get_dbus_message()}", file=sys.stderr)
+        return 1
+
+    result = json.loads(str(reply))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.command == 'lookup':
+        if result['word']:
+            _print_words([result['word']])
+    elif args.command == 'analyze':
+        _print_words(result['words'])
+    elif args.command == 'prefetch':
+        print(f"Prefetching {len(result['pages'])} pages: "
+              f"{result['pages'][0]}-{result['pages'][-1]}")
+    else:
+        for key, value in result.items():
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+D-Bus service of the running Tamil Assistant panel
+Exposes lookups, page analysis and prefetching on the session bus so that
+scripts and i3 keybindings (through tamil-assistant-ctl) reuse the panel's
+warm HTTP connections, render caches and vocabulary store instead of
+starting a new process. Replies are JSON strings.
+"""
+
+import json
+import logging
+
+import dbus
+import dbus.service
+
+from tamil_assistant.metrics import get_metrics
+
+BUS_NAME = 'org.tamilassistant.Panel'
+OBJECT_PATH = '/org/tamilassistant/Panel'
+INTERFACE = 'org.tamilassistant.Panel'
+
+
+class ServiceError(dbus.DBusException):
+    _dbus_error_name = f'{INTERFACE}.Error'
+
+
+def _word_dict(word):
+    return word.to_dict() if word is not None else None
+
+
+class PanelService(dbus.service.Object):
+    def __init__(self, panel, bus=None):
+        """
+        Export the panel on the session bus
+        The session bus must use the GLib main loop (DBusGMainLoop), so that
+        method calls arrive on the GTK main thread
+        """
+        self.panel = panel
+        self.logger = logging.getLogger('PanelService')
+        bus = bus or dbus.SessionBus()
+        self._name = dbus.service.BusName(BUS_NAME, bus, do_not_queue=True)
+        super().__init__(bus, OBJECT_PATH)
+        self.logger.info(f"D-Bus service {BUS_NAME} ready")
+
+    def _failure(self, error_callback):
+        def fail(error):
+            error_callback(ServiceError(str(error) or type(error).__name__))
+        return fail
+
+    @dbus.service.method(INTERFACE, in_signature='s', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def Lookup(self, text, reply, error):
+        """Explain text (the Okular selection when empty) in the context of the current page"""
+        get_metrics().increment('service.lookup')
+
+        def done(result):
+            pdf_path, page_num, _, word, source = result
+            reply(json.dumps({
+                'document': pdf_path, 'page': page_num,
+                'word': _word_dict(word), 'saved': bool(source),
+            }, ensure_ascii=False))
+
+        self.panel.start_lookup(text or None, on_result=done, on_failure=self._failure(error))
+
+    @dbus.service.method(INTERFACE, in_signature='', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def AnalyzeCurrentPage(self, reply, error):
+        """Analyze the page open in Okular (two pages in spread mode)"""
+        get_metrics().increment('service.analyze')
+
+        def done(result):
+            pdf_path, page_num, _, words = result
+            reply(json.dumps({
+                'document': pdf_path, 'page': page_num,
+                'words': [w.to_dict() for w in words],
+            }, ensure_ascii=False))
+
+        self.panel.start_analysis(on_result=done, on_failure=self._failure(error))
+
+    @dbus.service.method(INTERFACE, in_signature='s', out_signature='s')
+    def Prefetch(self, pages):
+        """
+        Analyze pages of the current document in the background
+        pages: a range list like '12-20,25', or '+N' for the N pages after
+        the current one. Returns immediately with the queued pages.
+        """
+        get_metrics().increment('service.prefetch')
+        try:
+            pdf_path, queued = self.panel.start_prefetch(pages)
+        except Exception as e:
+            raise ServiceError(str(e))
+        return json.dumps({'document': pdf_path, 'pages': queued}, ensure_ascii=False)
+
+    @dbus.service.method(INTERFACE, in_signature='', out_signature='s')
+    def Status(self):
+        """Current document, page, running tasks and prefetch progress"""
+        return json.dumps(self.panel.service_status(), ensure_ascii=False)
+
+    @dbus.service.method(INTERFACE, in_signature='', out_signature='')
+    def Show(self):
+        """Bring the panel window up"""
+        self.panel.show_all()
+        self.panel.present()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Main-loop watchdog and opt-in profiling for Tamil Assistant
+The watchdog runs a heartbeat on the GLib main loop and a monitor thread
+that logs any stall over a threshold together with a stack sample of the
+main thread. The profiler wraps selected panel methods with cProfile and
+writes one .prof file per call to the log directory (enabled with
+--profile or TAMIL_ASSISTANT_PROFILE=1).
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from tamil_assistant.metrics import get_metrics
+
+PROFILE_ENV = 'TAMIL_ASSISTANT_PROFILE'
+# Functions listed in the log for each profile
+PROFILE_TOP_FUNCTIONS = 15
+
+
+def profiling_requested():
+    """Whether profiling was switched on through the environment"""
+    return os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+class MainLoopWatchdog:
+    def __init__(self, threshold=0.25, interval=0.05):
+        """
+        Detect main-loop stalls
+        threshold: seconds without a heartbeat that count as a stall
+        interval: heartbeat period in seconds
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.logger = logging.getLogger('MainLoopWatchdog')
+        self.metrics = get_metrics()
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._stall_reported = False
+        self._source_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the heartbeat (call from the main thread) and the monitor thread"""
+        from gi.repository import GLib
+        self._last_beat = time.monotonic()
+        self._source_id = GLib.timeout_add(int(self.interval * 1000), self._beat)
+        self._thread = threading.Thread(target=self._monitor, name='MainLoopWatchdog', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Main-loop watchdog started (stall threshold {self.threshold * 1000:.0f} ms)")
+
+    def stop(self):
+        from gi.repository import GLib
+        self._stop.set()
+        if self._source_id is not None:
+            GLib.source_remove(self._source_id)
+            self._source_id = None
+
+    def _beat(self):
+        """Heartbeat on the main loop: record how late it ran"""
+        now = time.monotonic()
+        gap = now - self._last_beat
+        self.metrics.observe('mainloop.latency', max(0.0, gap - self.interval))
+        if self._stall_reported:
+            self.metrics.observe('mainloop.stall', gap)
+            self.logger.warning(f"Main loop resumed after a {gap * 1000:.0f} ms stall")
+            self._stall_reported = False
+        self._last_beat = now
+        return True
+
+    def _monitor(self):
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat
+            if stalled > self.threshold and not self._stall_reported:
+                self._stall_reported = True
+                self.metrics.increment('mainloop.stalls')
+                self.logger.warning(
+                    f"Main loop stalled for {stalled * 1000:.0f} ms; main thread is at:\n"
+                    f"{self._sample_main_thread()}"
+                )
+
+    def _sample_main_thread(self):
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return "  (no frame)"
+        return ''.join(traceback.format_stack(frame)).rstrip()
+
+
+# cProfile can profile one call at a time per process (on Python 3.12+
+# enabling a second profiler raises ValueError), so profiles never overlap
+_profile_lock = threading.Lock()
+
+
+class Profiler:
+    def __init__(self, output_dir):
+        """
+        cProfile wrapper writing one .prof file per profiled call to output_dir
+        Calls that start while another call is being profiled run unprofiled.
+        """
+        self.output_dir = output_dir
+        self.logger = logging.getLogger('Profiler')
+        os.makedirs(output_dir, exist_ok=True)
+
+    def wrap(self, function, name=None):
+        """Profiled version of a function or coroutine function"""
+        name = name or function.__name__
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                steps = _ProfiledSteps(function(*args, **kwargs))
+                started = time.monotonic()
+                try:
+                    return await steps
+                finally:
+                    if steps.profiled:
+                        self._report(steps.profile, name, started)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                profile = cProfile.Profile()
+                if not _enable(profile):
+                    return function(*args, **kwargs)
+                started = time.monotonic()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    _disable(profile)
+                    self._report(profile, name, started)
+        return wrapper
+
+    def _report(self, profile, name, started):
+        elapsed = time.monotonic() - started
+        path = os.path.join(self.output_dir, f"{name}_{datetime.now():%Y%m%d_%H%M%S_%f}.prof")
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            self.logger.warning(f"Could not write profile {path}: {e}")
+            path = None
+
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+        self.logger.info(f"Profile of {name} ({elapsed * 1000:.0f} ms, {path}):\n{summary.getvalue().strip()}")
+
+
+def _enable(profile):
+    """Start profiling unless another profile is running; returns whether it started"""
+    if not _profile_lock.acquire(blocking=False):
+        return False
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiling tool is active
+        _profile_lock.release()
+        return False
+    return True
+
+
+def _disable(profile):
+    profile.disable()
+    _profile_lock.release()
+
+
+class _ProfiledSteps:
+    """
+    Awaitable running a coroutine with the profile enabled only while the
+    coroutine itself runs: between awaits the event loop runs other tasks,
+    which must not end up in this profile
+    """
+
+    def __init__(self, coroutine):
+        self.coroutine = coroutine
+        self.profile = cProfile.Profile()
+        # Whether any step ran profiled
+        self.profiled = False
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            enabled = _enable(self.profile)
+            self.profiled = self.profiled or enabled
+            try:
+                if error is not None:
+                    step = self.coroutine.throw(error)
+                else:
+                    step = self.coroutine.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                if enabled:
+                    _disable(self.profile)
+
+            value, error = None, None
+            try:
+                value = yield step
+            except GeneratorExit:
+                self.coroutine.close()
+                raise
+            except BaseException as e:
+                error = e
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Automatic render resolution for Tamil Assistant
+A cheap low-resolution probe render measures the height of the page's text
+lines; the page is then rendered at the DPI that makes small print
+legible without oversizing large-print pages, within configured bounds.
+The choice is made once per document.
+"""
+
+import logging
+import os
+import statistics
+
+from PIL import Image
+
+from tamil_assistant.page_tiling import WHITESPACE_LEVEL
+
+logger = logging.getLogger('RenderDPI')
+
+# Resolution rendered when automatic selection is off or finds no text
+DEFAULT_DPI = 200
+# Chosen resolutions are rounded to this step
+DPI_STEP = 25
+# Text lines taller than this fraction of the page are pictures or rules
+MAX_LINE_FRACTION = 0.1
+# Lines needed before the measurement is trusted
+MIN_LINES = 3
+
+
+def measure_line_heights(image):
+    """Heights in pixels of the text lines on a page image (runs of inked rows)"""
+    gray = image.convert('L')
+    width, height = gray.size
+    # A box-filtered resize to a single column averages each row in C
+    profile = list(gray.resize((1, height), Image.BOX).getdata())
+
+    heights = []
+    start = None
+    for y, level in enumerate(profile + [255]):
+        if level < WHITESPACE_LEVEL:
+            if start is None:
+                start = y
+        elif start is not None:
+            run = y - start
+            if 2 <= run <= height * MAX_LINE_FRACTION:
+                heights.append(run)
+            start = None
+    return heights
+
+
+class DpiSelector:
+    def __init__(self, fixed_dpi=None, min_dpi=100, max_dpi=300, target_line_px=40,
+                 probe_dpi=50, max_side_px=3500):
+        """
+        Choose render DPIs
+        fixed_dpi: always use this resolution (None = automatic)
+        target_line_px: wanted height of the smaller text lines in the render
+        max_side_px: cap on the rendered page's longer side
+        """
+        self.fixed_dpi = fixed_dpi
+        self.min_dpi = min_dpi
+        self.max_dpi = max_dpi
+        self.target_line_px = target_line_px
+        self.probe_dpi = probe_dpi
+        self.max_side_px = max_side_px
+        # (pdf_path, mtime) -> chosen DPI
+        self._chosen = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            fixed_dpi=config.get_render_dpi(),
+            min_dpi=config.get_render_min_dpi(),
+            max_dpi=config.get_render_max_dpi(),
+            target_line_px=config.get_render_target_line_px(),
+        )
+
+    def known(self, pdf_path):
+        """DPI already chosen for a document, or None if it has not been probed"""
+        if self.fixed_dpi:
+            return self.fixed_dpi
+        try:
+            return self._chosen.get((pdf_path, os.path.getmtime(pdf_path)))
+        except OSError:
+            return None
+
+    def choose(self, pdf_path, page_number, render):
+        """
+        DPI for a document, probing page_number on first use
+        render(pdf_path, page_number, dpi) renders a page image. Pages with
+        too few text lines (pictures, blank pages) give the default DPI and
+        are not remembered, so the next page is probed instead.
+        """
+        dpi = self.known(pdf_path)
+        if dpi:
+            return dpi
+
+        probe = render(pdf_path, page_number, dpi=self.probe_dpi)
+        dpi = self.dpi_for_probe(probe)
+        if dpi is None:
+            logger.info(f"Page {page_number}: no text lines in probe, rendering at {DEFAULT_DPI} dpi")
+            return min(max(DEFAULT_DPI, self.min_dpi), self.max_dpi)
+
+        self._chosen[(pdf_path, os.path.getmtime(pdf_path))] = dpi
+        logger.info(f"{os.path.basename(pdf_path)}: rendering at {dpi} dpi (probed page {page_number})")
+        return dpi
+
+    def dpi_for_probe(self, probe):
+        """DPI from a probe render, or None if the page has too little text"""
+        heights = measure_line_heights(probe)
+        if len(heights) < MIN_LINES:
+            return None
+
+        # The lower quartile sizes the render for the small print on the page
+        line_px = statistics.quantiles(heights, n=4)[0] if len(heights) >= 4 else min(heights)
+        dpi = self.probe_dpi * self.target_line_px / max(line_px, 1)
+
+        # Keep the rendered page within the pixel budget
+        longest_inches = max(probe.size) / self.probe_dpi
+        dpi = min(dpi, self.max_side_px / longest_inches)
+
+        dpi = min(max(int(round(dpi / DPI_STEP) * DPI_STEP), self.min_dpi), self.max_dpi)
+        logger.info(f"Probe: {len(heights)} lines, lower quartile {line_px:.1f}px at {self.probe_dpi} dpi -> {dpi} dpi")
+        return dpi
@@ -7,21 +7,56 @@ Integrates with Okular and Google Gemini
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib, Gdk, Pango
+import dbus
+from dbus.mainloop.glib import DBusGMainLoop
 import sys
 import signal
 import logging
 import os
 import argparse
+import asyncio
 import shutil
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 
 from tamil_assistant.config_manager import get_config
 from tamil_assistant.okular_interface import OkularInterface
 from tamil_assistant.gemini_client import GeminiClient, TamilWord
+from tamil_assistant.vocabulary_store import VocabularyStore
+from tamil_assistant.token_ledger import get_token_ledger, STATUS_OK, STATUS_SOFT, BudgetExceededError
+from tamil_assistant.local_ocr import LocalOCR
+from tamil_assistant.async_bridge import GLibBridge
+from tamil_assistant.page_payload import PagePayload
+from tamil_assistant.word_boxes import PageWordIndex, crop_region
+from tamil_assistant.render_dpi import DpiSelector
+from tamil_assistant.model_routing import PAGE_OPERATIONS
+from tamil_assistant.word_details import (
+    DetailFetcher, PageDetails, needs_details, merge_details, details_prompt_hash
+)
+from tamil_assistant.offline_queue import (
+    OfflineQueue, OfflineReplayer, QueuedOffline, is_connection_error, KIND_PAGE, KIND_LOOKUP
+)
+from tamil_assistant.cache_bundle import (
+    prompt_hash, export_bundle, import_bundle, BundleError
+)
+from tamil_assistant.fingerprint import DocumentFingerprints, page_hash
+from tamil_assistant.metrics import get_metrics
+from tamil_assistant import doctor
+from tamil_assistant.profiling import MainLoopWatchdog, Profiler, profiling_requested
+from tamil_assistant.panel_service import PanelService, BUS_NAME as PANEL_BUS_NAME
+from tamil_assistant.tamil_text import normalize
+from tamil_assistant.batch_jobs import (
+    BatchRunner, BatchError, parse_page_ranges, JOB_SUBMITTED, JOB_INGESTED
+)
+
+# Pages whose word boxes are kept for cropping lookups
+WORD_INDEX_PAGES = 8
+# Pages after the current one prefetched when no range is given
+PREFETCH_DEFAULT_PAGES = 5
 
 class TamilSidePanel(Gtk.Window):
-    def __init__(self):
+    def __init__(self, profile=False):
         super().__init__(title="Tamil Assistant")
 
         # Setup logging
@@ -41,24 +76,87 @@ class TamilSidePanel(Gtk.Window):
             sys.exit(1)
 
         # Initialize interfaces
-        self.okular = OkularInterface()
+        self.okular = OkularInterface(
+            use_text_layer=self.config.get_use_text_layer(),
+            min_tamil_chars=self.config.get_text_layer_min_tamil_chars(),
+            dpi_selector=DpiSelector.from_config(self.config)
+        )
         self.gemini = GeminiClient()  # Now reads from config automatically
+        self.async_bridge = GLibBridge(self.gemini.loop_thread)
+        self.active_tasks = set()
+        self.store = VocabularyStore(self.config.get_database_path())
+        self.fingerprints = DocumentFingerprints(self.store)
+        self.offline_queue = None
+        if self.config.get_offline_queue_enabled():
+            self.offline_queue = OfflineQueue(self.config.get_offline_queue_path())
+            self.replayer = OfflineReplayer(
+                self.offline_queue, self.gemini, self.store,
+                max_delay=self.config.get_offline_retry_max(),
+                max_age=self.config.get_offline_max_age(),
+                on_replayed=self._on_replayed
+            )
+            self.replayer.start()
+        self.ocr = None
+        if self.config.get_ocr_enabled():
+            self.ocr = LocalOCR(
+                language=self.config.get_ocr_language(),
+                min_confidence=self.config.get_ocr_min_confidence(),
+                min_tamil_chars=self.config.get_ocr_min_tamil_chars(),
+                workers=self.config.get_ocr_workers()
+            )
 
         # State
         self.current_words = []
-        self.current_page_image = None
+        self.current_page_payload = None
+        # (pdf_path, page) -> PageWordIndex for cropping lookups
+        self.word_indexes = OrderedDict()
+        # (pdf_path, page) -> PageDetails of two-tier analyses
+        self.page_details = OrderedDict()
+        self.details = DetailFetcher(
+            self.gemini, self.store,
+            batch_size=self.config.get_details_batch_size(),
+            on_details=self._on_details
+        )
+        self.current_pdf_path = None
         self.current_file_name = None
         self.current_page_number = None
+        self.prefetch_progress = None
 
         # Setup window
         self.setup_window()
         self.setup_ui()
         self.setup_styling()
 
+        self.setup_diagnostics(profile)
+
+        self.service = None
+        if self.config.get_service_enabled():
+            try:
+                self.service = PanelService(self)
+            except dbus.exceptions.NameExistsException:
+                self.logger.warning(f"{PANEL_BUS_NAME} is taken by another panel, D-Bus service disabled")
+            except Exception as e:
+                self.logger.warning(f"D-Bus service unavailable: {e}")
+
+    def setup_diagnostics(self, profile):
+        """Start the main-loop watchdog and wrap hot paths with the profiler"""
+        self.watchdog = None
+        if self.config.get_watchdog_enabled():
+            self.watchdog = MainLoopWatchdog(threshold=self.config.get_stall_threshold())
+            self.watchdog.start()
+
+        if profile or profiling_requested() or self.config.get_profiling_enabled():
+            profiler = Profiler(self.log_dir / "profiles")
+            self._do_analyze = profiler.wrap(self._do_analyze)
+            self._do_lookup = profiler.wrap(self._do_lookup)
+            self._update_word_list = profiler.wrap(self._update_word_list)
+            self.logger.info(f"Profiling enabled, writing to {profiler.output_dir}")
+
     def setup_logging(self):
         """Setup logging with datetime-based file splitting"""
         # Create logs directory in user's home directory if it doesn't exist
         log_dir = Path.home() / ".local" / "share" / "tamil-assistant" / "logs"
+        self.log_dir = log_dir
         
         try:
             log_dir.mkdir(parents=True, exist_ok=True)
@@ -165,6 +263,12 @@ class TamilSidePanel(Gtk.Window):
         self.context_label.set_margin_top(5)
         vbox.pack_start(self.context_label, False, False, 0)
 
+        # Token usage for today against the configured budget
+        self.usage_label = Gtk.Label()
+        self.usage_label.set_halign(Gtk.Align.CENTER)
+        vbox.pack_start(self.usage_label, False, False, 0)
+        self._update_usage_display()
+
         vbox.pack_start(Gtk.Separator(), False, False, 5)
 
         # Button box
@@ -175,7 +279,12 @@ class TamilSidePanel(Gtk.Window):
         self.lookup_btn = Gtk.Button(label="🔍 Lookup Selected")
         self.lookup_btn.set_tooltip_text("Lookup selected text (select in Okular first)")
 
+        self.spread_btn = Gtk.ToggleButton(label="📖")
+        self.spread_btn.set_tooltip_text("Analyze two facing pages (current and next) in one request")
+        self.spread_btn.set_active(self.config.get_spread_mode())
+
         btn_box.pack_start(self.analyze_btn, True, True, 0)
+        btn_box.pack_start(self.spread_btn, False, False, 0)
         btn_box.pack_start(self.lookup_btn, True, True, 0)
         vbox.pack_start(btn_box, False, False, 0)
 
@@ -184,17 +293,28 @@ class TamilSidePanel(Gtk.Window):
         self.spinner = Gtk.Spinner()
         self.status = Gtk.Label(label="Ready")
         self.status.set_halign(Gtk.Align.START)
+        self.cancel_btn = Gtk.Button(label="✖")
+        self.cancel_btn.set_tooltip_text("Cancel running requests")
+        self.cancel_btn.set_relief(Gtk.ReliefStyle.NONE)
+        self.cancel_btn.set_sensitive(False)
         status_box.pack_start(self.spinner, False, False, 0)
         status_box.pack_start(self.status, True, True, 0)
+        status_box.pack_end(self.cancel_btn, False, False, 0)
         vbox.pack_start(status_box, False, False, 0)
 
+        # Vocabulary search across all analyzed books
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search vocabulary (Tamil or English)...")
+        self.search_entry.set_tooltip_text("Find where a word was seen in previously analyzed pages")
+        vbox.pack_start(self.search_entry, False, False, 0)
+
         vbox.pack_start(Gtk.Separator(), False, False, 5)
 
         # Word list (scrollable)
-        list_label = Gtk.Label()
-        list_label.set_markup("<b>Words Found:</b>")
-        list_label.set_halign(Gtk.Align.START)
-        vbox.pack_start(list_label, False, False, 0)
+        self.list_label = Gtk.Label()
+        self.list_label.set_markup("<b>Words Found:</b>")
+        self.list_label.set_halign(Gtk.Align.START)
+        vbox.pack_start(self.list_label, False, False, 0)
 
         scrolled_list = Gtk.ScrolledWindow()
         scrolled_list.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
@@ -237,6 +357,8 @@ class TamilSidePanel(Gtk.Window):
         # Connect signals
         self.analyze_btn.connect("clicked", self.on_analyze_clicked)
         self.lookup_btn.connect("clicked", self.on_lookup_clicked)
+        self.cancel_btn.connect("clicked", self.on_cancel_clicked)
+        self.search_entry.connect("activate", self.on_search_activated)
         self.word_listbox.connect("row-selected", self.on_word_selected)
         self.detail_view.connect("activate-link", self._on_detail_activate_link)
 
@@ -291,58 +413,419 @@ class TamilSidePanel(Gtk.Window):
 
     def on_analyze_clicked(self, button):
         """Analyze current page in Okular"""
+        self.start_analysis()
+
+    def start_analysis(self, on_result=None, on_failure=None):
+        """
+        Analyze the page open in Okular (button and D-Bus service)
+        on_result/on_failure are called on the main thread after the UI is updated
+        """
         self.set_status("Getting current page...", True)
         self.analyze_btn.set_sensitive(False)
 
-        # Run in background thread
-        GLib.idle_add(self._do_analyze)
-
-    def _do_analyze(self):
-        """Background task: analyze page"""
         try:
-            # Get current page from Okular
+            # D-Bus calls are quick and stay on the main thread
             page_num = self.okular.get_current_page()
             pdf_path = self.okular.get_current_document()
-            
-            # Extract file name for logging and display
-            self.current_file_name = os.path.basename(pdf_path)
-            self.current_page_number = page_num  # Convert to 1-indexed for display
-            
-            self.logger.info(f"Starting page analysis - File: {self.current_file_name}, Page: {self.current_page_number}")
-            self.logger.info(f"Full PDF path: {pdf_path}")
+        except Exception as e:
+            self.logger.error(f"Analysis error: {e}")
+            self.set_status(f"❌ Error: {str(e)}")
+            self.analyze_btn.set_sensitive(True)
+            if on_failure:
+                on_failure(e)
+            return
+
+        spread = self.spread_btn.get_active()
+        self.logger.info(
+            f"Starting {'spread' if spread else 'page'} analysis - "
+            f"File: {os.path.basename(pdf_path)}, Page: {page_num}"
+        )
+        self.logger.info(f"Full PDF path: {pdf_path}")
+
+        # Rendering and Gemini requests run on the event loop thread
+        analyze = self._do_analyze_spread if spread else self._do_analyze
+        self._start_task(
+            analyze(pdf_path, page_num),
+            self._chain(self._on_analyze_done, on_result),
+            self._chain(self._on_analyze_error, on_failure)
+        )
 
-            self.set_status(f"Rendering page {self.current_page_number}...", True)
+    def _chain(self, handler, callback):
+        """Run a UI handler, then an optional caller's callback with the same outcome"""
+        if callback is None:
+            return handler
 
-            # Render page to image
-            self.current_page_image = self.okular.render_page_to_image(pdf_path, page_num)
-            self.logger.info("Page rendered to image successfully")
+        def both(outcome):
+            handler(outcome)
+            callback(outcome)
+        return both
 
-            self.set_status("Analyzing with Gemini...", True)
+    def _page_models(self):
+        """Models whose stored page analyses are reused (every page route and the fallback)"""
+        return self.gemini.router.models(*PAGE_OPERATIONS)
 
-            # Send to Gemini and log token usage
-            words, tokens_sent, tokens_received = self.gemini.analyze_page(self.current_page_image)
-            
-            self.logger.info(f"Gemini analysis complete - Tokens sent: {tokens_sent}, Tokens received: {tokens_received}")
-            self.logger.info(f"Found {len(words)} Tamil words on page {self.current_page_number}")
+    async def _do_analyze(self, pdf_path, page_num, operation='analyze_page'):
+        """
+        Background task: analyze page (runs on the event loop thread)
+        operation: 'prefetch' for background analyses, which leave the word list alone
+        """
+        loop = asyncio.get_running_loop()
+
+        # Pages analyzed before, here or on another machine (imported bundle),
+        # are found by document content, prompt and model. Large books are
+        # identified by a quick key until their content hash is ready.
+        content_hash = await loop.run_in_executor(None, self.fingerprints.identify, pdf_path)
+        page_prompt_hash = prompt_hash(self.config.get_page_analysis_prompt())
+        # Two-tier: a quick word list now, contextual details fetched lazily
+        quick = operation == 'analyze_page' and self.config.get_two_tier_enabled()
+        quick_prompt_hash = prompt_hash(
+            self.config.get_page_analysis_prompt() + self.config.get_page_quick_prompt()
+        ) if quick else None
+        if self.config.get_page_cache_enabled():
+            dpi = await loop.run_in_executor(None, self._choose_dpi, pdf_path, page_num)
+            cached = self.store.get_cached_page(content_hash, page_num, page_prompt_hash, self._page_models(), dpi)
+            if not cached and quick:
+                cached = self.store.get_cached_page(content_hash, page_num, quick_prompt_hash, self._page_models(), dpi)
+                if cached:
+                    merge_details(cached, self.store.get_page_details(content_hash, page_num, details_prompt_hash()))
+                    self._track_details(pdf_path, page_num, content_hash, cached)
+            if cached:
+                self.logger.info(f"Page {page_num} answered from vocabulary store ({len(cached)} words)")
+                get_metrics().increment("analyze_page.cache_hit")
+                return pdf_path, page_num, None, cached
+
+        page_text, image, payload, dpi = await self._prepare_page(pdf_path, page_num)
+        tiled = self.config.get_tiling_enabled() and not page_text
+        quick = quick and not tiled
+
+        # The same page in an earlier version of the PDF (annotations saved
+        # into it, a corrected reprint) is found by the page's own content
+        this_page_hash = await loop.run_in_executor(None, page_hash, page_text, image)
+        if self.config.get_page_cache_enabled():
+            for cached_prompt_hash in filter(None, (page_prompt_hash, quick_prompt_hash)):
+                found = self.store.find_page_by_hash(
+                    this_page_hash, pdf_path, page_num, cached_prompt_hash, self._page_models(), dpi
+                )
+                if found:
+                    cached, cached_model = found
+                    self.logger.info(f"Page {page_num} unchanged since an earlier version of the document ({len(cached)} words)")
+                    get_metrics().increment("analyze_page.page_hash_hit")
+                    self.store.record_analysis(
+                        pdf_path, page_num, cached, cached_model,
+                        content_hash=content_hash, prompt_hash=cached_prompt_hash, dpi=dpi, page_hash=this_page_hash
+                    )
+                    if cached_prompt_hash == quick_prompt_hash:
+                        self._track_details(pdf_path, page_num, content_hash, cached, (payload, page_text))
+                    return pdf_path, page_num, payload, cached
+
+        if operation == 'analyze_page':
+            self._post_status("Analyzing with Gemini...")
+
+        # Words already explained in this book are only referenced by the model
+        known_words = None
+        if self.config.get_known_vocabulary_enabled():
+            known_words = self.store.get_known_words(pdf_path, self.config.get_known_vocabulary_limit())
+
+        # Send to Gemini and log token usage
+        try:
+            if tiled:
+                words, tokens_sent, tokens_received, model = await self.gemini.analyze_page_tiled_async(
+                    image, known_words=known_words, document=pdf_path, page=page_num,
+                    max_tiles=self.config.get_tiling_max_tiles(),
+                    overlap=self.config.get_tiling_overlap(), operation=operation
+                )
+            elif quick:
+                words, tokens_sent, tokens_received, model = await self.gemini.analyze_page_quick_async(
+                    payload, known_words=known_words, document=pdf_path, page=page_num,
+                    page_text=page_text, on_partial=self._on_partial_words
+                )
+            else:
+                on_partial = self._on_partial_words if operation == 'analyze_page' else None
+                words, tokens_sent, tokens_received, model = await self.gemini.analyze_page_async(
+                    payload, known_words=known_words, document=pdf_path, page=page_num,
+                    page_text=page_text, on_partial=on_partial, operation=operation
+                )
+        except Exception as e:
+            # Interactive analyses are kept for replay when Gemini is unreachable
+            entry_id = operation == 'analyze_page' and self._queue_offline(
+                e, KIND_PAGE, pdf_path, page_num,
+                lambda: self.gemini.build_page_request(
+                    payload if payload is not None else image, page_text, known_words
+                ),
+                content_hash=content_hash, prompt_hash=page_prompt_hash, dpi=dpi
+            )
+            if entry_id:
+                raise QueuedOffline(entry_id, e) from e
+            raise
 
-            self.current_words = words
+        self.logger.info(f"Gemini analysis complete - Tokens sent: {tokens_sent}, Tokens received: {tokens_received}")
+        self.logger.info(f"Found {len(words)} Tamil words on page {page_num}")
 
-            # Update UI
-            GLib.idle_add(self._update_word_list, words)
-            GLib.idle_add(self._update_context_display)
+        if known_words:
+            filled = self.store.fill_known_words(pdf_path, words)
+            self.logger.info(f"Filled {filled} known words from vocabulary store")
 
-            self.set_status(f"✅ Found {len(words)} words")
+        self.store.record_analysis(
+            pdf_path, page_num, words, model,
+            content_hash=content_hash, prompt_hash=quick_prompt_hash if quick else page_prompt_hash, dpi=dpi,
+            page_hash=this_page_hash
+        )
+        if quick:
+            page_input = (payload, page_text)
+            self._track_details(pdf_path, page_num, content_hash, words, page_input)
+        return pdf_path, page_num, payload, words
 
+    def _track_details(self, pdf_path, page_num, content_hash, words, page_input=None):
+        """
+        Remember a quick-pass page whose words need details (event loop thread)
+        page_input: (payload, page_text) if the page was just prepared;
+        otherwise it is prepared again when the first details are requested
+        """
+        async def load_page():
+            if page_input is not None:
+                return page_input
+            page_text, _, payload, _ = await self._prepare_page(pdf_path, page_num)
+            return payload, page_text
+
+        key = (pdf_path, page_num)
+        self.page_details.pop(key, None)
+        self.page_details[key] = PageDetails(pdf_path, page_num, content_hash, words, load_page)
+        while len(self.page_details) > WORD_INDEX_PAGES:
+            self.page_details.popitem(last=False)
+
+    async def _do_analyze_spread(self, pdf_path, page_num):
+        """
+        Background task: analyze pages N and N+1 in one request
+        Each page is stored as its own analysis, so later single-page
+        analyses of either page are cache hits. Falls back to a single-page
+        analysis on the last page or when one page is already stored.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            page_count = await loop.run_in_executor(None, self.okular.get_page_count, pdf_path)
         except Exception as e:
-            self.logger.error(f"Analysis error: {e}")
-            self.set_status(f"❌ Error: {str(e)}")
-        finally:
-            self.analyze_btn.set_sensitive(True)
+            self.logger.warning(f"Could not read page count, assuming page {page_num + 1} exists: {e}")
+            page_count = None
+        if page_count is not None and page_num >= page_count:
+            return await self._do_analyze(pdf_path, page_num)
+        page_numbers = (page_num, page_num + 1)
+
+        content_hash = await loop.run_in_executor(None, self.fingerprints.identify, pdf_path)
+        page_prompt_hash = prompt_hash(self.config.get_page_analysis_prompt())
+        cached = {}
+        if self.config.get_page_cache_enabled():
+            dpi = await loop.run_in_executor(None, self._choose_dpi, pdf_path, page_num)
+            for number in page_numbers:
+                words = self.store.get_cached_page(content_hash, number, page_prompt_hash, self._page_models(), dpi)
+                if words:
+                    cached[number] = words
+                    get_metrics().increment("analyze_page.cache_hit")
+        if cached:
+            # One request per missing page; a spread request is only worth it for two
+            self.logger.info(f"Spread pages {sorted(cached)} answered from vocabulary store")
+            by_page = dict(cached)
+            payload = None
+            for number in page_numbers:
+                if number not in by_page:
+                    _, _, payload, by_page[number] = await self._do_analyze(pdf_path, number)
+            return pdf_path, page_num, payload, by_page[page_num] + by_page[page_num + 1]
+
+        self._post_status(f"Preparing pages {page_num}-{page_num + 1}...")
+        prepared = await asyncio.gather(*(self._prepare_page(pdf_path, number) for number in page_numbers))
+        pages = [(number, payload, page_text) for number, (page_text, _, payload, _) in zip(page_numbers, prepared)]
+        dpis = {number: dpi for number, (_, _, _, dpi) in zip(page_numbers, prepared)}
+        page_hashes = {
+            number: await loop.run_in_executor(None, page_hash, page_text, image)
+            for number, (page_text, image, _, _) in zip(page_numbers, prepared)
+        }
+
+        self._post_status("Analyzing both pages with Gemini...")
+        known_words = None
+        if self.config.get_known_vocabulary_enabled():
+            known_words = self.store.get_known_words(pdf_path, self.config.get_known_vocabulary_limit())
+
+        try:
+            by_page, tokens_sent, tokens_received, model = await self.gemini.analyze_spread_async(
+                pages, known_words=known_words, document=pdf_path, on_partial=self._on_partial_words
+            )
+        except Exception as e:
+            # Queued as two single-page analyses
+            entry_ids = [
+                self._queue_offline(
+                    e, KIND_PAGE, pdf_path, number,
+                    lambda payload=payload, text=text: self.gemini.build_page_request(payload, text, known_words),
+                    content_hash=content_hash, prompt_hash=page_prompt_hash, dpi=dpis[number]
+                )
+                for number, payload, text in pages
+            ]
+            if all(entry_ids):
+                raise QueuedOffline(entry_ids[-1], e) from e
+            raise
+        self.logger.info(f"Gemini spread analysis complete - Tokens sent: {tokens_sent}, Tokens received: {tokens_received}")
+        get_metrics().increment("analyze_spread.requests_saved")
+
+        for number, words in by_page.items():
+            self.logger.info(f"Found {len(words)} Tamil words on page {number}")
+            if known_words:
+                self.store.fill_known_words(pdf_path, words)
+            self.store.record_analysis(
+                pdf_path, number, words, model,
+                content_hash=content_hash, prompt_hash=page_prompt_hash, dpi=dpis[number],
+                page_hash=page_hashes[number]
+            )
+        return pdf_path, page_num, pages[0][1], by_page[page_num] + by_page[page_num + 1]
+
+    async def _prepare_page(self, pdf_path, page_num):
+        """
+        Text layer, render, local OCR and JPEG encoding for one page
+        Returns (page_text, image, payload, dpi); page_text is None when the
+        page must be sent as an image, dpi is None when it was not rendered
+        """
+        loop = asyncio.get_running_loop()
+        dpi = None
+
+        # Born-digital pages: use the embedded text, skipping render and upload.
+        # The page image is then only rendered if a lookup needs it.
+        page_text = await loop.run_in_executor(None, self.okular.get_page_text, pdf_path, page_num)
+        image = None
+        if page_text:
+            self.logger.info("Using PDF text layer, page not rendered")
+        else:
+            self._post_status(f"Rendering page {page_num}...")
 
-        return False  # Don't repeat
+            # Render page to image at the document's resolution
+            dpi = await loop.run_in_executor(None, self.okular.choose_dpi, pdf_path, page_num)
+            image = await loop.run_in_executor(None, self.okular.render_page_to_image, pdf_path, page_num, dpi)
+            self.logger.info(f"Page rendered to image successfully ({image.width}x{image.height} at {dpi} dpi)")
+
+        # Confidently recognised pages go to Gemini as text instead of an image
+        if not page_text and self.ocr and self.ocr.available:
+            self._post_status("Reading page locally...")
+            try:
+                ocr_result = await loop.run_in_executor(None, self.ocr.extract, image)
+                if ocr_result.boxes:
+                    self._remember_word_index(pdf_path, page_num, PageWordIndex(ocr_result.boxes, 'ocr'))
+                if ocr_result.usable:
+                    page_text = ocr_result.text
+                else:
+                    self.logger.info("OCR confidence too low, sending page image")
+            except Exception as e:
+                self.logger.warning(f"Local OCR failed, sending page image: {e}")
+
+        # Encode once; the analysis and later lookups on this page share the JPEG.
+        # The decoded image is released when this task ends.
+        payload = None
+        if image is not None:
+            payload = await loop.run_in_executor(None, PagePayload.from_image, image)
+            self.logger.info(f"Page encoded: {payload}")
+        return page_text, image, payload, dpi
+
+    def _choose_dpi(self, pdf_path, page_num):
+        """Render DPI of a document for cache keys, or None if it cannot be determined"""
+        try:
+            return self.okular.choose_dpi(pdf_path, page_num)
+        except Exception as e:
+            self.logger.warning(f"Could not choose render DPI: {e}")
+            return None
+
+    def _on_analyze_done(self, result):
+        """Page analysis finished: update state and UI (main thread)"""
+        pdf_path, page_num, payload, words = result
+
+        # Extract file name for logging and display
+        self.current_pdf_path = pdf_path
+        self.current_file_name = os.path.basename(pdf_path)
+        self.current_page_number = page_num
+        self.current_page_payload = payload
+        self.current_words = words
+
+        # Update UI
+        self._update_word_list(words)
+        self._update_context_display()
+        self._update_usage_display()
+
+        self.set_status(f"✅ Found {len(words)} words")
+        self.analyze_btn.set_sensitive(True)
+
+        details = self.page_details.get((pdf_path, page_num))
+        if details is not None and details.missing():
+            self.async_bridge.submit(
+                self.details.fetch_page(details),
+                on_error=lambda e: self.logger.warning(f"Word details for page {page_num} failed: {e}")
+            )
+
+    def _on_analyze_error(self, error):
+        """Page analysis failed or was cancelled (main thread)"""
+        if isinstance(error, asyncio.CancelledError):
+            self.logger.info("Page analysis cancelled")
+            self.set_status("⏹ Cancelled")
+        elif isinstance(error, QueuedOffline):
+            self.logger.warning(f"Analysis queued: {error}")
+            self.set_status("📥 Offline - page queued, it will be analyzed when the connection returns")
+        else:
+            self.logger.error(f"Analysis error: {error}")
+            self.set_status(f"❌ Error: {str(error)}")
+        self._update_usage_display()
+        self.analyze_btn.set_sensitive(True)
+
+    def _queue_offline(self, error, kind, pdf_path, page_num, build_request, **fields):
+        """
+        Queue a request that failed because Gemini was unreachable
+        build_request() gives the request body. Returns the queue entry id,
+        or None for other errors or with the queue disabled.
+        """
+        if self.offline_queue is None or not is_connection_error(error):
+            return None
+        entry_id = self.offline_queue.add(
+            kind, pdf_path, page_num, build_request(), error=str(error), **fields
+        )
+        self.logger.info(f"Queued {kind} of page {page_num} for replay ({self.offline_queue.count()} waiting)")
+        self.replayer.wake()
+        return entry_id
+
+    def _on_replayed(self, entry, words):
+        """A queued request was answered and stored (event loop thread)"""
+        GLib.idle_add(self._show_replayed, entry, words)
+
+    def _show_replayed(self, entry, words):
+        """Announce a replayed request; its words are served from the store (main thread)"""
+        target = f"'{entry.text}'" if entry.kind == KIND_LOOKUP else f"page {entry.page}"
+        self.set_status(f"✅ Back online: {target} of {entry.document_name} analyzed")
+        self._update_usage_display()
+        return False
+
+    def _start_task(self, coro, on_done, on_error):
+        """Run a coroutine on the event loop; results arrive on the main loop"""
+        def finish(callback):
+            def deliver(outcome):
+                self.active_tasks.discard(future)
+                self.cancel_btn.set_sensitive(bool(self.active_tasks))
+                callback(outcome)
+            return deliver
+
+        future = self.async_bridge.submit(coro, finish(on_done), finish(on_error))
+        self.active_tasks.add(future)
+        self.cancel_btn.set_sensitive(True)
+        return future
+
+    def on_cancel_clicked(self, button):
+        """Cancel all running requests"""
+        for future in list(self.active_tasks):
+            future.cancel()
+
+    def _post_status(self, message, is_loading=True):
+        """Update the status label from the event loop thread"""
+        GLib.idle_add(self.set_status, message, is_loading)
+
+    def _on_partial_words(self, words):
+        """Show words received so far while continuation requests run"""
+        GLib.idle_add(self._update_word_list, words)
+        self._post_status(f"Received {len(words)} words, fetching the rest...")
 
     def _update_word_list(self, words):
         """Update word list in UI"""
+        self.list_label.set_markup("<b>Words Found:</b>")
+
         # Clear existing
         for child in self.word_listbox.get_children():
             self.word_listbox.remove(child)
@@ -373,7 +856,8 @@ class TamilSidePanel(Gtk.Window):
 
             # Literal translation
             literal_label = Gtk.Label()
-            literal_label.set_markup(f"<small>{word.literal_translation}</small>")
+            seen_marker = " <i>(seen before)</i>" if word.known else ""
+            literal_label.set_markup(f"<small>{word.literal_translation}{seen_marker}</small>")
             literal_label.set_halign(Gtk.Align.START)
             literal_label.set_line_wrap(True)
 
@@ -406,7 +890,8 @@ class TamilSidePanel(Gtk.Window):
 
             # Poem summary content
             summary_label = Gtk.Label()
-            summary_label.set_markup(f"<small>{poem_summary.contextual_meaning}</small>")
+            summary = poem_summary.contextual_meaning or "<i>⏳ Summary loading...</i>"
+            summary_label.set_markup(f"<small>{summary}</small>")
             summary_label.set_halign(Gtk.Align.START)
             summary_label.set_line_wrap(True)
             summary_label.set_selectable(True)
@@ -431,67 +916,384 @@ class TamilSidePanel(Gtk.Window):
             self.context_label.set_markup("<small><i>No document loaded</i></small>")
         return False
 
+    def _update_usage_display(self):
+        """Show today's token usage and budget status"""
+        ledger = get_token_ledger()
+        used = ledger.used_today()
+        limit = ledger.hard_limit or ledger.soft_limit
+        text = f"🪙 Today: {used:,} tokens" + (f" / {limit:,}" if limit else "")
+
+        status = ledger.status()
+        if status == STATUS_OK:
+            self.usage_label.set_markup(f"<small>{text}</small>")
+        elif status == STATUS_SOFT:
+            self.usage_label.set_markup(f"<small><span foreground='#e67e22'>{text} - background work paused</span></small>")
+        else:
+            self.usage_label.set_markup(f"<small><span foreground='#e74c3c'>{text} - daily limit reached</span></small>")
+        return False
+
     def on_lookup_clicked(self, button):
         """Lookup selected text"""
+        self.start_lookup()
+
+    def start_lookup(self, text=None, on_result=None, on_failure=None):
+        """
+        Look up text, or the Okular selection when text is None (button and
+        D-Bus service); on_result/on_failure are called on the main thread
+        """
         self.set_status("Getting selected text...", True)
         self.lookup_btn.set_sensitive(False)
 
-        GLib.idle_add(self._do_lookup)
-
-    def _do_lookup(self):
-        """Background task: lookup word"""
         try:
             # Get selected text
-            selected_text = self.okular.get_selected_text()
+            selected_text = normalize(text) if text is not None else self.okular.get_selected_text()
 
             if not selected_text:
                 self.logger.warning("No text selected in Okular for lookup")
                 self.set_status("⚠️ No text selected in Okular")
                 self.lookup_btn.set_sensitive(True)
-                return False
+                if on_failure:
+                    on_failure(Exception("No text selected in Okular"))
+                return
 
-            self.logger.info(f"Starting word lookup - Selected text: '{selected_text}'")
-            self.set_status(f"Looking up: {selected_text}", True)
-
-            # Get context if we don't have current page image
-            if not self.current_page_image:
+            # Use the analyzed page as context, or the page Okular is showing
+            if self.current_page_payload is None:
                 page_num = self.okular.get_current_page()
                 pdf_path = self.okular.get_current_document()
-                self.current_page_image = self.okular.render_page_to_image(pdf_path, page_num)
-                self.logger.info("Rendered page image for lookup context")
-
-            # Send to Gemini and log token usage
-            word, tokens_sent, tokens_received = self.gemini.lookup_word(selected_text, self.current_page_image)
-            
-            self.logger.info(f"Word lookup complete - Tokens sent: {tokens_sent}, Tokens received: {tokens_received}")
-
-            if word:
-                self.logger.info(f"Found word: {word.tamil_word} - {word.literal_translation}")
-                GLib.idle_add(self._show_word_detail, word)
-                self.set_status("✅ Lookup complete")
             else:
-                self.logger.warning(f"No results found for: {selected_text}")
-                self.set_status("❌ No results")
-
+                page_num = self.current_page_number
+                pdf_path = self.current_pdf_path
         except Exception as e:
             self.logger.error(f"Lookup error: {e}")
             self.set_status(f"❌ Error: {str(e)}")
-        finally:
             self.lookup_btn.set_sensitive(True)
+            if on_failure:
+                on_failure(e)
+            return
 
+        self.logger.info(f"Starting word lookup - Selected text: '{selected_text}'")
+        self.set_status(f"Looking up: {selected_text}", True)
+
+        self._start_task(
+            self._do_lookup(selected_text, pdf_path, page_num, self.current_page_payload),
+            self._chain(self._on_lookup_done, on_result),
+            self._chain(self._on_lookup_error, on_failure)
+        )
+
+    def start_prefetch(self, pages):
+        """
+        Analyze pages of the current document in the background
+        pages: range list ('12-20,25') or '+N' for the N pages after the
+        current one. Returns (pdf_path, queued page numbers).
+        """
+        pdf_path = self.okular.get_current_document()
+        current = self.okular.get_current_page()
+        try:
+            page_count = self.okular.get_page_count(pdf_path)
+        except Exception:
+            page_count = None
+
+        pages = (pages or '').strip() or f"+{PREFETCH_DEFAULT_PAGES}"
+        if pages.startswith('+'):
+            last = current + int(pages[1:])
+            queued = list(range(current + 1, min(last, page_count or last) + 1))
+        else:
+            queued = parse_page_ranges(pages, page_count or sys.maxsize)
+        if not queued:
+            raise ValueError(f"No pages to prefetch in '{pages}'")
+
+        self.logger.info(f"Prefetching {len(queued)} pages of {os.path.basename(pdf_path)}: {pages}")
+        self.prefetch_progress = {'document': pdf_path, 'pages': queued, 'done': 0}
+        self._start_task(
+            self._do_prefetch(pdf_path, queued),
+            self._on_prefetch_done,
+            self._on_prefetch_error
+        )
+        return pdf_path, queued
+
+    async def _do_prefetch(self, pdf_path, pages):
+        """Background task: analyze pages one by one into the store"""
+        for number, page_num in enumerate(pages, start=1):
+            self._post_status(f"Prefetching page {page_num} ({number}/{len(pages)})...")
+            try:
+                await self._do_analyze(pdf_path, page_num, operation='prefetch')
+            except BudgetExceededError as e:
+                self.logger.warning(f"Prefetch paused: {e}")
+                return pdf_path, number - 1, str(e)
+            except Exception as e:
+                self.logger.warning(f"Prefetch of page {page_num} failed: {e}")
+            self.prefetch_progress['done'] = number
+        self.store.flush()
+        return pdf_path, len(pages), None
+
+    def _on_prefetch_done(self, result):
+        """Prefetch finished (main thread)"""
+        pdf_path, done, stopped = result
+        self._update_usage_display()
+        if stopped:
+            self.set_status(f"⏸ Prefetched {done} pages - {stopped}")
+        else:
+            self.set_status(f"✅ Prefetched {done} pages of {os.path.basename(pdf_path)}")
+
+    def _on_prefetch_error(self, error):
+        """Prefetch failed or was cancelled (main thread)"""
+        if isinstance(error, asyncio.CancelledError):
+            self.logger.info("Prefetch cancelled")
+            self.set_status("⏹ Prefetch cancelled")
+        else:
+            self.logger.error(f"Prefetch error: {error}")
+            self.set_status(f"❌ Prefetch error: {str(error)}")
+
+    def service_status(self):
+        """State reported by the D-Bus Status method"""
+        return {
+            'document': self.current_pdf_path,
+            'page': self.current_page_number,
+            'words': len(self.current_words),
+            'active_tasks': len(self.active_tasks),
+            'status': self.status.get_text(),
+            'prefetch': self.prefetch_progress,
+            'queued_offline': self.offline_queue.count() if self.offline_queue else 0,
+        }
+
+    async def _do_lookup(self, selected_text, pdf_path, page_num, payload):
+        """Background task: lookup word (runs on the event loop thread)"""
+        loop = asyncio.get_running_loop()
+        content_hash = await loop.run_in_executor(None, self.fingerprints.identify, pdf_path)
+
+        # Earlier explanations of the word or an inflected form need no request
+        if self.config.get_lookup_cache_enabled():
+            cached = self.store.find_cached_word(selected_text, pdf_path, content_hash)
+            if cached:
+                self.logger.info(f"Lookup answered from vocabulary store: {cached}")
+                get_metrics().increment("lookup.cache_hit")
+                source = f"📄 {cached.document_name} - Page {cached.page} (saved)"
+                return pdf_path, page_num, payload, cached.word, source
+            get_metrics().increment("lookup.cache_miss")
+
+        # Get context if we don't have current page image
+        if payload is None:
+            image = await loop.run_in_executor(None, self.okular.render_page_to_image, pdf_path, page_num)
+            payload = await loop.run_in_executor(None, PagePayload.from_image, image)
+            del image
+            self.logger.info(f"Rendered page for lookup context: {payload}")
+
+        # Only the paragraph around the word is sent when it can be located
+        context = payload
+        if self.config.get_lookup_crop_enabled():
+            try:
+                context = await self._crop_for_lookup(selected_text, pdf_path, page_num, payload) or payload
+            except Exception as e:
+                self.logger.warning(f"Could not crop lookup region, sending the page: {e}")
+
+        # Send to Gemini and log token usage
+        try:
+            word, tokens_sent, tokens_received, model = await self.gemini.lookup_word_async(
+                selected_text, context, document=pdf_path, page=page_num
+            )
+        except Exception as e:
+            entry_id = self._queue_offline(
+                e, KIND_LOOKUP, pdf_path, page_num,
+                lambda: self.gemini.build_lookup_request(selected_text, context),
+                content_hash=content_hash, prompt_hash=prompt_hash(self.config.get_word_lookup_prompt()),
+                text=selected_text
+            )
+            if entry_id:
+                raise QueuedOffline(entry_id, e) from e
+            raise
+
+        self.logger.info(f"Word lookup complete - Tokens sent: {tokens_sent}, Tokens received: {tokens_received}")
+
+        if word:
+            self.logger.info(f"Found word: {word.tamil_word} - {word.literal_translation}")
+            self.store.record_analysis(
+                pdf_path, page_num, [word], model, kind='lookup',
+                content_hash=content_hash,
+                prompt_hash=prompt_hash(self.config.get_word_lookup_prompt())
+            )
+        else:
+            self.logger.warning(f"No results found for: {selected_text}")
+
+        return pdf_path, page_num, payload, word, None
+
+    def _remember_word_index(self, pdf_path, page_num, index):
+        """Keep the word index of recently used pages"""
+        key = (pdf_path, page_num)
+        self.word_indexes.pop(key, None)
+        self.word_indexes[key] = index
+        while len(self.word_indexes) > WORD_INDEX_PAGES:
+            self.word_indexes.popitem(last=False)
+        self.logger.info(f"Indexed {len(index)} word boxes on page {page_num} ({index.source})")
+
+    async def _get_word_index(self, pdf_path, page_num, payload):
+        """Word index for a page: text layer first, else a local OCR pass"""
+        index = self.word_indexes.get((pdf_path, page_num))
+        if index is not None:
+            return index
+
+        loop = asyncio.get_running_loop()
+        boxes = await loop.run_in_executor(None, self.okular.get_page_word_boxes, pdf_path, page_num)
+        source = 'text layer'
+        if not boxes and self.ocr and self.ocr.available:
+            image = await loop.run_in_executor(None, payload.decode)
+            result = await loop.run_in_executor(None, self.ocr.extract, image)
+            boxes, source = result.boxes, 'ocr'
+        if not boxes:
+            return None
+
+        index = PageWordIndex(boxes, source)
+        self._remember_word_index(pdf_path, page_num, index)
+        return index
+
+    async def _crop_for_lookup(self, selected_text, pdf_path, page_num, payload):
+        """Payload of the region around the selected word, or None to send the page"""
+        index = await self._get_word_index(pdf_path, page_num, payload)
+        if index is None:
+            return None
+        region = index.region(selected_text, self.config.get_lookup_crop_context())
+        if region is None:
+            self.logger.info(f"'{selected_text}' not located on page {page_num}, sending the page")
+            return None
+
+        def crop():
+            image = crop_region(payload.decode(), region, self.config.get_lookup_crop_padding())
+            return PagePayload.from_image(image)
+
+        loop = asyncio.get_running_loop()
+        cropped = await loop.run_in_executor(None, crop)
+        self.logger.info(f"Lookup region: {cropped} instead of {payload}")
+        get_metrics().increment("lookup.cropped")
+        get_metrics().increment("lookup.upload_bytes_saved", len(payload) - len(cropped))
+        return cropped
+
+    def _on_lookup_done(self, result):
+        """Lookup finished (main thread)"""
+        pdf_path, page_num, payload, word, source = result
+
+        if self.current_page_payload is None:
+            self.current_page_payload = payload
+            self.current_pdf_path = pdf_path
+            self.current_page_number = page_num
+
+        self._update_usage_display()
+        if word:
+            self._show_word_detail(word, GLib.markup_escape_text(source) if source else None)
+            self.set_status("✅ Lookup complete (saved)" if source else "✅ Lookup complete")
+        else:
+            self.set_status("❌ No results")
+        self.lookup_btn.set_sensitive(True)
+
+    def _on_lookup_error(self, error):
+        """Lookup failed or was cancelled (main thread)"""
+        if isinstance(error, asyncio.CancelledError):
+            self.logger.info("Lookup cancelled")
+            self.set_status("⏹ Cancelled")
+        elif isinstance(error, QueuedOffline):
+            self.logger.warning(f"Lookup queued: {error}")
+            self.set_status("📥 Offline - lookup queued, it will run when the connection returns")
+        else:
+            self.logger.error(f"Lookup error: {error}")
+            self.set_status(f"❌ Error: {str(error)}")
+        self._update_usage_display()
+        self.lookup_btn.set_sensitive(True)
+
+    def on_search_activated(self, entry):
+        """Search stored vocabulary"""
+        query = entry.get_text().strip()
+        if not query:
+            # Empty search returns to the current page's words
+            self._update_word_list(self.current_words)
+            return
+
+        start = datetime.now()
+        results = self.store.search(query)
+        elapsed_ms = (datetime.now() - start).total_seconds() * 1000
+
+        self.logger.info(f"Vocabulary search '{query}': {len(results)} results in {elapsed_ms:.1f}ms")
+        self._show_search_results(query, results)
+        self.set_status(f"🔎 {len(results)} matches for '{query}'")
+
+    def _show_search_results(self, query, results):
+        """Show vocabulary search results in the word list"""
+        self.list_label.set_markup(f"<b>Seen Before:</b> <small>{GLib.markup_escape_text(query)}</small>")
+
+        for child in self.word_listbox.get_children():
+            self.word_listbox.remove(child)
+
+        for entry in results:
+            row = Gtk.ListBoxRow()
+            box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=3)
+            box.set_margin_start(5)
+            box.set_margin_end(5)
+            box.set_margin_top(3)
+            box.set_margin_bottom(3)
+
+            tamil_label = Gtk.Label()
+            tamil_label.set_markup(f"<span font_family='{self.config.get_tamil_font()}' size='large'><b>{entry.word.tamil_word}</b></span>")
+            tamil_label.set_halign(Gtk.Align.START)
+
+            literal_label = Gtk.Label()
+            literal_label.set_markup(f"<small>{entry.word.literal_translation}</small>")
+            literal_label.set_halign(Gtk.Align.START)
+            literal_label.set_line_wrap(True)
+
+            source_label = Gtk.Label()
+            source_text = GLib.markup_escape_text(f"📄 {entry.document_name} - Page {entry.page}")
+            source_label.set_markup(f"<small><i>{source_text}</i></small>")
+            source_label.set_halign(Gtk.Align.START)
+
+            box.pack_start(tamil_label, False, False, 0)
+            box.pack_start(literal_label, False, False, 0)
+            box.pack_start(source_label, False, False, 0)
+
+            row.add(box)
+            row.word_data = entry.word
+            row.source_text = source_text
+
+            self.word_listbox.add(row)
+
+        self.word_listbox.show_all()
         return False
 
     def on_word_selected(self, listbox, row):
         """Word selected from list"""
         if row and hasattr(row, 'word_data'):
-            self._show_word_detail(row.word_data)
+            word = row.word_data
+            self._show_word_detail(word, getattr(row, 'source_text', None))
+
+            # Two-tier analysis: the selected word's details are fetched first
+            details = self.page_details.get((self.current_pdf_path, self.current_page_number))
+            if needs_details(word) and details is not None and word in details.words:
+                self.async_bridge.submit(
+                    self.details.fetch_word(details, word),
+                    on_error=lambda e: self.set_status(f"❌ Details error: {str(e)}")
+                )
+
+    def _on_details(self, details, words):
+        """A batch of word details arrived (event loop thread)"""
+        GLib.idle_add(self._show_details, details, words)
+
+    def _show_details(self, details, words):
+        """Refresh the selected word and the page summary with new details (main thread)"""
+        if (details.document, details.page) != (self.current_pdf_path, self.current_page_number):
+            return False
+        if any(w.tamil_word == "POEM_SUMMARY" for w in words):
+            self._update_word_list(self.current_words)
+        row = self.word_listbox.get_selected_row()
+        if row is not None and getattr(row, 'word_data', None) in words:
+            self._show_word_detail(row.word_data, getattr(row, 'source_text', None))
+        self._update_usage_display()
+        return False
 
-    def _show_word_detail(self, word):
+    def _show_word_detail(self, word, source=None):
         """Display word details"""
         tamil_font = self.config.get_tamil_font()
         
         # Make URLs clickable
-        contextual_meaning = self._make_urls_clickable(word.contextual_meaning)
+        if needs_details(word):
+            contextual_meaning = "<i>⏳ Loading details...</i>"
+        else:
+            contextual_meaning = self._make_urls_clickable(word.contextual_meaning)
         
         # Debug logging
         self.logger.info(f"Showing word detail for: {word.tamil_word}")
@@ -509,6 +1311,12 @@ class TamilSidePanel(Gtk.Window):
 <b>Sentence Context:</b>
 <span style='italic' foreground='#7f8c8d'>{word.sentence_context}</span>"""
 
+        if source:
+            detail_html += f"""
+
+<b>Seen In:</b>
+<small>{source}</small>"""
+
         self.detail_view.set_markup(detail_html)
         return False
     
@@ -551,6 +1359,8 @@ class TamilSidePanel(Gtk.Window):
 
     def on_close(self, widget, event):
         """Handle window close - hide instead of quit"""
+        self.store.flush()
+        self.logger.info(get_metrics().format_summary())
         self.hide()
         return True  # Prevent actual close
 
@@ -635,21 +1445,187 @@ def setup_user_config():
     print("3. Reload i3: i3-msg reload")
     print("4. Launch Tamil Assistant with Mod+Y")
 
+def show_token_usage(days):
+    """Print token usage from the ledger"""
+    print(get_token_ledger().format_summary(days))
+
+def export_cache(pdf_path, output_path):
+    """Write a cache bundle for a PDF"""
+    store = VocabularyStore(get_config().get_database_path())
+    try:
+        path, count = export_bundle(store, pdf_path, output_path)
+        print(f"✓ Exported {count} analyses to {path}")
+    except (BundleError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+def import_cache(bundle_path, pdf_path):
+    """Merge a cache bundle into the local store"""
+    store = VocabularyStore(get_config().get_database_path())
+    try:
+        name, added, total = import_bundle(store, bundle_path, pdf_path)
+        print(f"✓ {name}: imported {added} of {total} analyses ({total - added} already present)")
+    except (BundleError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+def _run_batch_job(runner, job, wait):
+    """Submit/poll/ingest a batch job and report how far it got"""
+    def on_status(job, state):
+        print(f"   {datetime.now():%H:%M:%S} job {job.id}: {state}")
+
+    async def run():
+        try:
+            return await runner.resume(job, wait=wait, on_status=on_status)
+        finally:
+            await runner.close()
+
+    asyncio.run(run())
+    if job.state == JOB_INGESTED:
+        print(f"✓ Job {job.id}: {len(job.pages)} pages stored" + (f" ({job.error})" if job.error else ""))
+    elif job.state == JOB_SUBMITTED:
+        print(f"✓ Job {job.id} submitted as {job.remote_name}")
+        print(f"   Resume later with: tamil-assistant --batch-resume {job.id}")
+    else:
+        print(f"❌ Job {job.id}: {job.error or job.state}")
+        sys.exit(1)
+
+def _batch_runner():
+    config = get_config()
+    store = VocabularyStore(config.get_database_path())
+    okular = OkularInterface(dpi_selector=DpiSelector.from_config(config))
+    return BatchRunner(store, GeminiClient(), okular), store
+
+def run_batch(pdf_path, pages, wait):
+    """Prepare and submit a batch job for a whole PDF (or a page range)"""
+    runner, store = _batch_runner()
+    try:
+        page_count = runner.okular.get_page_count(pdf_path)
+        job = runner.prepare(
+            pdf_path, parse_page_ranges(pages, page_count),
+            on_progress=lambda done, total: print(f"\r   Preparing page requests: {done}/{total}", end='', flush=True)
+        )
+        if job is None:
+            print("✓ Every requested page is already analyzed")
+            return
+        print(f"\n✓ Prepared job {job.id} ({len(job.pages)} pages)")
+        _run_batch_job(runner, job, wait)
+    except (BatchError, BudgetExceededError, OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+def resume_batch(job_id, wait):
+    """Continue an interrupted batch job"""
+    runner, store = _batch_runner()
+    try:
+        job = runner.jobs.get(job_id)
+        if job is None:
+            print(f"❌ No batch job {job_id} (see: tamil-assistant --batch-list)")
+            sys.exit(1)
+        if job.state == JOB_INGESTED:
+            print(f"✓ Job {job.id} is already stored")
+            return
+        _run_batch_job(runner, job, wait)
+    except (BatchError, BudgetExceededError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+def list_batches():
+    """Print recent batch jobs"""
+    runner, store = _batch_runner()
+    try:
+        jobs = runner.jobs.list()
+        if not jobs:
+            print("No batch jobs")
+        for job in jobs:
+            created = datetime.fromtimestamp(job.created_at)
+            print(f"{job.id:>4}  {created:%Y-%m-%d %H:%M}  {job.state:<10} "
+                  f"{job.remote_state or '-':<24} {len(job.pages):>4} pages  {job.document_name}")
+    finally:
+        store.close()
+
 def main():
+    # `tamil-assistant doctor ...` has its own options
+    if len(sys.argv) > 1 and sys.argv[1] == 'doctor':
+        sys.exit(doctor.main(sys.argv[2:]))
+    # `tamil-assistant serve` runs the HTTP API instead of the panel
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from tamil_assistant import api_server
+        sys.exit(api_server.main(sys.argv[2:]))
+
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Tamil Learning Assistant')
     parser.add_argument('--setup', action='store_true', 
                        help='Set up user configuration files')
+    parser.add_argument('--usage', nargs='?', const=1, type=int, metavar='DAYS',
+                       help='Show token usage for today (or the last DAYS days) and exit')
+    parser.add_argument('--export-cache', metavar='PDF',
+                       help='Export all analyses and lookups of a PDF to a cache bundle and exit')
+    parser.add_argument('--import-cache', metavar='BUNDLE',
+                       help='Merge a cache bundle into the local vocabulary store and exit')
+    parser.add_argument('--output', '-o', metavar='FILE',
+                       help='Bundle file to write with --export-cache (default: <pdf name>.tacache)')
+    parser.add_argument('--document', metavar='PDF',
+                       help='With --import-cache: check the bundle belongs to this PDF')
+    parser.add_argument('--batch', metavar='PDF',
+                       help='Analyze a whole PDF through the Gemini Batch API and exit')
+    parser.add_argument('--pages', metavar='RANGES',
+                       help='With --batch: pages to include, e.g. 1-20,25 (default: all)')
+    parser.add_argument('--batch-resume', type=int, metavar='JOB_ID',
+                       help='Continue an interrupted batch job and exit')
+    parser.add_argument('--batch-list', action='store_true',
+                       help='List recent batch jobs and exit')
+    parser.add_argument('--no-wait', action='store_true',
+                       help='With --batch/--batch-resume: submit the job without waiting for results')
+    parser.add_argument('--profile', action='store_true',
+                       help='Profile page analysis, lookups and word list updates (cProfile, to the log directory)')
     args = parser.parse_args()
     
     if args.setup:
         setup_user_config()
         return
+
+    if args.usage is not None:
+        if args.usage < 1:
+            parser.error("--usage: DAYS must be at least 1")
+        show_token_usage(args.usage)
+        return
+
+    if args.export_cache:
+        export_cache(args.export_cache, args.output)
+        return
+
+    if args.import_cache:
+        import_cache(args.import_cache, args.document)
+        return
+
+    if args.batch:
+        run_batch(args.batch, args.pages, not args.no_wait)
+        return
+
+    if args.batch_resume:
+        resume_batch(args.batch_resume, not args.no_wait)
+        return
+
+    if args.batch_list:
+        list_batches()
+        return
     
     # Allow Ctrl+C to quit
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
-    app = TamilSidePanel()
+    # D-Bus (Okular and the panel's own service) dispatches on the GTK main loop
+    DBusGMainLoop(set_as_default=True)
+
+    app = TamilSidePanel(profile=args.profile)
     app.connect("destroy", Gtk.main_quit)
     app.show_all()
 
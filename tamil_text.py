@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Tamil text normalization for Tamil Assistant
+Cleans selected text (NFC, invisible characters, PDF line breaks) and
+derives lemma keys: a light rule-based suffix stripper that maps the common
+inflected forms of a noun to one key, so cached explanations can be found
+without a network call. Keys are for matching only and are not always
+valid words.
+"""
+
+import re
+import unicodedata
+
+# Zero-width and formatting characters that PDFs and clipboards leave behind
+INVISIBLE_PATTERN = re.compile('[\u00AD\u200B-\u200F\u2060-\u2064\uFEFF]')
+# Hyphen (or soft hyphen already removed) at a line break inside a word
+LINE_BREAK_HYPHEN_PATTERN = re.compile(r'[-\u2010\u2011]\s*\n\s*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TAMIL_PATTERN = re.compile('[\u0B80-\u0BFF]')
+
+VIRAMA = '்'
+U_SIGN = 'ு'
+# Vowel signs that make the preceding syllable long
+LONG_VOWEL_SIGNS = set('ாீூேைோௌ')
+LONG_VOWELS = set('ஆஈஊஏஐஓஔ')
+# Consonants that double before a vowel-initial suffix (வீடு -> வீட்டில்)
+DOUBLING_CONSONANTS = set('டற')
+# Final consonants of short one-syllable words that double (கண் -> கண்ணில்)
+SHORT_DOUBLING_CONSONANTS = set('ணனலளரழ')
+# Vowels followed by the ய் glide before a vowel suffix (பள்ளியில்); the
+# others take வ் (அம்மாவை). After any other vowel the consonant is part
+# of the word (நாய், தாய்).
+Y_GLIDE_SIGNS = set('ிீெேை')
+Y_GLIDE_VOWELS = set('இஈஎஏஐ')
+V_GLIDE_SIGNS = set('ாுூொோௌ')
+V_GLIDE_VOWELS = set('அஆஉஊஒஓஔ')
+
+# Case and plural suffixes, longest first. Entries starting with a vowel
+# sign attach directly to a consonant-final stem (ராமன் -> ராமனுக்கு).
+SUFFIXES = sorted([
+    # plural, optionally followed by a case ending
+    'களிலிருந்து', 'களுக்கு', 'களுடைய', 'களுடன்', 'களோடு', 'களிடம்',
+    'களில்', 'களின்', 'களால்', 'களை', 'கள்',
+    # case endings after a vowel-final stem
+    'க்கு',
+    # case endings as vowel signs
+    'ிலிருந்து', 'ிடமிருந்து', 'ுக்காக', 'ுக்கு', 'ுடைய',
+    'ுடன்', 'ோடு', 'ிடம்', 'ில்', 'ின்', 'ால்', 'ை',
+], key=len, reverse=True)
+
+# Shortest stem (in graphemes) left after stripping a suffix
+MIN_STEM_GRAPHEMES = 2
+
+
+def is_combining(char):
+    """Vowel signs, virama and other marks that belong to the previous letter"""
+    return unicodedata.category(char) in ('Mn', 'Mc')
+
+
+def graphemes(text):
+    """Split text into user-perceived characters (base letter plus its marks)"""
+    clusters = []
+    for char in text:
+        if clusters and is_combining(char):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def truncate(text, max_graphemes, ellipsis='…'):
+    """Shorten text without cutting a letter from its vowel sign or virama"""
+    clusters = graphemes(text)
+    if len(clusters) <= max_graphemes:
+        return text
+    return ''.join(clusters[:max_graphemes]).rstrip() + ellipsis
+
+
+def normalize(text):
+    """
+    Clean up text taken from a PDF selection
+    NFC, invisible characters removed, hyphenated line breaks joined,
+    whitespace collapsed, and surrounding punctuation trimmed without
+    leaving an orphaned vowel sign at the start
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text)
+    text = INVISIBLE_PATTERN.sub('', text)
+    text = LINE_BREAK_HYPHEN_PATTERN.sub('', text)
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
+
+    clusters = graphemes(text)
+    while clusters and not _is_word_cluster(clusters[0]):
+        clusters.pop(0)
+    while clusters and not _is_word_cluster(clusters[-1]):
+        clusters.pop()
+    return ''.join(clusters)
+
+
+def _is_word_cluster(cluster):
+    """Whether a grapheme can start or end a word (letters and digits)"""
+    return cluster[0].isalnum() and not is_combining(cluster[0])
+
+
+def strip_suffix(word):
+    """Remove one case/plural suffix; returns (stem, suffix)"""
+    for suffix in SUFFIXES:
+        if not word.endswith(suffix):
+            continue
+        stem = word[:-len(suffix)]
+        if len(graphemes(stem)) < MIN_STEM_GRAPHEMES:
+            continue
+        if is_combining(suffix[0]):
+            # The vowel sign replaced the stem's virama
+            stem += VIRAMA
+        # A final ை is usually part of the word (தலை, மலை, பறவை); it is
+        # only taken as the accusative after a glide (அம்மாவை, பள்ளியை) or
+        # the -att- of -am nouns (மரத்தை)
+        if suffix == 'ை' and not (_ends_in_glide(stem) or _ends_in_att(stem)):
+            continue
+        return stem, suffix
+    return word, ''
+
+
+def _ends_in_att(stem):
+    """Whether a stem ends in the -att- that -am nouns take before case endings"""
+    return stem.endswith('த' + VIRAMA + 'த' + VIRAMA) and len(graphemes(stem)) > 3
+
+
+def _ends_in_glide(stem):
+    """Whether a stem ends in the glide between a vowel and a vowel suffix"""
+    if len(graphemes(stem)) <= MIN_STEM_GRAPHEMES:
+        # One-syllable words keep their final consonant (நாயை, பேயில்)
+        return False
+    if stem.endswith('ய' + VIRAMA):
+        signs, vowels = Y_GLIDE_SIGNS, Y_GLIDE_VOWELS
+    elif stem.endswith('வ' + VIRAMA):
+        signs, vowels = V_GLIDE_SIGNS, V_GLIDE_VOWELS
+    else:
+        return False
+    before = stem[-3]
+    return before in signs or before in vowels
+
+
+def _canonical_stem(stem, suffix):
+    """Bring a stem and its dictionary form to the same ending"""
+    # Glide between a vowel-final stem and a vowel suffix (அம்மாவை, பள்ளியில்).
+    # Consonant-initial suffixes follow the word itself (நாய்கள், பள்ளிகள்).
+    if suffix and is_combining(suffix[0]) and _ends_in_glide(stem):
+        stem = stem[:-2]
+
+    # Short words double their final consonant before a vowel (கண்ணில், கல்லில்)
+    if suffix and is_combining(suffix[0]) and len(graphemes(stem)) == 3:
+        consonant = stem[-2]
+        if consonant in SHORT_DOUBLING_CONSONANTS and stem.endswith(consonant + VIRAMA + consonant + VIRAMA):
+            stem = stem[:-2]
+
+    # Plural sandhi: மரங்கள் -> மரம், பூக்கள் -> பூ
+    if suffix.startswith('கள'):
+        if stem.endswith('ங' + VIRAMA):
+            stem = stem[:-2] + 'ம' + VIRAMA
+        elif stem.endswith('க' + VIRAMA) and len(stem) >= 3 and stem[-3] != VIRAMA:
+            stem = stem[:-2]
+
+    # Final short u elides before vowels (வீடு -> வீட்டை), so treat it as a virama
+    if stem.endswith(U_SIGN) and len(graphemes(stem)) > 1:
+        stem = stem[:-1] + VIRAMA
+
+    # -am nouns take -att- before case endings (மரம் -> மரத்தை)
+    if _ends_in_att(stem):
+        stem = stem[:-4] + 'ம' + VIRAMA
+
+    # Doubling after a long syllable (வீடு -> வீட்டில், ஆறு -> ஆற்றில்)
+    for consonant in DOUBLING_CONSONANTS:
+        double = consonant + VIRAMA + consonant + VIRAMA
+        if stem.endswith(double) and len(stem) > 4:
+            before = stem[-5]
+            if before in LONG_VOWEL_SIGNS or before in LONG_VOWELS:
+                stem = stem[:-2]
+    return stem
+
+
+def lemma_key(text):
+    """
+    Matching key for a word or short phrase
+    Tamil words lose one case/plural suffix and get a canonical stem
+    ending; other words are lower-cased. Multi-word text is keyed word by word.
+    """
+    keys = []
+    for word in normalize(text).split(' '):
+        if not word:
+            continue
+        if TAMIL_PATTERN.search(word):
+            stem, suffix = strip_suffix(word)
+            keys.append(_canonical_stem(stem, suffix))
+        else:
+            keys.append(word.lower())
+    return ' '.join(keys)
@@ -0,0 +1,18 @@
+"""
+The repository root is installed as the tamil_assistant package; make it
+importable under that name when the tests run from a checkout
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'tamil_assistant' not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        'tamil_assistant', os.path.join(ROOT, '__init__.py'), submodule_search_locations=[ROOT]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['tamil_assistant'] = package
+    spec.loader.exec_module(package)
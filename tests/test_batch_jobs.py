@@ -0,0 +1,75 @@
+"""Batch mode end to end against the local Batch API stand-in"""
+
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from tamil_assistant import config_manager
+from tamil_assistant.batch_jobs import JOB_INGESTED, JOB_SUBMITTED, BatchAPI, BatchRunner
+from tamil_assistant.batch_stub_server import CANNED_WORDS, BatchStubServer
+from tamil_assistant.gemini_client import GeminiClient
+from tamil_assistant.token_ledger import TokenLedger
+from tamil_assistant.vocabulary_store import VocabularyStore
+
+PAGE_TEXT = "அவன் புத்தகம் படிக்கிறான். அவள் பாடம் எழுதுகிறாள்."
+
+
+class FakeOkular:
+    """Two text-layer pages, so nothing is rendered"""
+
+    def get_page_count(self, pdf_path):
+        return 2
+
+    def get_page_text(self, pdf_path, page):
+        return PAGE_TEXT
+
+
+def test_batch_job_against_stub(tmp_path, monkeypatch):
+    config_path = tmp_path / 'config.ini'
+    config_path.write_text(
+        "[gemini]\napi_key = test-key\nmodel = gemini-test\n"
+        f"[storage]\ndatabase_file = {tmp_path / 'vocabulary.db'}\n"
+        f"[batch]\nbatch_dir = {tmp_path / 'batches'}\npoll_interval = 1\n",
+        encoding='utf-8'
+    )
+    monkeypatch.setattr(config_manager, '_config_instance', config_manager.Config(config_path))
+    pdf_path = tmp_path / 'book.pdf'
+    pdf_path.write_bytes(b'%PDF-1.4 stand-in')
+
+    store = VocabularyStore(tmp_path / 'vocabulary.db')
+    ledger = TokenLedger(tmp_path / 'tokens.db')
+    gemini = GeminiClient(api_key='test-key', model='gemini-test', ledger=ledger)
+
+    async def run():
+        server = TestServer(BatchStubServer(delay=0).app())
+        await server.start_server()
+        api = BatchAPI('test-key', str(server.make_url('')).rstrip('/'))
+        runner = BatchRunner(store, gemini, FakeOkular(), api=api, ledger=ledger)
+        try:
+            job = runner.prepare(str(pdf_path))
+            await runner.submit(job)
+            assert job.state == JOB_SUBMITTED
+
+            # Continue from the job table, as --batch-resume does
+            resumed = await runner.resume(runner.jobs.get(job.id))
+            return resumed
+        finally:
+            await runner.close()
+            await server.close()
+
+    job = asyncio.run(run())
+    store.flush()
+    try:
+        assert job.state == JOB_INGESTED
+        assert job.error is None
+
+        stored = store.get_cached_page(job.content_hash, 2, job.prompt_hash, job.model)
+        assert [w.tamil_word for w in stored] == [w['tamil_word'] for w in CANNED_WORDS]
+        assert stored[0].literal_translation == CANNED_WORDS[0]['literal_translation']
+
+        word = store.find_cached_word('புத்தகத்தை', content_hash=job.content_hash)
+        assert word is not None
+        assert word.word.contextual_meaning == CANNED_WORDS[0]['contextual_meaning']
+        assert ledger.used_today() == 2 * (1000 + 100)
+    finally:
+        store.close()
@@ -0,0 +1,20 @@
+"""Built-in prompt defaults, used when a prompt file is missing"""
+
+import os
+
+import pytest
+
+from tamil_assistant.config_manager import Config
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prompts')
+
+
+@pytest.mark.parametrize('name', [
+    'continuation', 'known_vocabulary', 'page_quick', 'page_spread',
+    'page_summary', 'page_text', 'page_tile', 'word_details',
+])
+def test_default_prompt_matches_shipped_file(name):
+    config = Config.__new__(Config)
+    with open(os.path.join(PROMPTS_DIR, f"{name}.txt"), encoding='utf-8') as f:
+        shipped = f.read().strip()
+    assert getattr(config, f"_get_default_{name}_prompt")() == shipped
@@ -0,0 +1,53 @@
+import pytest
+
+from tamil_assistant.tamil_text import lemma_key
+
+
+@pytest.mark.parametrize('word, key', [
+    # Final ய்/வ் of the word itself before the plural
+    ('நாய்கள்', 'நாய்'),
+    ('வாய்கள்', 'வாய்'),
+    ('தாய்களை', 'தாய்'),
+    ('பேய்கள்', 'பேய்'),
+    ('நோயில்', 'நோய்'),
+    # Glides before vowel suffixes
+    ('அம்மாவை', 'அம்மா'),
+    ('பள்ளியில்', 'பள்ளி'),
+    ('பள்ளிகள்', 'பள்ளி'),
+])
+def test_stem(word, key):
+    assert lemma_key(word) == key
+
+
+@pytest.mark.parametrize('word, inflected', [
+    ('தலை', 'தலையில்'),
+    ('மலை', 'மலையில்'),
+    ('இலை', 'இலைகள்'),
+    ('இலை', 'இலையை'),
+    ('பறவை', 'பறவைகள்'),
+    ('நாய்', 'நாய்கள்'),
+    ('மரம்', 'மரங்கள்'),
+    ('மரம்', 'மரத்தை'),
+    ('அத்தை', 'அத்தையை'),
+    ('வீடு', 'வீட்டில்'),
+    ('கண்', 'கண்ணில்'),
+])
+def test_inflected_forms_share_key(word, inflected):
+    assert lemma_key(word) == lemma_key(inflected)
+
+
+@pytest.mark.parametrize('word, other', [
+    ('நாய்கள்', 'நா'),
+    ('வாய்கள்', 'வா'),
+    ('தாய்களை', 'தா'),
+    ('பேய்கள்', 'பே'),
+    ('தலை', 'தல்'),
+    ('இலை', 'இல்'),
+])
+def test_distinct_words_keep_distinct_keys(word, other):
+    assert lemma_key(word) != lemma_key(other)
+
+
+def test_dictionary_form_is_kept():
+    assert lemma_key('தலை') == 'தலை'
+    assert lemma_key('மலை') == 'மலை'
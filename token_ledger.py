@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Persistent token ledger for Tamil Assistant
+Records Gemini token usage per day, document and operation, and enforces
+the configured daily soft and hard limits
+"""
+
+import sqlite3
+import threading
+import logging
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+from tamil_assistant.config_manager import get_config
+
+# Operations that run without the user waiting on them, and duplicate hedge
+# requests. These pause once the soft limit is reached so interactive lookups
+# keep working until the hard limit.
+BACKGROUND_OPERATIONS = {'prefetch', 'batch', 'hedge'}
+
+STATUS_OK = 'ok'
+STATUS_SOFT = 'soft'
+STATUS_HARD = 'hard'
+
+
+class BudgetExceededError(Exception):
+    """Raised when a request is refused by the token budget"""
+
+    def __init__(self, operation, status, used, limit):
+        self.operation = operation
+        self.status = status
+        self.used = used
+        self.limit = limit
+        super().__init__(
+            f"Daily token {status} limit reached ({used:,}/{limit:,} tokens) - "
+            f"'{operation}' paused until tomorrow"
+        )
+
+
+class TokenLedger:
+    def __init__(self, db_path, soft_limit=0, hard_limit=0):
+        """
+        Open the ledger database
+        Limits are total (prompt + output) tokens per day; 0 disables a limit
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.logger = logging.getLogger('TokenLedger')
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS token_usage (
+                    day TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    operation TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    output_tokens INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, document, operation, model)
+                )
+                """
+            )
+
+    def record(self, operation, prompt_tokens, output_tokens, document=None, model=None):
+        """Add one request's usage to today's totals"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO token_usage (day, document, operation, model, requests,
+                                         prompt_tokens, output_tokens)
+                VALUES (?, ?, ?, ?, 1, ?, ?)
+                ON CONFLICT (day, document, operation, model) DO UPDATE SET
+                    requests = requests + 1,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    output_tokens = output_tokens + excluded.output_tokens
+                """,
+                (date.today().isoformat(), document or '', operation, model or '',
+                 prompt_tokens or 0, output_tokens or 0)
+            )
+
+        status = self.status()
+        if status != STATUS_OK:
+            self.logger.warning(f"Token budget {status} limit reached: {self.used_today():,} tokens today")
+
+    def used_today(self):
+        """Total tokens used today"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + output_tokens), 0) FROM token_usage WHERE day = ?",
+                (date.today().isoformat(),)
+            ).fetchone()
+        return row[0]
+
+    def status(self):
+        """Budget status for today: ok, soft or hard"""
+        used = self.used_today()
+        if self.hard_limit and used >= self.hard_limit:
+            return STATUS_HARD
+        if self.soft_limit and used >= self.soft_limit:
+            return STATUS_SOFT
+        return STATUS_OK
+
+    def allows(self, operation):
+        """Whether an operation may run under today's budget"""
+        status = self.status()
+        if status == STATUS_HARD:
+            return False
+        if status == STATUS_SOFT and operation in BACKGROUND_OPERATIONS:
+            return False
+        return True
+
+    def check(self, operation):
+        """Raise BudgetExceededError if an operation may not run"""
+        if self.allows(operation):
+            return
+        status = self.status()
+        limit = self.hard_limit if status == STATUS_HARD else self.soft_limit
+        raise BudgetExceededError(operation, status, self.used_today(), limit)
+
+    def summary(self, days=1):
+        """Usage totals for the last N days, grouped by operation and by document"""
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            by_operation = self._conn.execute(
+                """
+                SELECT operation, SUM(requests), SUM(prompt_tokens), SUM(output_tokens)
+                FROM token_usage WHERE day >= ?
+                GROUP BY operation ORDER BY SUM(prompt_tokens + output_tokens) DESC
+                """,
+                (since,)
+            ).fetchall()
+            by_document = self._conn.execute(
+                """
+                SELECT document, SUM(requests), SUM(prompt_tokens), SUM(output_tokens)
+                FROM token_usage WHERE day >= ?
+                GROUP BY document ORDER BY SUM(prompt_tokens + output_tokens) DESC
+                """,
+                (since,)
+            ).fetchall()
+        return {'since': since, 'by_operation': by_operation, 'by_document': by_document}
+
+    def format_summary(self, days=1):
+        """Human readable usage report"""
+        summary = self.summary(days)
+        lines = [f"Token usage since {summary['since']}:"]
+
+        lines.append("")
+        lines.append("  By operation:")
+        for operation, requests, sent, received in summary['by_operation']:
+            lines.append(f"    {operation:<16} {requests:>5} requests  {sent:>10,} sent  {received:>10,} received")
+
+        lines.append("")
+        lines.append("  By document:")
+        for document, requests, sent, received in summary['by_document']:
+            name = os.path.basename(document) if document else '(none)'
+            lines.append(f"    {name:<30} {requests:>5} requests  {sent + received:>10,} tokens")
+
+        lines.append("")
+        lines.append(f"  Today: {self.used_today():,} tokens "
+                     f"(soft limit: {self.soft_limit or 'none'}, hard limit: {self.hard_limit or 'none'}) "
+                     f"- status: {self.status()}")
+        return "\n".join(lines)
+
+
+# Singleton instance
+_ledger_instance = None
+
+def get_token_ledger():
+    """Get or create the token ledger from config"""
+    global _ledger_instance
+    if _ledger_instance is None:
+        config = get_config()
+        _ledger_instance = TokenLedger(
+            config.get_token_ledger_path(),
+            soft_limit=config.get_daily_soft_limit(),
+            hard_limit=config.get_daily_hard_limit()
+        )
+    return _ledger_instance
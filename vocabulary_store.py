@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+"""
+Local SQLite vocabulary store for Tamil Assistant
+Records every word Gemini explains, with document, page, model and time,
+and provides full-text search across all analyzed books
+"""
+
+import sqlite3
+import threading
+import queue
+import logging
+import time
+import os
+from pathlib import Path
+
+from tamil_assistant.gemini_client import TamilWord
+from tamil_assistant.tamil_text import lemma_key, normalize
+from tamil_assistant.fingerprint import QUICK_KEY_PREFIX
+
+
+def _add_lemma_keys(conn):
+    """Add the lemma key column and compute it for existing words"""
+    conn.execute("ALTER TABLE words ADD COLUMN lemma_key TEXT NOT NULL DEFAULT ''")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_words_lemma ON words(lemma_key)")
+    _update_lemma_keys(conn)
+
+
+def _update_lemma_keys(conn):
+    """Recompute the lemma key of every stored word"""
+    rows = conn.execute("SELECT id, tamil_word FROM words").fetchall()
+    conn.executemany(
+        "UPDATE words SET lemma_key = ? WHERE id = ?",
+        [(lemma_key(tamil_word), word_id) for word_id, tamil_word in rows]
+    )
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Each entry is an SQL script or a function taking the connection.
+MIGRATIONS = [
+    # 1: analyses, words and the FTS index over both languages
+    """
+    CREATE TABLE IF NOT EXISTS analyses (
+        id INTEGER PRIMARY KEY,
+        document TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        model TEXT,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_analyses_document
+        ON analyses(document, page, kind);
+    CREATE INDEX IF NOT EXISTS idx_analyses_created
+        ON analyses(document, created_at);
+
+    CREATE TABLE IF NOT EXISTS words (
+        id INTEGER PRIMARY KEY,
+        analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        tamil_word TEXT NOT NULL,
+        literal_translation TEXT NOT NULL DEFAULT '',
+        contextual_meaning TEXT NOT NULL DEFAULT '',
+        sentence_context TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_words_analysis ON words(analysis_id);
+    CREATE INDEX IF NOT EXISTS idx_words_tamil ON words(tamil_word);
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+        tamil_word, literal_translation, contextual_meaning, sentence_context,
+        content='words', content_rowid='id', tokenize='unicode61'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS words_ai AFTER INSERT ON words BEGIN
+        INSERT INTO words_fts(rowid, tamil_word, literal_translation,
+                              contextual_meaning, sentence_context)
+        VALUES (new.id, new.tamil_word, new.literal_translation,
+                new.contextual_meaning, new.sentence_context);
+    END;
+    CREATE TRIGGER IF NOT EXISTS words_ad AFTER DELETE ON words BEGIN
+        INSERT INTO words_fts(words_fts, rowid, tamil_word, literal_translation,
+                              contextual_meaning, sentence_context)
+        VALUES ('delete', old.id, old.tamil_word, old.literal_translation,
+                old.contextual_meaning, old.sentence_context);
+    END;
+    CREATE TRIGGER IF NOT EXISTS words_au AFTER UPDATE ON words BEGIN
+        INSERT INTO words_fts(words_fts, rowid, tamil_word, literal_translation,
+                              contextual_meaning, sentence_context)
+        VALUES ('delete', old.id, old.tamil_word, old.literal_translation,
+                old.contextual_meaning, old.sentence_context);
+        INSERT INTO words_fts(rowid, tamil_word, literal_translation,
+                              contextual_meaning, sentence_context)
+        VALUES (new.id, new.tamil_word, new.literal_translation,
+                new.contextual_meaning, new.sentence_context);
+    END;
+    """,
+    # 2: lemma keys, so inflected forms of a word find each other
+    _add_lemma_keys,
+    # 3: content and prompt hashes, so results can be shared between machines
+    """
+    ALTER TABLE analyses ADD COLUMN content_hash TEXT;
+    ALTER TABLE analyses ADD COLUMN prompt_hash TEXT;
+    CREATE INDEX IF NOT EXISTS idx_analyses_content
+        ON analyses(content_hash, page, kind);
+    """,
+    # 4: render resolution of image analyses (NULL for text and older rows)
+    """
+    ALTER TABLE analyses ADD COLUMN dpi INTEGER;
+    """,
+    # 5: page content hashes, and quick document keys resolved to content hashes
+    """
+    ALTER TABLE analyses ADD COLUMN page_hash TEXT;
+    CREATE INDEX IF NOT EXISTS idx_analyses_page_hash ON analyses(page_hash);
+    CREATE TABLE IF NOT EXISTS document_keys (
+        quick_key TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    """,
+    # 6: lemma keys without glide and final ை over-stripping (நாய்கள் was நா)
+    _update_lemma_keys,
+    # 7: Tamil vowel signs and virama (category M) are part of FTS tokens;
+    # plain unicode61 split தமிழ் into த, ழ
+    """
+    DROP TABLE IF EXISTS words_fts;
+    CREATE VIRTUAL TABLE words_fts USING fts5(
+        tamil_word, literal_translation, contextual_meaning, sentence_context,
+        content='words', content_rowid='id',
+        tokenize="unicode61 categories 'L* N* Co M*'"
+    );
+    INSERT INTO words_fts(words_fts) VALUES ('rebuild');
+    """,
+]
+
+# Maximum number of queued analyses written in one transaction
+WRITE_BATCH_SIZE = 64
+
+
+class StoredWord:
+    """A word from the store together with where it was seen"""
+
+    def __init__(self, word, document, page, model, created_at):
+        self.word = word
+        self.document = document
+        self.page = page
+        self.model = model
+        self.created_at = created_at
+
+    @property
+    def document_name(self):
+        return os.path.basename(self.document)
+
+    def __repr__(self):
+        return f"StoredWord({self.word.tamil_word} @ {self.document_name}:{self.page})"
+
+
+class VocabularyStore:
+    def __init__(self, db_path):
+        """
+        Open (or create) the vocabulary database
+        Writes are queued and committed in batches by a background thread
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger('VocabularyStore')
+
+        self._local = threading.local()
+        self._write_queue = queue.Queue()
+
+        # Schema setup and WAL mode happen once, before the writer starts
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate(conn)
+        conn.close()
+
+        self._writer = threading.Thread(
+            target=self._writer_loop, name='VocabularyStoreWriter', daemon=True
+        )
+        self._writer.start()
+
+        self.logger.info(f"Vocabulary store opened: {self.db_path}")
+
+    def _connect(self):
+        """Open a new connection with the store's pragmas"""
+        conn = sqlite3.connect(str(self.db_path), timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _reader(self):
+        """Per-thread read connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn):
+        """Apply pending schema migrations"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                if callable(script):
+                    script(conn)
+                else:
+                    conn.executescript(script)
+                conn.execute(f"PRAGMA user_version = {number}")
+            self.logger.info(f"Applied vocabulary schema migration {number}")
+
+    # Writes
+
+    def record_analysis(self, document, page, words, model, kind='page',
+                        content_hash=None, prompt_hash=None, created_at=None, dpi=None, page_hash=None):
+        """
+        Queue a page analysis or lookup result for storage
+        content_hash identifies the PDF independent of its path and
+        prompt_hash the prompt the words were produced with; dpi is the
+        render resolution when the page was sent as (or read from) an image;
+        page_hash identifies the page's own content (fingerprint.page_hash)
+        """
+        words = [w for w in words if w is not None]
+        if not words:
+            return
+        self._write_queue.put((
+            document, page, kind, model, created_at or time.time(), words,
+            content_hash, prompt_hash, dpi, page_hash
+        ))
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self._write_queue.join()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self._write_queue.put(None)
+        self._writer.join(timeout=10)
+
+    def _writer_loop(self):
+        """Drain the write queue, committing several analyses per transaction"""
+        conn = self._connect()
+        while True:
+            item = self._write_queue.get()
+            batch = [item]
+            while item is not None and len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    item = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            stop = None in batch
+            records = [entry for entry in batch if entry is not None]
+            try:
+                if records:
+                    with conn:
+                        for record in records:
+                            self._insert_analysis(conn, *record)
+                    self.logger.info(f"Stored {len(records)} analyses")
+            except Exception as e:
+                self.logger.error(f"Failed to store analyses: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+            if stop:
+                conn.close()
+                return
+
+    def _insert_analysis(self, conn, document, page, kind, model, created_at, words,
+                         content_hash=None, prompt_hash=None, dpi=None, page_hash=None):
+        """Insert one analysis and its words inside the current transaction"""
+        # Requests started before the document's content hash was known
+        # finish under its quick key
+        if content_hash and content_hash.startswith(QUICK_KEY_PREFIX):
+            row = conn.execute(
+                "SELECT content_hash FROM document_keys WHERE quick_key = ?", (content_hash,)
+            ).fetchone()
+            if row:
+                content_hash = row[0]
+        cursor = conn.execute(
+            "INSERT INTO analyses (document, page, kind, model, created_at, "
+            "content_hash, prompt_hash, dpi, page_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (document, page, kind, model, created_at, content_hash, prompt_hash, dpi, page_hash)
+        )
+        analysis_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO words (analysis_id, position, tamil_word, literal_translation, "
+            "contextual_meaning, sentence_context, lemma_key) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (analysis_id, position, w.tamil_word, w.literal_translation or '',
+                 w.contextual_meaning or '', w.sentence_context or '', lemma_key(w.tamil_word))
+                for position, w in enumerate(words)
+            ]
+        )
+        return analysis_id
+
+    # Reads
+
+    def search(self, text, limit=50):
+        """
+        Full-text search over Tamil and English fields
+        Headword and translation matches come first, then matches in meanings
+        and sentences; each group is newest first. Walking the FTS index in
+        rowid order keeps this fast even for very common terms, where ranking
+        every match with bm25 would not be.
+        """
+        query = self._build_match_query(text)
+        if not query:
+            return []
+
+        conn = self._reader()
+        rowids = self._match_rowids(conn, f"{{tamil_word literal_translation}} : ({query})", limit)
+        if len(rowids) < limit:
+            seen = set(rowids)
+            for rowid in self._match_rowids(conn, query, limit):
+                if rowid not in seen and len(rowids) < limit:
+                    rowids.append(rowid)
+        if not rowids:
+            return []
+
+        placeholders = ','.join('?' * len(rowids))
+        rows = conn.execute(
+            f"""
+            SELECT w.id, w.tamil_word, w.literal_translation, w.contextual_meaning,
+                   w.sentence_context, a.document, a.page, a.model, a.created_at
+            FROM words w
+            JOIN analyses a ON a.id = w.analysis_id
+            WHERE w.id IN ({placeholders})
+            """,
+            rowids
+        ).fetchall()
+        by_id = {row[0]: row[1:] for row in rows}
+        return [self._row_to_stored_word(by_id[rowid]) for rowid in rowids if rowid in by_id]
+
+    def _match_rowids(self, conn, match, limit):
+        """Newest matching word ids for an FTS5 expression"""
+        return [
+            row[0] for row in conn.execute(
+                "SELECT rowid FROM words_fts WHERE words_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+                (match, limit)
+            )
+        ]
+
+    def get_page_words(self, document, page, kind='page'):
+        """Words from the most recent stored analysis of a page"""
+        conn = self._reader()
+        row = conn.execute(
+            "SELECT id FROM analyses WHERE document = ? AND page = ? AND kind = ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (document, page, kind)
+        ).fetchone()
+        if not row:
+            return []
+        return self._analysis_words(conn, row[0])
+
+    def get_cached_page(self, content_hash, page, prompt_hash, model, dpi=None):
+        """
+        Words of the most recent analysis of a page made with the same
+        prompt and model (or any of a list of models), found by document
+        content rather than path (so imported bundles match). With dpi, image
+        analyses must have been rendered at that resolution or higher; text
+        analyses always match.
+        Returns None if there is none.
+        """
+        models = [model] if isinstance(model, str) else list(model)
+        row = self._reader().execute(
+            "SELECT id FROM analyses WHERE content_hash = ? AND page = ? AND kind = 'page' "
+            f"AND prompt_hash = ? AND model IN ({', '.join('?' * len(models))}) "
+            "AND (? IS NULL OR dpi IS NULL OR dpi >= ?) "
+            "ORDER BY created_at DESC LIMIT 1",
+            (content_hash, page, prompt_hash, *models, dpi, dpi)
+        ).fetchone()
+        if not row:
+            return None
+        return self._analysis_words(self._reader(), row[0])
+
+    def get_page_details(self, content_hash, page, prompt_hash):
+        """
+        Stored contextual details of a page's words (two-tier analysis),
+        keyed by (tamil_word, sentence_context); newest first wins
+        """
+        rows = self._reader().execute(
+            "SELECT w.tamil_word, w.literal_translation, w.contextual_meaning, w.sentence_context "
+            "FROM words w JOIN analyses a ON a.id = w.analysis_id "
+            "WHERE a.content_hash = ? AND a.page = ? AND a.kind = 'details' AND a.prompt_hash = ? "
+            "ORDER BY a.created_at DESC",
+            (content_hash, page, prompt_hash)
+        ).fetchall()
+        details = {}
+        for row in rows:
+            details.setdefault((row[0], row[3]), TamilWord(*row))
+        return details
+
+    def find_page_by_hash(self, page_hash, document, page, prompt_hash, model, dpi=None):
+        """
+        Words of the most recent analysis of the same page of an earlier
+        version of a document (same page number and file name, identical
+        page hash), made with the same prompt and model.
+        Returns (words, model of that analysis), or None if there is none.
+        """
+        models = [model] if isinstance(model, str) else list(model)
+        name = os.path.basename(document)
+        row = self._reader().execute(
+            "SELECT id, model FROM analyses WHERE page_hash = ? AND page = ? AND kind = 'page' "
+            "AND (document = ? OR substr(document, -length(?)) = ?) "
+            f"AND prompt_hash = ? AND model IN ({', '.join('?' * len(models))}) "
+            "AND (? IS NULL OR dpi IS NULL OR dpi >= ?) "
+            "ORDER BY created_at DESC LIMIT 1",
+            (page_hash, page, name, '/' + name, '/' + name, prompt_hash, *models, dpi, dpi)
+        ).fetchone()
+        if not row:
+            return None
+        return self._analysis_words(self._reader(), row[0]), row[1]
+
+    def get_document_key(self, quick_key):
+        """Content hash a quick document key was resolved to, or None"""
+        row = self._reader().execute(
+            "SELECT content_hash FROM document_keys WHERE quick_key = ?", (quick_key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_document_key(self, quick_key, content_hash):
+        """
+        Resolve a quick document key to the document's content hash
+        Analyses recorded under the quick key meanwhile are moved to the
+        content hash. Returns the number of analyses moved.
+        """
+        self.flush()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO document_keys (quick_key, content_hash, created_at) VALUES (?, ?, ?)",
+                    (quick_key, content_hash, time.time())
+                )
+                cursor = conn.execute(
+                    "UPDATE analyses SET content_hash = ? WHERE content_hash = ?", (content_hash, quick_key)
+                )
+        finally:
+            conn.close()
+        return cursor.rowcount
+
+    def _analysis_words(self, conn, analysis_id):
+        rows = conn.execute(
+            "SELECT tamil_word, literal_translation, contextual_meaning, sentence_context "
+            "FROM words WHERE analysis_id = ? ORDER BY position",
+            (analysis_id,)
+        ).fetchall()
+        return [TamilWord(*r) for r in rows]
+
+    def export_analyses(self, document, content_hash):
+        """
+        Every stored analysis and lookup of a document, as plain dicts
+        Rows recorded under the document's path before hashes were stored
+        are included and given the content hash.
+        """
+        conn = self._reader()
+        rows = conn.execute(
+            "SELECT id, page, kind, model, created_at, prompt_hash, dpi, page_hash FROM analyses "
+            "WHERE content_hash = ? OR (document = ? AND content_hash IS NULL) "
+            "ORDER BY created_at",
+            (content_hash, document)
+        ).fetchall()
+        return [
+            {
+                "page": page,
+                "kind": kind,
+                "model": model,
+                "created_at": created_at,
+                "prompt_hash": prompt_hash,
+                "dpi": dpi,
+                "page_hash": page_hash,
+                "words": [w.to_dict() for w in self._analysis_words(conn, analysis_id)],
+            }
+            for analysis_id, page, kind, model, created_at, prompt_hash, dpi, page_hash in rows
+        ]
+
+    def import_analyses(self, document, content_hash, analyses):
+        """
+        Merge exported analyses into the store in one transaction
+        Entries already present (same content, page, kind, model, prompt and
+        time) are skipped, so importing a bundle twice changes nothing.
+        Returns the number of analyses added.
+        """
+        self.flush()
+        conn = self._connect()
+        added = 0
+        try:
+            with conn:
+                for entry in analyses:
+                    exists = conn.execute(
+                        "SELECT 1 FROM analyses WHERE content_hash = ? AND page = ? AND kind = ? "
+                        "AND model IS ? AND prompt_hash IS ? AND created_at = ?",
+                        (content_hash, entry["page"], entry["kind"], entry["model"],
+                         entry["prompt_hash"], entry["created_at"])
+                    ).fetchone()
+                    if exists:
+                        continue
+                    words = [
+                        TamilWord(w["tamil_word"], w.get("literal_translation", ""),
+                                  w.get("contextual_meaning", ""), w.get("sentence_context", ""))
+                        for w in entry["words"]
+                    ]
+                    self._insert_analysis(
+                        conn, document, entry["page"], entry["kind"], entry["model"],
+                        entry["created_at"], words, content_hash, entry["prompt_hash"],
+                        entry.get("dpi"), entry.get("page_hash")
+                    )
+                    added += 1
+        finally:
+            conn.close()
+        self.logger.info(f"Imported {added} of {len(analyses)} analyses for {os.path.basename(document)}")
+        return added
+
+    def find_cached_word(self, text, document=None, content_hash=None):
+        """
+        Most recent explanation of a word or one of its inflected forms
+        Matches on lemma key; the same document (by path or content), the
+        exact form and explicit lookups are preferred, in that order.
+        Returns a StoredWord or None.
+        """
+        key = lemma_key(text)
+        if not key:
+            return None
+
+        row = self._reader().execute(
+            """
+            SELECT w.tamil_word, w.literal_translation, w.contextual_meaning,
+                   w.sentence_context, a.document, a.page, a.model, a.created_at
+            FROM words w
+            JOIN analyses a ON a.id = w.analysis_id
+            WHERE w.lemma_key = ? AND w.literal_translation != '' AND w.contextual_meaning != ''
+            ORDER BY (a.document = ? OR a.content_hash = ?) DESC, w.tamil_word = ? DESC,
+                     a.kind = 'lookup' DESC, a.created_at DESC
+            LIMIT 1
+            """,
+            (key, document or '', content_hash or '', normalize(text))
+        ).fetchone()
+        return self._row_to_stored_word(row) if row else None
+
+    def get_known_words(self, document, limit):
+        """Most recently explained distinct words of a document"""
+        rows = self._reader().execute(
+            """
+            SELECT w.tamil_word, MAX(a.created_at) AS last_seen
+            FROM analyses a
+            JOIN words w ON w.analysis_id = a.id
+            WHERE a.document = ? AND a.kind = 'page'
+              AND w.literal_translation != '' AND w.tamil_word != 'POEM_SUMMARY'
+            GROUP BY w.tamil_word
+            ORDER BY last_seen DESC
+            LIMIT ?
+            """,
+            (document, limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def fill_known_words(self, document, words):
+        """
+        Complete reference-only entries (word.known) from earlier explanations
+        in the same document. The sentence from the current page is kept.
+        Returns the number of entries filled.
+        """
+        known = [w for w in words if w.known]
+        if not known:
+            return 0
+
+        wanted = sorted({w.tamil_word for w in known})
+        placeholders = ','.join('?' * len(wanted))
+        rows = self._reader().execute(
+            f"""
+            SELECT w.tamil_word, w.literal_translation, w.contextual_meaning
+            FROM words w
+            JOIN analyses a ON a.id = w.analysis_id
+            WHERE a.document = ? AND w.tamil_word IN ({placeholders})
+              AND w.literal_translation != ''
+            ORDER BY w.contextual_meaning != '' DESC, a.created_at DESC
+            """,
+            [document] + wanted
+        ).fetchall()
+
+        entries = {}
+        for tamil_word, literal, contextual in rows:
+            entries.setdefault(tamil_word, (literal, contextual))
+
+        filled = 0
+        for word in known:
+            entry = entries.get(word.tamil_word)
+            if entry:
+                word.literal_translation, word.contextual_meaning = entry
+                filled += 1
+            else:
+                self.logger.warning(f"Known word not found in store: {word.tamil_word}")
+        return filled
+
+    def count_words(self):
+        """Total number of stored word entries"""
+        return self._reader().execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+    def _build_match_query(self, text):
+        """Turn user input into an FTS5 prefix query, one term per token"""
+        terms = []
+        for token in text.split():
+            token = token.replace('"', '').strip()
+            if token:
+                terms.append(f'"{token}"*')
+        return ' '.join(terms)
+
+    def _row_to_stored_word(self, row):
+        word = TamilWord(row[0], row[1], row[2], row[3])
+        return StoredWord(word, row[4], row[5], row[6], row[7])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Word positions on a page for Tamil Assistant
+Word boxes come from the PDF text layer (pdftotext -bbox-layout) or a local
+OCR pass, and are indexed once per page. Lookups use the index to send only
+a padded crop around the line or paragraph containing the selected word.
+Boxes are stored as fractions of the page size, so they apply to a
+rendering at any DPI.
+"""
+
+import logging
+import xml.etree.ElementTree as ElementTree
+
+from tamil_assistant.tamil_text import normalize, lemma_key
+
+logger = logging.getLogger('WordBoxes')
+
+# Give up on cropping when the region would cover more than this much of the page
+MAX_CROP_AREA = 0.5
+
+
+class WordBox:
+    """A word and its position as (left, top, right, bottom) page fractions"""
+
+    def __init__(self, text, box, line, paragraph):
+        self.text = text
+        self.box = box
+        # Keys grouping words into lines and paragraphs
+        self.line = line
+        self.paragraph = paragraph
+
+    def __repr__(self):
+        left, top, right, bottom = self.box
+        return f"WordBox({self.text} @ {left:.2f},{top:.2f}-{right:.2f},{bottom:.2f})"
+
+
+def _union(boxes):
+    boxes = list(boxes)
+    return (
+        min(b[0] for b in boxes), min(b[1] for b in boxes),
+        max(b[2] for b in boxes), max(b[3] for b in boxes)
+    )
+
+
+def _local_name(element):
+    return element.tag.rsplit('}', 1)[-1]
+
+
+def parse_bbox_layout(xhtml):
+    """Word boxes from pdftotext -bbox-layout output for a single page"""
+    root = ElementTree.fromstring(xhtml)
+    page = next((e for e in root.iter() if _local_name(e) == 'page'), None)
+    if page is None:
+        return []
+    width = float(page.get('width'))
+    height = float(page.get('height'))
+
+    words = []
+    for block_number, block in enumerate(e for e in page.iter() if _local_name(e) == 'block'):
+        for line_number, line in enumerate(e for e in block if _local_name(e) == 'line'):
+            for word in line:
+                if _local_name(word) != 'word' or not (word.text or '').strip():
+                    continue
+                box = (
+                    float(word.get('xMin')) / width, float(word.get('yMin')) / height,
+                    float(word.get('xMax')) / width, float(word.get('yMax')) / height
+                )
+                words.append(WordBox(word.text.strip(), box, (block_number, line_number), block_number))
+    return words
+
+
+class PageWordIndex:
+    def __init__(self, words, source):
+        """Index a page's word boxes by normalized form and lemma key"""
+        self.words = words
+        self.source = source
+        self._by_form = {}
+        self._by_lemma = {}
+        for word in words:
+            form = normalize(word.text)
+            if not form:
+                continue
+            self._by_form.setdefault(form, []).append(word)
+            self._by_lemma.setdefault(lemma_key(form), []).append(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def find(self, text):
+        """Boxes of the words matching the first word of text (exact form first, then lemma)"""
+        tokens = normalize(text).split(' ')
+        if not tokens or not tokens[0]:
+            return []
+        first = tokens[0]
+        matches = self._by_form.get(first) or self._by_lemma.get(lemma_key(first))
+        if not matches:
+            # Selections can be part of a word the text layer keeps whole
+            matches = [w for form, words in self._by_form.items() if first in form for w in words]
+        return matches or []
+
+    def region(self, text, context='paragraph'):
+        """
+        Page-fraction box around every occurrence of text, covering the
+        containing paragraphs (or lines, plus one line either side within
+        the paragraph).
+        Returns None if the word is not found or the region is most of the page.
+        """
+        matches = self.find(text)
+        if not matches:
+            return None
+
+        if context == 'paragraph':
+            keys = {w.paragraph for w in matches}
+            region_words = [w for w in self.words if w.paragraph in keys]
+        else:
+            wanted = set()
+            for match in matches:
+                lines = sorted({w.line for w in self.words if w.paragraph == match.paragraph})
+                position = lines.index(match.line)
+                wanted.update(lines[max(0, position - 1):position + 2])
+            region_words = [w for w in self.words if w.line in wanted]
+
+        box = _union(w.box for w in region_words)
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        if area > MAX_CROP_AREA:
+            logger.info(f"'{text}' region covers {area:.0%} of the page, not cropping")
+            return None
+        return box
+
+
+def crop_region(image, box, padding=0.02):
+    """Crop a page image to a page-fraction box plus padding (fraction of page width)"""
+    width, height = image.size
+    pad = padding * width
+    pixels = (
+        max(0, int(box[0] * width - pad)), max(0, int(box[1] * height - pad)),
+        min(width, int(box[2] * width + pad)), min(height, int(box[3] * height + pad))
+    )
+    return image.crop(pixels)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Lazy word details for two-tier page analysis
+The quick first pass lists a page's words with literal translations only.
+DetailFetcher then asks for contextual meanings (and the poem summary) in
+batches in the background; a word the student selects jumps the queue. Each
+answered batch is stored as a 'details' analysis of the page, so details
+are fetched once per word and page.
+"""
+
+import asyncio
+import logging
+
+from tamil_assistant.cache_bundle import prompt_hash
+from tamil_assistant.config_manager import get_config
+from tamil_assistant.metrics import get_metrics
+
+
+def needs_details(word):
+    """Whether a word from the quick pass still lacks its contextual meaning"""
+    return not word.contextual_meaning
+
+
+def word_key(word):
+    return (word.tamil_word, word.sentence_context)
+
+
+def details_prompt_hash():
+    """Identity of the details prompt for the store"""
+    config = get_config()
+    return prompt_hash(config.get_page_analysis_prompt() + config.get_word_details_prompt())
+
+
+def merge_details(words, details):
+    """Fill words from stored details ({word_key: TamilWord}); returns how many"""
+    filled = 0
+    for word in words:
+        stored = details.get(word_key(word))
+        if stored and needs_details(word):
+            word.contextual_meaning = stored.contextual_meaning
+            filled += 1
+    return filled
+
+
+class PageDetails:
+    def __init__(self, document, page, content_hash, words, load_page):
+        """
+        Words of one analyzed page awaiting details
+        load_page(): coroutine giving the page as (image or PagePayload,
+        page_text); called at most once, when the first batch is sent
+        """
+        self.document = document
+        self.page = page
+        self.content_hash = content_hash
+        self.words = words
+        self.load_page = load_page
+        self._input = None
+        # word_key -> future of the batch explaining it
+        self.in_flight = {}
+        # Words the model was asked about but did not explain
+        self.skipped = set()
+
+    async def page_input(self):
+        if self._input is None:
+            self._input = await self.load_page()
+        return self._input
+
+    def missing(self):
+        """Words without details that no batch is fetching or has given up on"""
+        return [
+            w for w in self.words
+            if needs_details(w) and word_key(w) not in self.in_flight and word_key(w) not in self.skipped
+        ]
+
+
+class DetailFetcher:
+    def __init__(self, gemini, store, batch_size=20, on_details=None):
+        """
+        Fetch contextual details for quick-pass words (on the event loop)
+        on_details(page_details, words): called on the loop thread after a
+        batch's words were filled in
+        """
+        self.gemini = gemini
+        self.store = store
+        self.batch_size = batch_size
+        self.on_details = on_details
+        self.logger = logging.getLogger('DetailFetcher')
+        self.metrics = get_metrics()
+
+    async def fetch_page(self, page):
+        """Fetch details of every word on the page, batch by batch"""
+        # The poem summary is the most useful detail; it goes first
+        while True:
+            missing = sorted(page.missing(), key=lambda w: w.tamil_word != "POEM_SUMMARY")
+            if not missing:
+                return
+            await self._fetch(page, missing[:self.batch_size])
+
+    async def fetch_word(self, page, word):
+        """Details of one word now: joins the batch fetching it, or starts one led by it"""
+        if not needs_details(word) or word_key(word) in page.skipped:
+            return word
+        future = page.in_flight.get(word_key(word))
+        if future is not None:
+            self.metrics.increment("word_details.joined")
+            await asyncio.shield(future)
+            return word
+        others = [w for w in page.missing() if w is not word]
+        await self._fetch(page, [word] + others[:self.batch_size - 1])
+        return word
+
+    async def _fetch(self, page, batch):
+        """Send one details request and fill the batch's words in place"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        for word in batch:
+            page.in_flight[word_key(word)] = future
+        try:
+            image, page_text = await page.page_input()
+            explained, _, _, model = await self.gemini.explain_words_async(
+                image, batch, document=page.document, page_text=page_text, page=page.page
+            )
+
+            # Entries are matched by word and sentence, falling back to the
+            # word alone when the model rephrased the sentence
+            by_key = {word_key(w): w for w in explained}
+            by_word = {}
+            for entry in explained:
+                by_word.setdefault(entry.tamil_word, []).append(entry)
+            filled = []
+            for word in batch:
+                entry = by_key.get(word_key(word)) or (by_word.get(word.tamil_word) or [None])[0]
+                if entry and entry.contextual_meaning:
+                    word.contextual_meaning = entry.contextual_meaning
+                    filled.append(word)
+            self.metrics.increment("word_details.requests")
+            self.metrics.increment("word_details.words", len(filled))
+            if len(filled) < len(batch):
+                self.logger.warning(f"Details missing for {len(batch) - len(filled)} of {len(batch)} words on page {page.page}")
+                # Words the model skipped are not asked for again on this page
+                page.skipped.update(word_key(w) for w in batch if needs_details(w))
+
+            self.store.record_analysis(
+                page.document, page.page, filled, model,
+                kind='details', content_hash=page.content_hash, prompt_hash=details_prompt_hash()
+            )
+            if self.on_details:
+                self.on_details(page, filled)
+            future.set_result(filled)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters see the error; the future itself is not awaited otherwise
+            future.exception()
+            raise
+        finally:
+            for word in batch:
+                if page.in_flight.get(word_key(word)) is future:
+                    del page.in_flight[word_key(word)]